@@ -1,21 +1,44 @@
 """pip package definition."""
 from os import path
 
-import subprocess
-
 # from distutils.core import setup
-from setuptools import setup, find_packages
+from setuptools import setup, find_packages, Extension
+from setuptools.command.build_ext import build_ext
 
 # use the in house version number so we stay in synch with ourselves.
 from sudokusensei.Version import sudoku_sensei_version
 
+from sudokusensei.Native import NATIVE_ORDERS, EXPORTS, sugen_library_stem, sugen_library_name
+
 here = path.abspath(path.dirname(__file__))
 
 # Get the long description from the README file
 with open(path.join(here, 'README.md'), encoding='utf-8') as f:
     long_description = f.read()
 
-subprocess.call(['make', '-C', 'sudoku/lib', 'lib'])
+
+class BuildSugen(build_ext):
+    """builds the sugen libraries as plain shared libraries, named as Native expects, since they are loaded via ctypes not imported."""
+
+    def get_export_symbols(self, ext):
+        return ext.export_symbols
+
+    def get_ext_filename(self, fullname):
+        modpath = fullname.split('.')
+        for order in NATIVE_ORDERS:
+            if modpath[-1] == sugen_library_stem(order):
+                return path.join(*modpath[:-1], sugen_library_name(order))
+        return super().get_ext_filename(fullname)
+
+
+# one library per order, the C is compiled for a fixed ORDER. They are optional, without them we use the python engine.
+sugen_libraries = [Extension(f'sudokusensei.lib.{sugen_library_stem(order)}',
+                             sources=['sudokusensei/lib/sugen.c'],
+                             depends=['sudokusensei/lib/sugen.h'],
+                             define_macros=[('ORDER', str(order))],
+                             export_symbols=EXPORTS,
+                             optional=True)
+                   for order in NATIVE_ORDERS]
 
 setup(
     name='sudokusensei',
@@ -30,8 +53,12 @@ setup(
 
     packages=find_packages(exclude=['tests']),
 
+    ext_modules=sugen_libraries,
+
+    cmdclass={'build_ext': BuildSugen},
+
     package_data={
-        'sudokusensei':  ['data/*.sudoku', 'lib/libsugen.*'],
+        'sudokusensei':  ['data/*.sudoku', 'data/grids.bin'],
     },
 
 
@@ -40,6 +67,7 @@ setup(
         'console_scripts': [
             'sudokusensei = sudokusensei.Main:main',
             'senseitest = sudokusensei.TestMain:main',
+            'senseibench = sudokusensei.Benchmarks:main',
         ],
     },
 
@@ -0,0 +1,589 @@
+"""Benchmarks is a pip entry point for timing the slow parts of Sudoku Sensei.
+
+    senseibench <benchmark>
+"""
+
+import argparse
+import functools
+import multiprocessing
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from .SudokuLib import Puzzle, Cores, ORDERS, make_grid, resource_path
+from .Syntax import ENCODINGS, Registry, make_syntax
+from .SudokuGame import SudokuGame
+from .Options import Options
+from .PuzzleBatch import COLUMNS, PuzzleBatch, score_batch
+from .PuzzleStore import PuzzleStore, record2puzzle
+from .SudokuGenerator import SudokuGenerator, SYMMETRIES, choose_solution, _p_solve, _p_solve_clone
+from .DB import generate_grid, generate_puzzle, solve_puzzle, db_solve_puzzle, pyarray2puzzle, native_available, native_failure, db_seed
+from .DB import CORE_METRIC_SCALE, approximate_core_metric, core_sizes
+
+
+def bench_parallel_hardening(trials=5):
+    """reports the time-to-target of the (C) generator for differing numbers of hardening chains."""
+    for target in (400, 600, 800):
+        for workers in (1, 2, 4):
+            options = Options()
+            options.difficulty = target
+            options.iterations = 1000
+            options.workers = workers
+            generator = SudokuGenerator(options)
+            hits = 0
+            start = time.perf_counter()
+            for _ in range(trials):
+                score, _ = generator.generate()
+                if score >= target:
+                    hits += 1
+            elapsed = (time.perf_counter() - start) / trials
+            print(f'target: {target} workers: {workers} mean time: {elapsed:.3f} seconds  reached target: {hits}/{trials}')
+
+
+def bench_constrained_generation(count=20):
+    """reports the yield per second of each (C) generation mode, i.e. puzzles that reach the target and satisfy the constraints."""
+    modes = [(symmetry, 0, None) for symmetry in SYMMETRIES]
+    modes.append(('rotational', 22, 26))
+    modes.append(('none', 22, 26))
+    for symmetry, min_clues, max_clues in modes:
+        options = Options()
+        options.symmetry = symmetry
+        options.min_clues = min_clues
+        options.max_clues = max_clues
+        generator = SudokuGenerator(options)
+        producers = [('search', generator)]
+        if (min_clues, max_clues) != (0, None):
+            # the old way: generate with no clue count constraints and filter afterwards
+            unconstrained = Options()
+            unconstrained.symmetry = symmetry
+            producers.append(('filter', SudokuGenerator(unconstrained)))
+        for label, producer in producers:
+            kept = 0
+            start = time.perf_counter()
+            for _ in range(count):
+                score, puzzle = producer.generate()
+                if score >= options.difficulty and generator.satisfies_constraints(puzzle):
+                    kept += 1
+            elapsed = time.perf_counter() - start
+            print(f'symmetry: {symmetry:<10} clues: [{min_clues}, {max_clues}] {label}: {kept}/{count} kept, {kept / elapsed:.1f} puzzles per second')
+
+
+def _mean_time(function, trials, *args):
+    """returns the mean time, in seconds, of calling function on args."""
+    start = time.perf_counter()
+    for _ in range(trials):
+        function(*args)
+    return (time.perf_counter() - start) / trials
+
+def _python_grid(order):
+    puzzle = Puzzle(order=order)
+    choose_solution(puzzle)
+    return puzzle
+
+def _solve_all(solver, puzzles):
+    for puzzle in puzzles:
+        solver(puzzle, None, [0], False)
+
+
+# the python engine's backtracking grid generator does not finish in any reasonable time on 25x25 boards.
+PYTHON_ORDERS = (2, 3, 4)
+
+def bench_scaling(trials=5):
+    """reports the cost of generating grids, and solving (C) generated puzzles, on boards of each order for both engines."""
+    for order in ORDERS:
+        board = f'{order * order}x{order * order}'
+        options = Options()
+        options.order = order
+        options.iterations = 10
+        puzzles = [SudokuGenerator(options).generate()[1] for _ in range(trials)]
+        engines = [('C', generate_grid, solve_puzzle)]
+        if order in PYTHON_ORDERS:
+            engines.append(('python', _python_grid, _p_solve))
+        for label, grid, solver in engines:
+            grid_time = _mean_time(grid, trials, order)
+            solve_time = _mean_time(_solve_all, 1, solver, puzzles) / trials
+            print(f'{board:>5} {label:<6}: grid {grid_time:.5f} seconds solve {solve_time:.5f} seconds')
+
+
+# a few of the shipped puzzles.
+BOARDS = ('351', '1052_2020_06_11', '1154_2020_06_11')
+
+def bench_encodings(trials=3):
+    """reports the cost of building the rules, solving, counting solutions and computing cores, in each encoding of the rules."""
+    for board in BOARDS:
+        for encoding in sorted(ENCODINGS):
+            game = SudokuGame(board)
+            game.options.encoding = encoding
+            game.start()
+            setup = _mean_time(make_syntax, trials, encoding)
+            solver = game.solver
+            solve = _mean_time(solver.solve, trials)
+            count = _mean_time(solver.count_models, trials, False)
+            cores = _mean_time(solver.compute_cores, 1, solver.solve())
+            print(f'{board:<16} {encoding:<8}: setup {setup:.4f} solve {solve:.4f} count {count:.4f} cores {cores:.4f} seconds')
+
+
+def bench_game_setup(games=20):
+    """reports the per game cost of building the terms and rules afresh versus sharing them via the Registry."""
+    for encoding in sorted(ENCODINGS):
+        fresh = _mean_time(make_syntax, games, encoding)
+        Registry.syntax(encoding)
+        def new_game():
+            game = SudokuGame(BOARDS[0])
+            game.options.encoding = encoding # pylint: disable=W0640
+            game.start()
+            return game.solver
+        shared = _mean_time(new_game, games)
+        print(f'{encoding:<8}: fresh syntax {fresh:.5f} seconds, new game with the shared registry {shared:.5f} seconds')
+
+
+def bench_peer_updates(trials=200):
+    """reports the per update cost of the freedom analysis: filling an empty cell, and erasing then refilling a cell."""
+    grid = pyarray2puzzle(generate_grid())
+    cells = random.sample(list(grid.table.cells), grid.elements)
+    puzzle = grid.clone()
+    def fill():
+        puzzle.reset(puzzle.order)
+        for row, col in cells:
+            puzzle.set_cell(row, col, grid.get_cell(row, col))
+    def erase_and_refill():
+        for row, col in cells:
+            puzzle.erase_cell(row, col)
+            puzzle.set_cell(row, col, grid.get_cell(row, col))
+    filling = _mean_time(fill, trials) / grid.elements
+    erasing = _mean_time(erase_and_refill, trials) / grid.elements
+    checking = _mean_time(puzzle.sanity_check, trials, False)
+    print(f'fill: {1e6 * filling:.1f} erase and refill: {1e6 * erasing:.1f} sanity check: {1e6 * checking:.1f} microseconds')
+
+
+def bench_backtracking(count=8, trials=30):
+    """reports the cost of the python backtracking searches, which erase a cell on every backtrack."""
+    puzzles = [generate_puzzle(600, iterations=500)[1] for _ in range(count)]
+    solving = _mean_time(_solve_all, 1, _p_solve, puzzles) / count
+    choosing = _mean_time(_python_grid, trials, 3)
+    options = Options()
+    options.use_c = False
+    options.iterations = 20
+    # unreachable, so we always do every iteration
+    options.difficulty = 1000000
+    generating = _mean_time(SudokuGenerator(options).generate, 1)
+    print(f'solve: {solving:.4f} choose solution: {choosing:.4f} generate ({options.iterations} iterations): {generating:.4f} seconds')
+
+
+def bench_search(count=8, trials=5):
+    """reports the cost of the python solver undoing assignments via a trail versus cloning the puzzle and mutating it (and with sofa)."""
+    puzzles = [generate_puzzle(600, iterations=500)[1] for _ in range(count)]
+    for label, solver in (('trail', _p_solve), ('clone', _p_solve_clone), ('sofa', functools.partial(_p_solve, sofa=True))):
+        solving = _mean_time(_solve_all, trials, solver, puzzles) / count
+        print(f'{label:<6}: solve {solving:.4f} seconds')
+
+
+def _copying_solve(puzzle, solution, diff, sofa):
+    """solve_puzzle as it was: the puzzle is flattened into a list, copied into fresh C arrays and back, and the solution replayed cell by cell."""
+    dim = puzzle.dim
+    pypuz = [puzzle.grid[row][col] or 0 for row in range(dim) for col in range(dim)]
+    pysol = [0] * puzzle.elements
+    retval = db_solve_puzzle(pypuz, pysol, diff, sofa)
+    if retval == 0:
+        matrix = make_grid(dim)
+        for index, val in enumerate(pysol):
+            matrix[index // dim][index % dim] = val
+        solution.__init__(matrix, puzzle.order)
+    return retval
+
+def bench_bridge(count=50, trials=20):
+    """reports the per solve cost of the C solver when the puzzle and solution are copied versus passed in place."""
+    puzzles = [generate_puzzle(400, iterations=50)[1] for _ in range(count)]
+    solution = Puzzle()
+    for label, solver in (('copying', _copying_solve), ('in place', solve_puzzle)):
+        def solve_all():
+            for puzzle in puzzles:
+                solver(puzzle, solution, [0], False) # pylint: disable=W0640
+        solving = _mean_time(solve_all, trials) / count
+        print(f'{label:<8}: solve {1e6 * solving:.1f} microseconds')
+
+
+def _python_time(code, trials):
+    """returns the mean time, in seconds, of running the code in a fresh python."""
+    return _mean_time(subprocess.check_call, trials, [sys.executable, '-c', code])
+
+def bench_startup(trials=5):
+    """reports the cost of importing the C bindings (which load the C libraries lazily), loading each library, and the first (C) solves."""
+    bare = _python_time('import sudokusensei.DB', trials)
+    eager = _python_time('import sudokusensei.DB as db; [db.sugen_library(order) for order in db.ORDERS]', trials)
+    print(f'fresh python importing the bindings: {bare:.3f} seconds, and loading every library: {eager:.3f} seconds')
+    for order in ORDERS:
+        start = time.perf_counter()
+        available = native_available(order)
+        loading = time.perf_counter() - start
+        if not available:
+            print(f'order {order}: no C library ({native_failure(order)})')
+            continue
+        # a grid missing its first row, so the solve itself is trivial
+        puzzle = pyarray2puzzle(generate_grid(order))
+        for col in range(puzzle.dim):
+            puzzle.erase_cell(0, col)
+        start = time.perf_counter()
+        solve_puzzle(puzzle, None, [0], False)
+        first = time.perf_counter() - start
+        later = _mean_time(solve_puzzle, trials, puzzle, None, [0], False)
+        print(f'order {order}: loading the library {1e3 * loading:.2f} milliseconds, first solve {1e6 * first:.1f} later solves {1e6 * later:.1f} microseconds')
+
+def bench_minimize(count=20):
+    """reports the per puzzle cost of minimizing (C) generated puzzles with the C batch minimizer and the python one, and of verifying the result with yices."""
+    puzzles = [generate_puzzle(400, iterations=50)[1] for _ in range(count)]
+    minimal = {}
+    for label, use_c in (('C', True), ('python', False)):
+        options = Options()
+        options.use_c = use_c
+        start = time.perf_counter()
+        minimal[label] = SudokuGenerator(options).minimize_batch(puzzles)
+        elapsed = (time.perf_counter() - start) / count
+        erased = sum(after.empty_cells - before.empty_cells for before, after in zip(puzzles, minimal[label])) / count
+        print(f'{label:<6}: minimize {1e3 * elapsed:.2f} milliseconds, erasing {erased:.1f} clues on average')
+    solver = SudokuGame(None).solver
+    start = time.perf_counter()
+    verified = sum(1 for puzzle in minimal['C'] if solver.is_minimal(puzzle))
+    elapsed = (time.perf_counter() - start) / count
+    print(f'yices : verify {1e3 * elapsed:.2f} milliseconds, {verified}/{count} verified minimal')
+
+def bench_cache(count=10, seed=2023):
+    """reports the cost of generating puzzles without and with the score cache (under each eviction policy), in C and python, and its hit rate.
+
+    The generators are seeded identically for each configuration, so the cache must not change the puzzles they generate.
+    """
+    for label, use_c, iterations in (('C', True, 1000), ('python', False, 50)):
+        baseline = None
+        for capacity, eviction in ((0, 'lru'), (1 << 14, 'lru'), (1 << 14, 'fifo'), (256, 'lru'), (256, 'fifo')):
+            options = Options()
+            options.use_c = use_c
+            options.iterations = iterations
+            options.difficulty = 10000
+            options.score_cache = capacity
+            options.cache_eviction = eviction
+            generator = SudokuGenerator(options)
+            random.seed(seed)
+            if generator.native():
+                db_seed(seed)
+            start = time.perf_counter()
+            # the cache is deliberately shared across the generation calls
+            results = [generator.generate() for _ in range(count)]
+            elapsed = (time.perf_counter() - start) / count
+            stats = generator.cache_stats()
+            scores = [(score, tuple(puzzle.cells)) for score, puzzle in results]
+            baseline = scores if baseline is None else baseline
+            print(f'{label:<6}: capacity {capacity:>5} {eviction:<4} {1e3 * elapsed:8.1f} milliseconds per puzzle, hit rate {stats["hit_rate"]:.3f},'
+                  f' evictions {stats["evictions"]}, same puzzles: {scores == baseline}')
+
+def bench_render(keystrokes=200, seed=2023):
+    """reports the per keystroke frame time of the UI, with and without the freedom display (this needs a display)."""
+    import tkinter as tk # pylint: disable=C0415
+    from .SudokuUI import SudokuUI # pylint: disable=C0415
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f'render: no display ({e})')
+        return
+    game = SudokuGame('extreme3')
+    game.start()
+    ui = SudokuUI(root, game)
+    root.update()
+    empty = [cell for cell in game.start_puzzle.table.cells if game.start_puzzle.get_cell(*cell) is None]
+    random.seed(seed)
+    for display, var in (('Notes', ui.clear_var), ('Freedom', ui.show_var)):
+        # clearing the freedom display shows the notes
+        var.set('Freedom')
+        refreshing = painting = cells = 0
+        for _ in range(keystrokes):
+            ui.row, ui.col = random.choice(empty)
+            start = time.perf_counter()
+            ui.press('', random.choice('0123456789'))
+            root.update_idletasks()
+            painting += time.perf_counter() - start
+            refreshing += ui.frame_time
+            cells += ui.frame_cells
+            # winning would end the game
+            game.game_over = False
+        print(f'{display:<8}: refresh {1e3 * refreshing / keystrokes:.3f} milliseconds, keystroke (including painting) {1e3 * painting / keystrokes:.3f} milliseconds,'
+              f' {cells / keystrokes:.1f} cells reconfigured per keystroke')
+    root.destroy()
+
+def _rescan_win(puzzle):
+    """check_win as it was: rebuilds the set of values in every unit."""
+    values = set(range(1, puzzle.dim + 1))
+    return all({puzzle.grid[row][col] for row, col in unit} == values for unit in puzzle.table.unit_cells)
+
+def bench_moves(moves=20000, seed=2023):
+    """reports the per move cost of playing (a move and a win check) with the incremental board state, versus rescanning every unit."""
+    game = SudokuGame('extreme3')
+    game.start()
+    random.seed(seed)
+    empty = [cell for cell in game.start_puzzle.table.cells if game.start_puzzle.get_cell(*cell) is None]
+    plays = [(*random.choice(empty), random.randrange(game.puzzle.dim + 1)) for _ in range(moves)]
+    def play(check_win):
+        for row, col, val in plays:
+            if val:
+                game.set_cell(row, col, val)
+            else:
+                game.erase_cell(row, col)
+            check_win()
+    incremental = _mean_time(play, 1, game.state.solved) / moves
+    rescanning = _mean_time(play, 1, functools.partial(_rescan_win, game.puzzle)) / moves
+    print(f'move and win check: incremental {1e6 * incremental:.2f} rescanning {1e6 * rescanning:.2f} microseconds, {len(game.conflicts())} conflicting cells at the end')
+    # the worst case for rescanning: a solved board, where every unit has to be looked at
+    solution = Puzzle()
+    solve_puzzle(game.start_puzzle, solution, None, False)
+    for row, col in empty:
+        game.set_cell(row, col, solution.get_cell(row, col))
+    incremental = _mean_time(game.state.solved, moves)
+    rescanning = _mean_time(_rescan_win, moves, game.puzzle)
+    print(f'win check of a solved board: incremental {1e6 * incremental:.3f} rescanning {1e6 * rescanning:.3f} microseconds')
+
+def bench_game_solves(boards=('extreme3', 'hardest', 'ai_escargot'), trials=5):
+    """reports the cost of the game's solver calls when answered from the cached solution of the starting puzzle, versus by yices."""
+    for board in boards:
+        game = SudokuGame(board)
+        game.start()
+        # building the solver (and yices' terms) is not what we are measuring
+        game.solver # pylint: disable=W0104
+        start = time.perf_counter()
+        game.start_solution()
+        first = time.perf_counter() - start
+        timings = {}
+        for label in ('cached', 'yices'):
+            if label == 'yices':
+                game.bypass_start_solution()
+            timings[label] = [_mean_time(call, trials) for call in (game.solve, game.check, game.count_solutions, game.get_hint)]
+        cached, smt = timings['cached'], timings['yices']
+        print(f'{board:<12}: start solution {1e3 * first:.2f}, solve {1e3 * cached[0]:.2f} vs {1e3 * smt[0]:.2f}, check {1e3 * cached[1]:.2f} vs {1e3 * smt[1]:.2f},'
+              f' count {1e3 * cached[2]:.2f} vs {1e3 * smt[2]:.2f}, hint {1e3 * cached[3]:.1f} vs {1e3 * smt[3]:.1f} milliseconds (cached vs yices)')
+
+def bench_hints(board='extreme3', moves=10, think=1.0):
+    """reports the latency of asking for a hint during a scripted game (a move, a pause to think, a hint) with and without speculation."""
+    for speculative in (False, True):
+        game = SudokuGame(board)
+        game.options.speculative_hints = speculative
+        game.start()
+        latencies = []
+        for _ in range(moves):
+            time.sleep(think)
+            start = time.perf_counter()
+            hint, _ = game.get_hint()
+            latencies.append(time.perf_counter() - start)
+            if hint is None:
+                break
+            # the player takes the hint
+            game.set_cell(*hint[:3])
+        game.dispose()
+        label = 'speculative' if speculative else 'on demand'
+        print(f'{label:<11}: hint latency mean {1e3 * sum(latencies) / len(latencies):.1f} max {1e3 * max(latencies):.1f} milliseconds over {len(latencies)} hints')
+
+def _pickled_score(puzzle):
+    """scores a (pickled) puzzle with the C solver, returning the (code, difficulty) pair."""
+    diff = [0]
+    return (solve_puzzle(puzzle, None, diff, False), diff[0])
+
+def bench_batch(count=2000, workers=2, trials=3):
+    """reports the throughput of scoring puzzles with the C solver in worker processes, shipping pickled Puzzles versus a shared memory PuzzleBatch."""
+    puzzles = [generate_puzzle(400, iterations=20)[1] for _ in range(count)]
+    print(f'a pickled puzzle is {len(pickle.dumps(puzzles[0]))} bytes, in a batch it is {puzzles[0].elements} bytes (and {4 * len(COLUMNS)} bytes of scores)')
+    context = multiprocessing.get_context()
+    with context.Pool(workers) as pool:
+        pickled = _mean_time(pool.map, trials, _pickled_score, puzzles, count // (4 * workers))
+    with PuzzleBatch.from_puzzles(puzzles) as batch:
+        shared = _mean_time(score_batch, trials, batch, 'c', False, workers)
+    print(f'{workers} workers: pickled {count / pickled:.0f} puzzles per second, shared memory {count / shared:.0f} puzzles per second (including starting the workers)')
+
+def bench_store(count=2000, trials=20):
+    """reports the cost of finding the puzzles with difficulty 600-700 and 55-60 empty cells in a PuzzleStore, versus scoring every puzzle."""
+    options = Options()
+    options.difficulty = 700
+    with PuzzleStore() as store:
+        store.add_generated(count, options)
+        ranges = {'difficulty': (600, 700), 'empty': (55, 60)}
+        querying = _mean_time(functools.partial(store.query, **ranges), trials)
+        sampling = _mean_time(functools.partial(store.draw, **ranges), trials)
+        puzzles = [record2puzzle(record) for record in store.query()]
+        scoring = _mean_time(_solve_all, 1, solve_puzzle, puzzles)
+        print(f'{len(store)} puzzles, {store.count(**ranges)} in range: query {1e3 * querying:.3f} random draw {1e3 * sampling:.3f} scoring everything {1e3 * scoring:.1f} milliseconds')
+
+
+def _random_cores(count, card, seed):
+    """returns count random (i, j, val, terms) cores over card rules (the terms are just the rule numbers)."""
+    rng = random.Random(seed)
+    return [(rng.randrange(9), rng.randrange(9), rng.randrange(1, 10), rng.sample(range(card), rng.randrange(1, card + 1))) for _ in range(count)]
+
+def bench_cores(count=50000, cutoff=50, trials=5, seed=2023):
+    """reports the memory, and the time to add, rank and score, count (random) unsat cores."""
+    rules = list(range(27))
+    raw = _random_cores(count, len(rules), seed)
+    tracemalloc.start()
+    # what each core used to cost: a tuple holding a list of terms
+    tuples = [(i, j, val, list(terms)) for i, j, val, terms in raw]
+    before = tracemalloc.get_traced_memory()[0]
+    del tuples
+    tracemalloc.stop()
+    tracemalloc.start()
+    cores = Cores(rules)
+    for core in raw:
+        cores.add(*core)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    def fill():
+        filled = Cores(rules)
+        for core in raw:
+            filled.add(*core)
+    adding = _mean_time(fill, trials)
+    ranking = _mean_time(cores.least, trials, cutoff)
+    scoring = _mean_time(cores.metric, trials, False)
+    print(f'{count} cores: {before / count:.1f} bytes per core as tuples, {after / count:.1f} as masks; '
+          f'add {1e3 * adding:.1f} least({cutoff}) {1e3 * ranking:.2f} metric {1e3 * scoring:.3f} milliseconds')
+
+
+def _correlation(xs, ys):
+    """returns the (Pearson) correlation of the two samples."""
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    sxy = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    sxx = sum((x - mx) ** 2 for x in xs)
+    syy = sum((y - my) ** 2 for y in ys)
+    return sxy / (sxx * syy) ** 0.5 if sxx and syy else 0.0
+
+def bench_metric(limit=None):
+    """calibrates the (C, propagation) approximate core metric against the (yices) core metric on the order 3 boards in the data directory."""
+    directory = resource_path('data')
+    exact = []
+    approximate = []
+    raw = []
+    times = [0.0, 0.0]
+    names = sorted(name[:-len('.sudoku')] for name in os.listdir(directory) if name.endswith('.sudoku'))
+    for name in names[:limit]:
+        game = SudokuGame(name)
+        game.start()
+        if game.puzzle.order != 3 or game.puzzle.empty_cells == 0 or approximate_core_metric(game.puzzle) < 0:
+            continue
+        for position, engine in enumerate(('yices', 'propagation')):
+            game.options.metric_engine = engine
+            start = time.perf_counter()
+            metric = game.get_metric()
+            times[position] += time.perf_counter() - start
+            (exact if engine == 'yices' else approximate).append(metric)
+        raw.append(2 * sum(core_sizes(game.puzzle)) / (3 * game.puzzle.dim))
+        print(f'{name:<24}: yices {exact[-1]:3d} propagation {approximate[-1]:3d}')
+    scale = sum(x * y for x, y in zip(raw, exact)) / sum(x * x for x in raw)
+    error = sum(abs(x - y) for x, y in zip(approximate, exact)) / len(exact)
+    print(f'{len(exact)} boards: correlation {_correlation(approximate, exact):.3f} mean absolute error {error:.2f} '
+          f'best scale {scale:.2f} (CORE_METRIC_SCALE is {CORE_METRIC_SCALE}) speedup {times[0] / times[1]:.0f}x '
+          f'({times[0]:.1f} versus {times[1]:.3f} seconds)')
+
+
+def bench_trace(board='extreme3', trials=100):
+    """prints the per stage breakdown of generating a puzzle (in C and python) and of its core metric, and reports what tracing costs."""
+    game = SudokuGame(board)
+    game.options.trace = True
+    for use_c in (True, False):
+        game.options.use_c = use_c
+        game.new()
+        print(game.trace.report())
+    game.options.use_c = True
+    game.start_puzzle = Puzzle.resource2puzzle(board)
+    game.start()
+    game.options.trace_path = os.path.join(tempfile.gettempdir(), 'sensei_metric_trace.json')
+    game.get_metric()
+    print(game.trace.report())
+    print(f'Chrome trace of the core metric: {game.options.trace_path}')
+    game.options.trace_path = None
+    game.options.metric_engine = 'propagation'
+    costs = []
+    for trace in (False, True):
+        game.options.trace = trace
+        costs.append(_mean_time(game.new, trials))
+    print(f'new (C, {trials} trials): {1e3 * costs[0]:.3f} milliseconds untraced, {1e3 * costs[1]:.3f} traced')
+
+
+def bench_adaptive(trials=50, iterations=1000):
+    """reports the expected time-to-target (the time per puzzle that reaches the target) of fixed versus adaptive hardening, in C and python."""
+    for use_c, targets, count in ((True, (600, 800, 1000), trials), (False, (500, 700), max(1, trials // 5))):
+        for target in targets:
+            for adaptive in (False, True):
+                options = Options()
+                options.use_c = use_c
+                options.difficulty = target
+                options.iterations = iterations
+                options.adaptive_hardening = adaptive
+                generator = SudokuGenerator(options)
+                hits = runs = gave_up = 0
+                start = time.perf_counter()
+                for _ in range(count):
+                    score, _ = generator.generate()
+                    stats = generator.schedule_stats()
+                    hits += score >= target
+                    runs += stats['runs']
+                    gave_up += stats['gave_up']
+                elapsed = time.perf_counter() - start
+                expected = f'{1e3 * elapsed / hits:9.1f}' if hits else '      inf'
+                print(f'{"C" if use_c else "python":<6} target {target:4d} {"adaptive" if adaptive else "fixed   "}: hit {hits:3d}/{count} '
+                      f'runs/puzzle {runs / count:5.2f} gave up {gave_up:3d} mean {1e3 * elapsed / count:8.1f} ms time-to-target {expected} ms')
+
+
+# the pip entry points, followed by the modules the headless tools use.
+IMPORTS = ('Main', 'TestMain', 'Benchmarks', 'SudokuLib', 'DB', 'SudokuGenerator', 'GridLibrary', 'SudokuGame')
+
+# the expensive imports, which only the UI (tkinter) and SMT (yices) features should pay for.
+HEAVY = ('tkinter', 'yices', 'pkg_resources')
+
+def bench_imports(trials=5):
+    """reports the time to import each entry point (and core module) in a fresh python, and which expensive modules it drags in."""
+    for module in IMPORTS:
+        code = f'import sys, time; start = time.perf_counter(); import sudokusensei.{module}; print(time.perf_counter() - start, *[m for m in {HEAVY} if m in sys.modules])'
+        total = 0
+        for _ in range(trials):
+            elapsed, *heavy = subprocess.check_output([sys.executable, '-c', code], text=True).split()
+            total += float(elapsed)
+        print(f'{module:<16}: {total / trials:.4f} seconds, loads: {" ".join(heavy) if heavy else "nothing expensive"}')
+
+
+BENCHMARKS = {
+    'parallel': bench_parallel_hardening,
+    'constrained': bench_constrained_generation,
+    'scaling': bench_scaling,
+    'encodings': bench_encodings,
+    'setup': bench_game_setup,
+    'peers': bench_peer_updates,
+    'backtracking': bench_backtracking,
+    'search': bench_search,
+    'bridge': bench_bridge,
+    'startup': bench_startup,
+    'imports': bench_imports,
+    'minimize': bench_minimize,
+    'cache': bench_cache,
+    'render': bench_render,
+    'moves': bench_moves,
+    'solves': bench_game_solves,
+    'hints': bench_hints,
+    'batch': bench_batch,
+    'store': bench_store,
+    'cores': bench_cores,
+    'metric': bench_metric,
+    'trace': bench_trace,
+    'adaptive': bench_adaptive,
+}
+
+
+def main():
+    """main is the pip entry point."""
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('benchmark',
+                            help='Desired benchmark',
+                            choices=sorted(BENCHMARKS.keys()))
+    args = arg_parser.parse_args()
+    BENCHMARKS[args.benchmark]()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""BoardState incrementally tracks how complete, and how consistent, the board of a game in progress is.
+
+For each unit (see Peers) we count the cells that contain each value, and for each cell the number of its units in
+which another cell contains the same value. A move only touches the three units of its cell, so keeping these up to
+date costs O(dim) per move, and whether the game has been won is known without looking at the board at all.
+"""
+
+from .Peers import peer_table
+
+
+class BoardState:
+    """The per unit value counts, and the conflicting cells, of a board."""
+
+    def __init__(self, puzzle):
+        self.table = peer_table(puzzle.order)
+        self.dim = puzzle.dim
+        # the contents of each cell, 0 if empty
+        self.cells = [0] * self.table.elements
+        # the number of cells in unit u that contain val is at u * (dim + 1) + val
+        self.counts = [0] * (len(self.table.units) * (self.dim + 1))
+        # the number of units in which each cell shares its value with another cell
+        self.clashes = [0] * self.table.elements
+        # the indexes of the cells that share their value with a peer
+        self.conflicts = set()
+        # the number of non empty cells
+        self.filled = 0
+        for index, val in enumerate(puzzle.cells):
+            if val != 0:
+                self.update(index, val)
+
+    def update(self, index, val):
+        """records that the cell with the given index now contains val (0 if it has been erased)."""
+        old = self.cells[index]
+        if old == val:
+            return
+        if old != 0:
+            self._remove(index, old)
+        if val != 0:
+            self._add(index, val)
+
+    def _clash(self, index, delta):
+        self.clashes[index] += delta
+        if self.clashes[index]:
+            self.conflicts.add(index)
+        else:
+            self.conflicts.discard(index)
+
+    def _add(self, index, val):
+        width = self.dim + 1
+        cells = self.cells
+        for unit in self.table.cell_units[index]:
+            slot = unit * width + val
+            self.counts[slot] += 1
+            if self.counts[slot] == 2:
+                # the cell that had val to itself now clashes too
+                for other in self.table.units[unit]:
+                    if cells[other] == val:
+                        self._clash(other, 1)
+            if self.counts[slot] >= 2:
+                self._clash(index, 1)
+        cells[index] = val
+        self.filled += 1
+
+    def _remove(self, index, val):
+        width = self.dim + 1
+        cells = self.cells
+        cells[index] = 0
+        self.filled -= 1
+        for unit in self.table.cell_units[index]:
+            slot = unit * width + val
+            self.counts[slot] -= 1
+            if self.counts[slot] >= 1:
+                self._clash(index, -1)
+            if self.counts[slot] == 1:
+                # the cell left with val to itself no longer clashes
+                for other in self.table.units[unit]:
+                    if cells[other] == val:
+                        self._clash(other, -1)
+
+    def count(self, unit, val):
+        """returns the number of cells in the unit (an index into PeerTable.units) that contain val."""
+        return self.counts[unit * (self.dim + 1) + val]
+
+    def conflict_cells(self):
+        """returns the set of [row, col] cells that share their value with a peer."""
+        return {self.table.cells[index] for index in self.conflicts}
+
+    def solved(self):
+        """returns True if every cell is filled, and no cell shares its value with a peer, i.e. the board is a solution grid."""
+        return self.filled == self.table.elements and not self.conflicts
+
+    def agrees(self, puzzle):
+        """returns True if we are tracking the current contents of the puzzle (for sanity checking)."""
+        return bytes(self.cells) == bytes(puzzle.cells)
@@ -1,52 +1,119 @@
 """python bindings for Daniel Beer's Sudoku Generation library."""
-import os
 import os.path
-import sys
+import threading
 
 from ctypes import (
     c_bool,
+    c_double,
     c_uint8,
     c_int32,
     c_uint32,
+    c_uint64,
     CDLL,
     POINTER,
+    byref,
 )
 
-from pkg_resources import resource_filename
 
+from .SudokuLib import SudokuError, Puzzle, order2dim, ORDERS
+from .Native import sugen_library_name, sugen_library_path # pylint: disable=W0611
+from .ScoreCache import EVICTIONS
 
-from .SudokuLib import SudokuError, Puzzle, make_grid
+# the loaded libraries, one per order, since the C is compiled for a fixed ORDER.
+_libraries = {}
 
-def sugen_library_name():
-    """attempts to guess the name of the sugen library."""
-    lib_basename = 'lib' + 'sugen'
-    extension = '.so'
-    if sys.platform == 'win32':
-        extension = '.dll'
-    elif sys.platform == 'cygwin':
-        lib_basename = 'cyg' + 'sugen'
-        extension = '.dll'
-    elif sys.platform == 'darwin':
-        extension = '.dylib'
-    return f'{lib_basename}{extension}'
+# why the library for an order could not be loaded, so we only try (and fail) once.
+_failures = {}
 
-libsugen = sugen_library_name()
+def _declare(lib):
+    """declares the signatures of the library's API (see lib/sugen.h)."""
+    #void db_debug(bool dbg);
+    lib.db_debug.argtypes = [c_bool]
+    #void db_seed(uint32_t seed);
+    lib.db_seed.argtypes = [c_uint32]
+    #int32_t db_order(void);
+    lib.db_order.restype = c_int32
+    lib.db_order.argtypes = []
+    #void db_generate_puzzle(uint8_t* puzzle, uint32_t* difficultyp, uint32_t target_difficulty, uint32_t max_difficulty, uint32_t iterations, bool sofa);
+    lib.db_generate_puzzle.argtypes = [POINTER(c_uint8), POINTER(c_uint32), c_uint32, c_uint32, c_uint32, c_bool]
+    #int32_t db_solve_puzzle(uint8_t* puzzle, uint8_t* solution, uint32_t* difficultyp, bool sofa);
+    lib.db_solve_puzzle.restype = c_int32
+    lib.db_solve_puzzle.argtypes = [POINTER(c_uint8), POINTER(c_uint8), POINTER(c_uint32), c_bool]
+    #void db_generate_grid(uint8_t* grid);
+    lib.db_generate_grid.argtypes = [POINTER(c_uint8)]
+    #void db_harden_puzzle(const uint8_t* solution, uint8_t* puzzle, uint32_t* difficultyp, uint32_t difficulty, int32_t max_difficulty, uint32_t iterations, bool sofa,
+    #                      int32_t symmetry, int32_t min_clues, int32_t max_clues);
+    lib.db_harden_puzzle.argtypes = [POINTER(c_uint8), POINTER(c_uint8), POINTER(c_uint32), c_uint32, c_int32, c_uint32, c_bool, c_int32, c_int32, c_int32]
+    #int32_t db_minimize_puzzles(uint8_t* puzzles, int32_t* removed, uint32_t count, bool shuffle);
+    lib.db_minimize_puzzles.restype = c_int32
+    lib.db_minimize_puzzles.argtypes = [POINTER(c_uint8), POINTER(c_int32), c_uint32, c_bool]
+    #int32_t db_cache_configure(uint32_t capacity, int32_t eviction);
+    lib.db_cache_configure.restype = c_int32
+    lib.db_cache_configure.argtypes = [c_uint32, c_int32]
+    #void db_cache_clear(void);
+    lib.db_cache_clear.argtypes = []
+    #void db_cache_stats(uint64_t* stats);
+    lib.db_cache_stats.argtypes = [POINTER(c_uint64)]
+    #void db_schedule_configure(int32_t patience, double min_odds);
+    lib.db_schedule_configure.argtypes = [c_int32, c_double]
+    #void db_schedule_stats(uint32_t* stats);
+    lib.db_schedule_stats.argtypes = [POINTER(c_uint32)]
+    #int32_t db_core_sizes(const uint8_t* puzzle, uint8_t* sizes);
+    lib.db_core_sizes.restype = c_int32
+    lib.db_core_sizes.argtypes = [POINTER(c_uint8), POINTER(c_uint8)]
 
-libsugenpath = resource_filename('sudokusensei', 'lib/libsugen.dylib')
+def sugen_library(order=3):
+    """returns the (cached) sugen library compiled for the given order, loading it on first use."""
+    if order in _libraries:
+        return _libraries[order]
+    if order in _failures:
+        raise SudokuError(_failures[order])
+    order2dim(order)
+    path = sugen_library_path(order)
+    try:
+        if not os.path.exists(path):
+            raise SudokuError(f'The necessary shared library {path} does not exist.')
+        try:
+            lib = CDLL(path)
+        except OSError as e:
+            raise SudokuError(f'The necessary shared library {path} did not load: {e}') from e
+        _declare(lib)
+        if lib.db_order() != order:
+            raise SudokuError(f'The shared library {path} was compiled for order {lib.db_order()} not {order}.')
+    except SudokuError as e:
+        _failures[order] = str(e)
+        raise
+    _libraries[order] = lib
+    return lib
 
-if not os.path.exists(libsugenpath):
-    raise SudokuError(f'The necessary shared library {libsugenpath} does not exist.')
+def native_available(order=3):
+    """returns True if the sugen library for the given order can be loaded (loading it if need be)."""
+    try:
+        sugen_library(order)
+        return True
+    except SudokuError:
+        return False
 
-libsugen = CDLL(libsugenpath)
+def native_failure(order=3):
+    """returns the reason the sugen library for the given order could not be loaded, or None if it has not failed."""
+    return _failures.get(order)
 
-if libsugen is None:
-    raise SudokuError(f'The necessary shared library {libsugenpath} did not load.')
+def elements2order(elements):
+    """returns the order of a board with the given number of cells, e.g. 3 for 81."""
+    for order in ORDERS:
+        if order ** 4 == elements:
+            return order
+    raise SudokuError(f'Unsupported number of cells: {elements}')
+
+def _library(pyarray):
+    """returns the library that handles puzzles the length of pyarray."""
+    return sugen_library(elements2order(len(pyarray)))
 
 def make_puzzle_array(pyarray):
     """Makes a C term array object from a python array object"""
-    assert len(pyarray) == 81
     retval = None
     if pyarray is not None:
+        elements2order(len(pyarray))
         #weird python and ctype magic
         retval = (c_uint8 * len(pyarray))(*pyarray)
     return retval
@@ -60,101 +127,218 @@ def make_uint32_array(pyarray):
     return retval
 
 def puzzle2pyarray(puzzle):
-    """flattens a puzzle to an array of length 81."""
-    retval = [0] * 81
-    matrix = puzzle.grid
-    for row in range(9):
-        for col in range(9):
-            val = matrix[row][col]
-            if val is not None:
-                retval[9 * row + col] = val
-    return retval
+    """flattens a puzzle to an array of length puzzle.elements (81 for a regular puzzle)."""
+    return list(puzzle.cells)
 
 def pyarray2puzzle(pyarray):
-    """creates a puzzle from pyarray of length 81."""
-    assert (len(pyarray)) == 81
-    matrix = make_grid()
-    for row in range(9):
-        for col in range(9):
-            val = pyarray[9 * row + col]
-            if val != 0:
-                matrix[row][col] = val
-    return Puzzle(matrix)
-
-
-#void db_debug(bool dbg);
-libsugen.db_debug.argtypes = [c_bool]
-def db_debug(dbg):
+    """creates a puzzle from pyarray of length 81 (or 16, 256, 625 for the other orders)."""
+    puzzle = Puzzle(order=elements2order(len(pyarray)))
+    puzzle.load(pyarray)
+    return puzzle
+
+def puzzle_buffer(puzzle):
+    """returns a C array that shares the puzzle's cells (no copying), so it must not outlive them."""
+    return (c_uint8 * puzzle.elements).from_buffer(puzzle.buffer())
+
+# the per thread, per order, preallocated solution buffers and difficulty of solve_puzzle.
+_scratch = threading.local()
+
+def _scratch_buffers(order):
+    """returns this thread's reusable C solution buffer, for puzzles of the given order, and difficulty."""
+    if not hasattr(_scratch, 'solutions'):
+        _scratch.solutions = {}
+        _scratch.difficulty = c_uint32()
+    if order not in _scratch.solutions:
+        _scratch.solutions[order] = (c_uint8 * order2dim(order) ** 2)()
+    return (_scratch.solutions[order], _scratch.difficulty)
+
+
+def db_debug(dbg, order=3):
     """switches on/off 'informative' print statments."""
-    libsugen.db_debug(dbg)
+    sugen_library(order).db_debug(dbg)
+
+def db_seed(seed, order=3):
+    """seeds the random number generator used by the C generators."""
+    sugen_library(order).db_seed(seed)
 
-#void db_generate_puzzle(uint8_t* puzzle, uint32_t* difficultyp, uint32_t target_difficulty, uint32_t max_difficulty, uint32_t iterations, bool sofa);
-libsugen.db_generate_puzzle.argtypes = [POINTER(c_uint8), POINTER(c_uint32), c_uint32, c_uint32, c_uint32, c_bool]
 def db_generate_puzzle(puzzle, difficultyp, target_difficulty, max_difficulty, iterations, sofa):
-    """call's daniel beer's puzzle generator."""
-    assert len(puzzle) == 81
+    """call's daniel beer's puzzle generator, the length of puzzle determines the order."""
     assert len(difficultyp) == 1
     cpuzzle = make_puzzle_array(puzzle)
     cdifficultyp = make_uint32_array(difficultyp) if difficultyp is not None else None
-    libsugen.db_generate_puzzle(cpuzzle, cdifficultyp, target_difficulty, max_difficulty, iterations, sofa)
+    _library(puzzle).db_generate_puzzle(cpuzzle, cdifficultyp, target_difficulty, max_difficulty, iterations, sofa)
     difficultyp[0] = cdifficultyp[0]
-    for cell in range(81):
+    for cell in range(len(puzzle)):
         puzzle[cell] = cpuzzle[cell]
 
-#int32_t db_solve_puzzle(uint8_t* puzzle, uint8_t* solution, uint32_t* difficultyp, bool sofa);
-libsugen.db_solve_puzzle.restype = c_int32
-libsugen.db_solve_puzzle.argtypes = [POINTER(c_uint8), POINTER(c_uint8), POINTER(c_uint32), c_bool]
 def db_solve_puzzle(puzzle, solution, difficultyp, sofa):
     """call's daniel beer's puzzle solver, both solution and difficultyp can be NULL."""
     # explain the arguments
-    assert len(puzzle) == 81
-    assert solution is None or len(solution) == 81
+    assert solution is None or len(solution) == len(puzzle)
     assert difficultyp is None or len(difficultyp) == 1
     cpuzzle = make_puzzle_array(puzzle)
     csolution = make_puzzle_array(solution) if solution is not None else None
     cdifficultyp = make_uint32_array(difficultyp) if difficultyp is not None else None
-    retval = libsugen.db_solve_puzzle(cpuzzle, csolution, cdifficultyp, sofa)
+    retval = _library(puzzle).db_solve_puzzle(cpuzzle, csolution, cdifficultyp, sofa)
     if difficultyp is not None:
         difficultyp[0] = cdifficultyp[0]
     if retval == 0 and solution is not None:
-        for cell in range(81):
+        for cell in range(len(solution)):
             solution[cell] = csolution[cell]
     return retval
 
+def db_generate_grid(grid):
+    """call's daniel beer's solution grid generator, the length of grid determines the order."""
+    cgrid = make_puzzle_array(grid)
+    _library(grid).db_generate_grid(cgrid)
+    for cell in range(len(grid)):
+        grid[cell] = cgrid[cell]
+
+def db_harden_puzzle(solution, puzzle, difficultyp, target_difficulty, max_difficulty, iterations, sofa, symmetry=1, min_clues=0, max_clues=None): # pylint: disable=R0913
+    """call's daniel beer's puzzle hardener on a puzzle that agrees with the given solution grid.
+
+    symmetry is one of the SYMMETRY constants in sugen.h (the default is daniel beer's rotational symmetry),
+    a max_clues of None means no upper bound.
+    """
+    assert len(solution) == len(puzzle)
+    assert len(difficultyp) == 1
+    if max_clues is None:
+        max_clues = len(puzzle)
+    csolution = make_puzzle_array(solution)
+    cpuzzle = make_puzzle_array(puzzle)
+    cdifficultyp = make_uint32_array(difficultyp)
+    _library(puzzle).db_harden_puzzle(csolution, cpuzzle, cdifficultyp, target_difficulty, max_difficulty, iterations, sofa, symmetry, min_clues, max_clues)
+    difficultyp[0] = cdifficultyp[0]
+    for cell in range(len(puzzle)):
+        puzzle[cell] = cpuzzle[cell]
+
 def solve_puzzle(puzzle, solution, diff, sofa):
-    """SudokuSensei interface to Daniel Beer's solver."""
-    pypuz = puzzle2pyarray(puzzle)
-    pysol = puzzle2pyarray(solution) if solution is not None else None
-    difficulty = [0]
-    retval = db_solve_puzzle(pypuz, pysol, difficulty, sofa)
+    """SudokuSensei interface to Daniel Beer's solver, the puzzle is passed to the C in place."""
+    csolution, difficulty = _scratch_buffers(puzzle.order)
+    retval = sugen_library(puzzle.order).db_solve_puzzle(puzzle_buffer(puzzle), csolution if solution is not None else None, byref(difficulty), sofa)
     if retval == 0:
         if solution is not None:
-            csol = pyarray2puzzle(pysol)
-            solution.copy(csol)
+            if solution.order != puzzle.order:
+                solution.reset(puzzle.order)
+            solution.load(csolution)
         if diff is not None:
-            diff[0] = difficulty[0]
+            diff[0] = difficulty.value
     return retval
 
-def generate_puzzle(target, sofa=False, max_difficulty=-1, iterations=200):
+def solve_buffer(buffer, order=3, sofa=False, offset=0):
+    """solves the puzzle whose cells are the bytes of the (writable) buffer from offset on, e.g. shared memory, in place.
+
+    Returns the (code, difficulty) pair, where code is 0 if the solution is unique (see db_solve_puzzle).
+    """
+    cpuzzle = (c_uint8 * order2dim(order) ** 2).from_buffer(buffer, offset)
+    difficulty = c_uint32()
+    code = sugen_library(order).db_solve_puzzle(cpuzzle, None, byref(difficulty), sofa)
+    return (code, difficulty.value)
+
+def generate_puzzle(target, sofa=False, max_difficulty=-1, iterations=200, order=3): # pylint: disable=R0913
     """SudokuSensei interface to Daniel Beer's generator."""
-    pypuz = [0] * 81
+    pypuz = [0] * order2dim(order) ** 2
     diff = [0]
     db_generate_puzzle(pypuz, diff, target, max_difficulty, iterations, sofa)
     puzzle = pyarray2puzzle(pypuz)
     return (diff[0], puzzle)
 
+def generate_grid(order=3):
+    """SudokuSensei interface to Daniel Beer's solution grid generator, returns a pyarray of length 81 (for order 3)."""
+    pygrid = [0] * order2dim(order) ** 2
+    db_generate_grid(pygrid)
+    return pygrid
+
+def harden_puzzle(grid, target, sofa=False, max_difficulty=-1, iterations=200, symmetry=1, min_clues=0, max_clues=None): # pylint: disable=R0913
+    """SudokuSensei interface to Daniel Beer's hardener, starting from the given solution grid (a pyarray of length 81, or 16, 256, 625)."""
+    pypuz = list(grid)
+    diff = [0]
+    db_harden_puzzle(grid, pypuz, diff, target, max_difficulty, iterations, sofa, symmetry, min_clues, max_clues)
+    puzzle = pyarray2puzzle(pypuz)
+    return (diff[0], puzzle)
+
+def minimize_puzzles(puzzles, shuffle=True):
+    """SudokuSensei interface to the C minimizer, returns a (removed, puzzle) pair for each of the puzzles (which must all have the same order).
+
+    Each puzzle is a minimal copy of the original, with removed clues erased, unless the original does not
+    have a unique solution, in which case removed is -1 and the puzzle is an unaltered copy.
+    """
+    if not puzzles:
+        return []
+    order = puzzles[0].order
+    if any(puzzle.order != order for puzzle in puzzles):
+        raise SudokuError('minimize_puzzles: the puzzles must all have the same order')
+    elements = puzzles[0].elements
+    batch = bytearray(b''.join(puzzle.cells for puzzle in puzzles))
+    cbatch = (c_uint8 * len(batch)).from_buffer(batch)
+    cremoved = (c_int32 * len(puzzles))()
+    sugen_library(order).db_minimize_puzzles(cbatch, cremoved, len(puzzles), shuffle)
+    results = []
+    for index in range(len(puzzles)):
+        puzzle = Puzzle(order=order)
+        puzzle.load(batch[index * elements:(index + 1) * elements])
+        results.append((cremoved[index], puzzle))
+    return results
+
+def cache_configure(capacity, eviction='lru', order=3):
+    """empties the C hardener's score cache and resizes it to hold (at least) capacity entries (0 disables it), returns the actual capacity.
+
+    eviction is one of ScoreCache.EVICTIONS ('lru' or 'fifo').
+    """
+    if eviction not in EVICTIONS:
+        raise SudokuError(f'No such eviction policy: {eviction}')
+    retval = sugen_library(order).db_cache_configure(capacity, EVICTIONS.index(eviction))
+    if retval < 0:
+        raise SudokuError(f'cache_configure: could not allocate {capacity} entries')
+    return retval
+
+def cache_clear(order=3):
+    """empties the C hardener's score cache, and zeroes its statistics."""
+    sugen_library(order).db_cache_clear()
+
+def cache_stats(order=3):
+    """returns the statistics of the C hardener's score cache as a dictionary (the same keys as ScoreCache.stats)."""
+    stats = (c_uint64 * 4)()
+    sugen_library(order).db_cache_stats(stats)
+    lookups, hits, insertions, evictions = stats
+    return {'lookups': lookups, 'hits': hits, 'insertions': insertions, 'evictions': evictions, 'hit_rate': hits / lookups if lookups else 0.0}
+
+def schedule_configure(patience, min_odds, order=3):
+    """configures the C hardening schedule (see HardeningSchedule), a patience of 0 is Daniel Beer's single run."""
+    sugen_library(order).db_schedule_configure(patience, min_odds)
+
+def schedule_stats(order=3):
+    """returns the statistics of the C's last hardening as a dictionary (the same keys as HardeningSchedule.stats)."""
+    stats = (c_uint32 * 3)()
+    sugen_library(order).db_schedule_stats(stats)
+    runs, iterations, gave_up = stats
+    return {'runs': runs, 'iterations': iterations, 'gave_up': bool(gave_up)}
+
+def core_sizes(puzzle):
+    """returns the per cell sizes of the C's (propagation based) approximate unsat cores of the puzzle (0 for its clues), or None if its solution is not unique."""
+    csizes = (c_uint8 * puzzle.elements)()
+    if sugen_library(puzzle.order).db_core_sizes(puzzle_buffer(puzzle), csizes) < 0:
+        return None
+    return list(csizes)
+
+# propagation needs more units than yices does to force a cell, so the approximate metric is scaled to match core_metric
+# (the least squares fit over the order 3 boards in the data directory, see senseibench metric).
+CORE_METRIC_SCALE = 0.78
+
+def approximate_core_metric(puzzle):
+    """returns the C's approximation of SudokuSolver.core_metric, CORE_METRIC_SCALE * 2 * (the sum of the core sizes) / (the number of units), or -1 if the solution is not unique."""
+    total = sugen_library(puzzle.order).db_core_sizes(puzzle_buffer(puzzle), None)
+    if total < 0:
+        return -1
+    return round(CORE_METRIC_SCALE * 2 * total / (3 * puzzle.dim))
+
 def test_solve():
     """test the solver."""
     puzzle = Puzzle.resource2puzzle('extreme3')
     solution = Puzzle()
     puzzle.pprint()
-    pypuz = puzzle2pyarray(puzzle)
-    pysol = puzzle2pyarray(solution)
     diff = [0]
-    retval = db_solve_puzzle(pypuz, pysol, diff, True)
-    if retval == 0:
-        csol = pyarray2puzzle(pysol)
-        solution.copy(csol)
+    solve_puzzle(puzzle, solution, diff, True)
     print(f'Difficulty = {diff[0]}')
     solution.pprint()
 
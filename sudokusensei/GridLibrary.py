@@ -0,0 +1,161 @@
+"""GridLibrary is a compact, memory mappable, store of valid solution grids.
+
+A library file is a small header followed by 81 bytes per grid (one digit per cell, row major),
+which is exactly the layout the C library expects (other orders use order^4 bytes per grid).
+Drawing a grid picks a stored grid at random and pushes it through a random element of the Sudoku
+symmetry group (band, stack, row and column permutations, transposition and digit relabeling).
+Every element of the group maps a valid grid to a valid grid, so a draw costs O(81) rather than
+a backtracking search.
+
+If there is no library file we expand a single seed grid through the symmetry group, which is
+cheap but only ever produces grids from that one equivalence class.
+"""
+
+import mmap
+import os.path
+import random
+import struct
+import time
+
+from .SudokuLib import SudokuError, resource_path, order2dim
+from .DB import pyarray2puzzle, generate_grid
+
+MAGIC = b'SUGRID02'
+
+# the magic number followed by the order of the grids and the number of grids in the library
+HEADER = struct.Struct('<8sII')
+
+def grid_size(order=3):
+    """returns the number of bytes in a grid of the given order, i.e. 81 for order 3."""
+    return order2dim(order) ** 2
+
+def seed_grid(order=3):
+    """returns a valid solution grid (as bytes) without doing any search."""
+    dim = order2dim(order)
+    return bytes(((order * (row % order) + row // order + col) % dim) + 1 for row in range(dim) for col in range(dim))
+
+def _shuffled(seq):
+    """returns a randomly shuffled copy of seq."""
+    return random.sample(seq, len(seq))
+
+def random_transformation(order=3):
+    """returns a random element of the symmetry group as an (index_map, relabeling) pair.
+
+    Cell i of the transformed grid is relabeling[grid[index_map[i]]].
+    """
+    dim = order2dim(order)
+    rows = [order * band + row for band in _shuffled(range(order)) for row in _shuffled(range(order))]
+    cols = [order * stack + col for stack in _shuffled(range(order)) for col in _shuffled(range(order))]
+    if random.random() < 0.5:
+        index_map = tuple(dim * rows[row] + cols[col] for row in range(dim) for col in range(dim))
+    else:
+        index_map = tuple(dim * rows[col] + cols[row] for row in range(dim) for col in range(dim))
+    digits = _shuffled(range(1, dim + 1))
+    # a bytes.translate table that leaves 0 (and everything else) alone
+    relabeling = bytearray(range(256))
+    for digit in range(1, dim + 1):
+        relabeling[digit] = digits[digit - 1]
+    return (index_map, bytes(relabeling))
+
+def transform(grid, transformation):
+    """applies the transformation to the grid (a sequence of 81, or order^4, digits), returning bytes."""
+    index_map, relabeling = transformation
+    return bytes(grid[index] for index in index_map).translate(relabeling)
+
+
+class GridLibrary:
+    """A (possibly empty) memory mapped collection of solution grids."""
+
+    # the shared libraries, indexed by order.
+    _defaults = {}
+
+    def __init__(self, path=None, order=3):
+        self.path = path
+        self._file = None
+        self._map = None
+        self.count = 0
+        self.order = order
+        self.grid_size = grid_size(order)
+        if path is not None:
+            self._open(path)
+
+    def _open(self, path):
+        if not os.path.exists(path):
+            raise SudokuError(f'No such grid library: {path}')
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise SudokuError(f'Truncated grid library: {path}')
+        magic, order, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or order != self.order or len(self._map) < HEADER.size + count * self.grid_size:
+            self.close()
+            raise SudokuError(f'Corrupt grid library: {path}')
+        self.count = count
+
+    @staticmethod
+    def default(order=3):
+        """returns the (shared) library of grids of the given order, only the order 3 library ships with the package."""
+        if order not in GridLibrary._defaults:
+            path = resource_path('data/grids.bin') if order == 3 else None
+            GridLibrary._defaults[order] = GridLibrary(path if path is not None and os.path.exists(path) else None, order)
+        return GridLibrary._defaults[order]
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """releases the memory map, and the file it maps."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.count = 0
+
+    def grid(self, index):
+        """returns the index-th stored grid as a read only buffer of 81 (or order^4) digits."""
+        if 0 <= index < self.count:
+            start = HEADER.size + index * self.grid_size
+            return memoryview(self._map)[start:start + self.grid_size]
+        raise SudokuError(f'grid error: {index}')
+
+    def draw(self):
+        """returns a uniformly transformed random grid from the library as a bytes object of length 81 (or order^4)."""
+        if self.count == 0:
+            return transform(seed_grid(self.order), random_transformation(self.order))
+        with self.grid(random.randrange(self.count)) as grid:
+            return transform(grid, random_transformation(self.order))
+
+    def draw_puzzle(self):
+        """returns a uniformly transformed random grid from the library as a Puzzle."""
+        return pyarray2puzzle(self.draw())
+
+    @staticmethod
+    def build(path, count, order=3):
+        """writes a library of count freshly generated (by the C generator) grids of the given order to the given path."""
+        with open(path, 'wb') as fp:
+            fp.write(HEADER.pack(MAGIC, order, count))
+            for _ in range(count):
+                fp.write(bytes(generate_grid(order)))
+
+
+def main():
+    """compares the cost of drawing a grid against generating one."""
+    count = 1000
+    library = GridLibrary.default()
+    start = time.perf_counter()
+    for _ in range(count):
+        generate_grid()
+    generated = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(count):
+        library.draw()
+    drawn = time.perf_counter() - start
+    print(f'{count} grids: generated (C) {generated:.4f} seconds, drawn from {len(library)} templates {drawn:.4f} seconds')
+    library.draw_puzzle().pprint()
+
+
+if __name__ == '__main__':
+    main()
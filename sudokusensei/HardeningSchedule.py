@@ -0,0 +1,70 @@
+"""HardeningSchedule decides when the python hardener restarts, and when it gives up (the twin of the schedule in lib/sugen.c).
+
+A hardening run often stalls well short of the target difficulty, and then spends the rest of its iterations making
+no progress. With a schedule, a run that has made no progress for patience iterations is abandoned, and hardening
+starts again from a fresh grid, keeping the best puzzle of all the runs. Once a few runs have failed we also estimate
+the odds that the runs the remaining iterations pay for will reach the target: if the best scores of the failed runs
+have mean m and variance v, Cantelli's inequality bounds the chance that a run reaches the target t > m by
+v / (v + (t - m)^2), and the chance that any of the next n do by n times that. The bound is optimistic, so when even it
+falls below min_odds we give up.
+"""
+
+# the number of failed runs we need before estimating the odds.
+MIN_RUNS = 3
+
+
+class HardeningSchedule:
+    """The iterations left, and the best scores of the failed runs, of a scheduled hardening."""
+
+    def __init__(self, iterations, target, patience=0, min_odds=0.0):
+        self.remaining = iterations
+        self.target = target
+        # 0 is Daniel Beer's single run
+        self.patience = patience
+        self.min_odds = min_odds
+        # the failed runs: their number, iterations, and the sum (and sum of squares) of their best scores
+        self.failures = 0
+        self.iterations = 0
+        self.sum = 0
+        self.sum_squares = 0
+        # the same keys as DB.schedule_stats
+        self.runs = 0
+        self.used = 0
+        self.gave_up = False
+
+    @staticmethod
+    def from_options(options):
+        """returns the schedule the user's options ask for (a single run unless options.adaptive_hardening is set)."""
+        patience = options.hardening_patience if options.adaptive_hardening else 0
+        return HardeningSchedule(options.iterations, options.difficulty, patience, options.hardening_min_odds)
+
+    def odds(self):
+        """returns an upper bound on the odds that one of the runs the remaining iterations pay for reaches the target."""
+        mean = self.sum / self.failures
+        variance = max(self.sum_squares / self.failures - mean * mean, 0)
+        gap = self.target - mean
+        if gap <= 0:
+            return 1.0
+        chance = variance / (variance + gap * gap)
+        # each future run is expected to last as long as the failed ones did
+        return chance * self.remaining * self.failures / max(self.iterations, 1)
+
+    def another(self, score, used):
+        """records that a run reached score in used iterations, and returns True if we should start another."""
+        self.remaining -= used
+        self.runs += 1
+        self.used += used
+        if score >= self.target or self.remaining <= 0:
+            return False
+        self.failures += 1
+        self.iterations += used
+        self.sum += score
+        self.sum_squares += score * score
+        if self.failures >= MIN_RUNS and self.odds() < self.min_odds:
+            self.gave_up = True
+            return False
+        return True
+
+    def stats(self):
+        """returns the schedule's statistics as a dictionary (the same keys as DB.schedule_stats)."""
+        return {'runs': self.runs, 'iterations': self.used, 'gave_up': self.gave_up}
@@ -19,6 +19,7 @@ from .Constants import WIDTH, HEIGHT, PAD
 from .SudokuGame import SudokuGame
 from .SudokuUI import SudokuUI
 from .SudokuLib import parse_arguments
+from .Syntax import Registry
 
 def main():
     """main is the pip entry point."""
@@ -35,6 +36,7 @@ def main():
         root.geometry("{0}x{1}".format(WIDTH + 3 * PAD, HEIGHT + 120))
         root.mainloop()
         game.dispose()
+        Registry.release()
 
 
     except KeyboardInterrupt:
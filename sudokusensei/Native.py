@@ -0,0 +1,42 @@
+"""Native knows where the sugen shared libraries (Daniel Beer's C, see lib/sugen.c) live.
+
+There is one library per supported order, since the C is compiled for a fixed ORDER. They are built by
+setup.py (or by lib/Makefile when hacking), and loaded, lazily, by DB. This module must not import anything
+beyond the standard library, since setup.py uses it to name the libraries it builds.
+"""
+
+import os.path
+import sys
+
+# the orders the C is compiled for (the same as Peers.ORDERS)
+NATIVE_ORDERS = (2, 3, 4, 5)
+
+# the C API (see lib/sugen.h), which has to be explicitly exported on windows.
+EXPORTS = ['db_debug', 'db_seed', 'db_order', 'db_generate_puzzle', 'db_solve_puzzle', 'db_generate_grid', 'db_harden_puzzle', 'db_minimize_puzzles',
+           'db_cache_configure', 'db_cache_clear', 'db_cache_stats', 'db_core_sizes',
+           'db_schedule_configure', 'db_schedule_stats']
+
+def _platform():
+    """returns the (prefix, extension) of shared libraries on this platform."""
+    if sys.platform == 'win32':
+        return ('lib', '.dll')
+    if sys.platform == 'cygwin':
+        return ('cyg', '.dll')
+    if sys.platform == 'darwin':
+        return ('lib', '.dylib')
+    return ('lib', '.so')
+
+def sugen_library_stem(order=3):
+    """returns the name, sans extension, of the sugen library for the given order (the order 3 library has no suffix)."""
+    prefix, _ = _platform()
+    suffix = '' if order == 3 else str(order)
+    return f'{prefix}sugen{suffix}'
+
+def sugen_library_name(order=3):
+    """returns the file name of the sugen library for the given order on this platform, e.g. libsugen.so or libsugen4.dylib."""
+    _, extension = _platform()
+    return sugen_library_stem(order) + extension
+
+def sugen_library_path(order=3):
+    """returns the path the sugen library for the given order is installed at (it need not exist)."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib', sugen_library_name(order))
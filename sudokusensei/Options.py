@@ -0,0 +1,60 @@
+"""For handling what's going on under the hood (the options themselves, the UI for them is in SudokuOptions)."""
+
+class Options:    # pylint: disable=R0902
+    """For retaining the user's chosen options."""
+
+    def __init__(self):
+        # turns on all sorts of whingeing and whining
+        self.debug = False
+        # allows one to edit the "original" puzzle squares
+        self.edit = False
+        # uses the C versions of the slow routines (if the C library is available, otherwise we fall back to the python).
+        self.use_c = True
+        # use set oriented freedom in the solving phase, which can eliminate
+        # a lot of backtracking (and hence the difficulty metric).
+        self.sofa = False
+        # the desired metric, note sofa vs no sofa metrics are very different.
+        # sofa numbers are genrally a lot smaller.
+        self.difficulty = 400
+        # game generation iterations.
+        self.iterations = 200
+        # the order of generated puzzles: 2 (4x4), 3 (regular 9x9), 4 (16x16) or 5 (25x25).
+        self.order = 3
+        # the symmetry the clues of a generated puzzle respect: none, rotational, quarter, mirror or diagonal.
+        self.symmetry = 'rotational'
+        # the number of clues a generated puzzle may have (a max_clues of None means no upper bound).
+        self.min_clues = 0
+        self.max_clues = None
+        # if not None, the (inclusive) range of core metrics a newly generated game must lie within.
+        self.metric_range = None
+        # restart hardening (from a fresh grid) after hardening_patience iterations without progress, and give up once the
+        # (optimistic) odds of reaching the difficulty within the remaining iterations fall below hardening_min_odds.
+        self.adaptive_hardening = False
+        self.hardening_patience = 50
+        self.hardening_min_odds = 0.05
+        # the number of independent hardening chains (each in its own process) used to generate a puzzle.
+        self.workers = 1
+        # draw the solution grid from the (transformed) grid library, rather than searching for one.
+        self.templates = False
+        # the number of (uniqueness, difficulty) scores the hardeners remember (0 disables the cache), and which ones they forget
+        # when it is full: 'lru' (the least recently used) or 'fifo' (the oldest).
+        self.score_cache = 1 << 14
+        self.cache_eviction = 'lru'
+        # compute the next hint in the background whenever the board changes (see Speculator). Off by default, since each change
+        # then costs a worker process recomputing all the cores, but the Options dialog can turn it on.
+        self.speculative_hints = False
+        # the path of a PuzzleStore that new games are drawn from (when it has a suitable puzzle) rather than generated, None means always generate.
+        self.puzzle_store = None
+        # how the core metric is computed: 'yices' (minimized unsat cores, slow) or 'propagation' (the C's approximation, see db_core_sizes).
+        self.metric_engine = 'yices'
+        # record a trace of the stages of each top level operation of a game (see Profiling.traced), printed in debug mode,
+        # and saved (in Chrome's trace event format) to trace_path if it is not None.
+        self.trace = False
+        self.trace_path = None
+        # how the rules are encoded for yices: 'integer' (a variable per cell) or 'boolean' (one-hot, a variable per cell and value).
+        self.encoding = 'integer'
+        # we compute the cores for all empty cells, then cream off the smallest "cutoff"
+        # ones, and reduce them further.
+        self.unsat_core_cutoff = 5
+        # aleph_nought
+        self.aleph_nought = 64
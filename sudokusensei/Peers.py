@@ -0,0 +1,55 @@
+"""Peers contains the static unit and peer tables, built at import time, for boards of each supported order.
+
+Cells are referred to by their row major index, i.e. the cell [row, col] of a board whose rows have length dim
+has index dim * row + col (the layout the C library uses). A unit is a row, a column or a block (there are 27
+in a 9x9 board), and the peers of a cell are the other cells that share a unit with it (20 in a 9x9 board).
+"""
+
+# the orders we support, order 3 is regular 9x9 sudoku.
+ORDERS = (2, 3, 4, 5)
+
+
+class PeerTable: # pylint: disable=R0902,R0903
+    """The static tables for boards of a given order, everything is a tuple indexed by cell index (or unit)."""
+
+    def __init__(self, order):
+        dim = order * order
+        self.order = order
+        self.dim = dim
+        self.elements = dim * dim
+        # the [row, col] of each index
+        self.cells = tuple((index // dim, index % dim) for index in range(self.elements))
+        # the indexes in each row, column and block (blocks are numbered left to right, top to bottom)
+        self.rows = tuple(tuple(dim * row + col for col in range(dim)) for row in range(dim))
+        self.columns = tuple(tuple(dim * row + col for row in range(dim)) for col in range(dim))
+        self.blocks = tuple(tuple(dim * (order * (block // order) + row) + order * (block % order) + col
+                                  for row in range(order) for col in range(order)) for block in range(dim))
+        # the rows, then the columns, then the blocks (the order of Syntax's duplicate rules)
+        self.units = self.rows + self.columns + self.blocks
+        # the units as lists of [row, col] pairs
+        self.unit_cells = tuple(tuple(self.cells[index] for index in unit) for unit in self.units)
+        # the block each index belongs to
+        self.block_of = tuple(order * (row // order) + col // order for row, col in self.cells)
+        # the (row, column and block) units each index belongs to, as indexes into units
+        self.cell_units = tuple((row, dim + col, 2 * dim + self.block_of[index]) for index, (row, col) in enumerate(self.cells))
+        # the units in the order the C library's set-oriented freedom analysis visits them: column i, row i, block i, ...
+        self.sofa_units = tuple(unit for i in range(dim) for unit in (dim + i, i, 2 * dim + i))
+        # the peers of each index
+        self.peers = tuple(tuple(sorted(set(self.rows[row] + self.columns[col] + self.blocks[self.block_of[index]]) - {index}))
+                           for index, (row, col) in enumerate(self.cells))
+        # the peers as [row, col] pairs
+        self.peer_cells = tuple(tuple(self.cells[peer] for peer in peers) for peers in self.peers)
+        # the cells whose freedom changes when the cell changes, i.e. its peers and itself
+        self.influence = tuple(peer_cells + (self.cells[index],) for index, peer_cells in enumerate(self.peer_cells))
+
+    def index(self, row, col):
+        """returns the index of the cell [row, col]."""
+        return self.dim * row + col
+
+
+# the tables for each order
+TABLES = {order: PeerTable(order) for order in ORDERS}
+
+def peer_table(order=3):
+    """returns the static tables for boards of the given order."""
+    return TABLES[order]
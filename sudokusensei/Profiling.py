@@ -1,6 +1,16 @@
-"""quick and dirty way to see how long various things take"""
-import functools
+"""quick and dirty way to see how long various things take, and a more structured one (traces).
 
+A trace records the nested spans (stages) of a top level operation of a game, e.g. generating a new puzzle, or
+computing its core metric: when each started, how long it took, and details such as sizes. The code that does the
+work marks its stages with span (and adds details with note), which costs next to nothing unless a trace is being
+recorded. A trace can be summarized per stage (report) or exported in Chrome's trace event format (chrome, save),
+which chrome://tracing and https://ui.perfetto.dev display as a timeline.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
 import time
 
 def profile(func):
@@ -13,3 +23,146 @@ def profile(func):
         print(f'{func.__name__} : {(stop - start)/1000_000_000} seconds')
         return value
     return wrapper_timer
+
+
+class Span:
+    """A stage of a traced operation: its name, start and duration (in nanoseconds), details, and the spans nested within it."""
+
+    __slots__ = ('name', 'start', 'duration', 'args', 'children')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.start = time.perf_counter_ns()
+        self.duration = 0
+        self.args = args
+        self.children = []
+
+
+class Trace:
+    """The nested spans of a top level operation (the root span)."""
+
+    def __init__(self, name):
+        self.root = Span(name, {})
+        self.stack = [self.root]
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """times the body of the with statement as a span nested within the current one."""
+        node = Span(name, args)
+        self.stack[-1].children.append(node)
+        self.stack.append(node)
+        try:
+            yield node
+        finally:
+            node.duration = time.perf_counter_ns() - node.start
+            self.stack.pop()
+
+    def note(self, **args):
+        """adds the details to the current span, numbers are summed with those already there."""
+        current = self.stack[-1].args
+        for key, value in args.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and key in current:
+                current[key] += value
+            else:
+                current[key] = value
+
+    def close(self):
+        """ends the root span."""
+        self.root.duration = time.perf_counter_ns() - self.root.start
+
+    def stages(self):
+        """returns the spans aggregated by their path from the root: a map from paths to [calls, nanoseconds, summed numeric details]."""
+        stages = {}
+        def visit(node, path):
+            path = path + (node.name,)
+            stage = stages.setdefault(path, [0, 0, {}])
+            stage[0] += 1
+            stage[1] += node.duration
+            for key, value in node.args.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stage[2][key] = stage[2].get(key, 0) + value
+            for child in node.children:
+                visit(child, path)
+        visit(self.root, ())
+        return stages
+
+    def report(self):
+        """returns the per stage breakdown (calls, total time, and summed details) as a multiline string."""
+        lines = []
+        for path, (calls, duration, details) in self.stages().items():
+            name = '  ' * (len(path) - 1) + path[-1]
+            extras = ' '.join(f'{key}={value}' for key, value in details.items())
+            lines.append(f'{name:<32} {calls:>6} x {duration / 1e6:>10.3f} ms {extras}')
+        return '\n'.join(lines)
+
+    def chrome(self):
+        """returns the trace in Chrome's trace event format (complete events, times in microseconds)."""
+        events = []
+        origin = self.root.start
+        def visit(node):
+            events.append({'name': node.name, 'ph': 'X', 'ts': (node.start - origin) / 1e3, 'dur': node.duration / 1e3,
+                           'pid': self.pid, 'tid': self.tid, 'args': {key: value if isinstance(value, (int, float, str, bool)) else str(value)
+                                                                      for key, value in node.args.items()}})
+            for child in node.children:
+                visit(child)
+        visit(self.root)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        """writes the trace, in Chrome's trace event format, to the given path."""
+        with open(path, 'w', encoding='utf-8') as fp:
+            json.dump(self.chrome(), fp)
+
+
+# the trace each thread is recording (if any).
+_THREADS = threading.local()
+
+# what span returns when we are not tracing.
+_NOT_TRACING = contextlib.nullcontext()
+
+def current_trace():
+    """returns the trace this thread is recording, or None if it isn't recording one."""
+    return getattr(_THREADS, 'trace', None)
+
+def span(name, **args):
+    """times the body of the with statement as a stage of the current trace (if there is one)."""
+    trace = current_trace()
+    if trace is None:
+        return _NOT_TRACING
+    return trace.span(name, **args)
+
+def note(**args):
+    """adds the details to the current stage of the current trace (if there is one)."""
+    trace = current_trace()
+    if trace is not None:
+        trace.note(**args)
+
+def traced(method):
+    """traces the decorated (top level) method of an object with options, e.g. a SudokuGame, if its options.trace is set.
+
+    The trace is left in the object's trace attribute, printed if options.debug is set, and saved to options.trace_path
+    if there is one. A traced method called by another is just a span of the caller's trace.
+    """
+    @functools.wraps(method)
+    def wrapper_trace(self, *args, **kwargs):
+        outer = current_trace()
+        if outer is not None:
+            with outer.span(method.__name__):
+                return method(self, *args, **kwargs)
+        if not self.options.trace:
+            return method(self, *args, **kwargs)
+        trace = Trace(method.__name__)
+        _THREADS.trace = trace
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _THREADS.trace = None
+            trace.close()
+            self.trace = trace
+            if self.options.debug:
+                print(trace.report())
+            if self.options.trace_path is not None:
+                trace.save(self.options.trace_path)
+    return wrapper_trace
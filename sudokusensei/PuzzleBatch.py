@@ -0,0 +1,208 @@
+"""PuzzleBatch is a batch of puzzles, and their scores, in shared memory, for multiprocess scoring and generation.
+
+Pickling a Puzzle ships its grid, its freedom analysis (a set per cell, plus the sofa sets) and its value map, all of
+which the receiver could rebuild from the 81 bytes that matter. A batch lays out the cells of its puzzles back to back,
+row major with 0 for empty (as Puzzle.cells and the C have them), followed by a column of int32 per score. Workers
+attach to the batch by name, read their puzzles and write their scores in place, so the only things ever pickled are
+the batch's name and the range of puzzles each worker is responsible for.
+"""
+
+import multiprocessing
+import random
+
+from multiprocessing import shared_memory
+
+from .SudokuLib import SudokuError, Puzzle, order2dim
+from .DB import solve_buffer, db_seed
+from .Options import Options
+from .SudokuGenerator import SudokuGenerator, _p_solve
+from .SudokuGame import SudokuGame
+
+# the score columns: the solver's return code (0 if the solution is unique), Daniel Beer's difficulty, and the core metric.
+COLUMNS = ('code', 'difficulty', 'metric')
+
+# how a batch can be scored: with the C solver, the python one, or the core metric (computed by the options' metric_engine).
+SCORINGS = ('c', 'python', 'metric')
+
+
+class PuzzleBatch:
+    """count puzzles of the given order, and their scores, in a (named) block of shared memory."""
+
+    def __init__(self, count, order=3, name=None):
+        self.count = count
+        self.order = order
+        self.elements = order2dim(order) ** 2
+        # the cells, padded so the int32 columns are aligned
+        self.cells_size = (count * self.elements + 3) & ~3
+        size = self.cells_size + 4 * count * len(COLUMNS)
+        # we create the memory, and are responsible for unlinking it, unless we are attaching to someone else's
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=max(size, 1) if self.owner else 0)
+        self.cells = self.memory.buf[:count * self.elements]
+        self.columns = {}
+        for position, column in enumerate(COLUMNS):
+            start = self.cells_size + 4 * count * position
+            self.columns[column] = self.memory.buf[start:start + 4 * count].cast('i')
+
+    @staticmethod
+    def from_puzzles(puzzles):
+        """returns a new batch holding the cells of the puzzles (which must all have the same order), with zeroed scores."""
+        order = puzzles[0].order if puzzles else 3
+        if any(puzzle.order != order for puzzle in puzzles):
+            raise SudokuError('PuzzleBatch: the puzzles must all have the same order')
+        batch = PuzzleBatch(len(puzzles), order)
+        for index, puzzle in enumerate(puzzles):
+            batch.store(index, puzzle)
+        return batch
+
+    @staticmethod
+    def attach(name, count, order=3):
+        """returns the (existing) batch with the given name, e.g. in a worker."""
+        return PuzzleBatch(count, order, name)
+
+    @property
+    def name(self):
+        """the name workers attach to the batch by."""
+        return self.memory.name
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def offset(self, index):
+        """returns the offset, in the shared memory, of the cells of the index-th puzzle."""
+        if 0 <= index < self.count:
+            return index * self.elements
+        raise SudokuError(f'PuzzleBatch: index error: {index}')
+
+    def puzzle(self, index):
+        """returns the index-th puzzle as a Puzzle."""
+        puzzle = Puzzle(order=self.order)
+        start = self.offset(index)
+        puzzle.load(self.cells[start:start + self.elements])
+        return puzzle
+
+    def store(self, index, puzzle):
+        """overwrites the cells of the index-th puzzle with those of the given puzzle."""
+        if puzzle.order != self.order:
+            raise SudokuError(f'PuzzleBatch: order error: {puzzle.order}')
+        start = self.offset(index)
+        self.cells[start:start + self.elements] = puzzle.cells
+
+    def scores(self, column):
+        """returns a copy of the given score column (see COLUMNS) as a list."""
+        return self.columns[column].tolist()
+
+    def close(self):
+        """detaches from the shared memory, which is also freed if we created it."""
+        if self.memory is None:
+            return
+        # the views must go before the memory can
+        for view in self.columns.values():
+            view.release()
+        self.cells.release()
+        self.columns = {}
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+        self.memory = None
+
+
+def _score_range(batch, start, stop, scoring, sofa, options):
+    """scores the puzzles of the batch from start up to stop, in this process, writing the scores in place."""
+    codes = batch.columns['code']
+    difficulties = batch.columns['difficulty']
+    metrics = batch.columns['metric']
+    for index in range(start, stop):
+        if scoring == 'c':
+            codes[index], difficulties[index] = solve_buffer(batch.memory.buf, batch.order, sofa, batch.offset(index))
+        elif scoring == 'python':
+            diff = [0]
+            codes[index] = _p_solve(batch.puzzle(index), None, diff, False, sofa)
+            difficulties[index] = diff[0]
+        else:
+            cells = batch.cells[batch.offset(index):batch.offset(index) + batch.elements]
+            game = SudokuGame(None)
+            game.options = options
+            game.resume(cells, cells)
+            codes[index] = 0 if game.start_solution() is not None else 1
+            metrics[index] = game.get_metric() if codes[index] == 0 else -1
+            cells.release()
+
+def _score_worker(name, count, order, start, stop, scoring, sofa, options): # pylint: disable=R0913
+    """a worker of score_batch: attaches to the batch and scores its share of it."""
+    batch = PuzzleBatch.attach(name, count, order)
+    try:
+        _score_range(batch, start, stop, scoring, sofa, options)
+    finally:
+        batch.close()
+
+def _generate_range(batch, start, stop, generator):
+    """fills the batch, from start up to stop, with puzzles (and their difficulties) from the generator."""
+    for index in range(start, stop):
+        difficulty, puzzle = generator.generate()
+        batch.store(index, puzzle)
+        batch.columns['difficulty'][index] = difficulty
+
+def _generate_worker(name, count, order, start, stop, options, seed): # pylint: disable=R0913
+    """a worker of generate_batch: attaches to the batch and fills in its share of it."""
+    # forked workers inherit the state of both random number generators
+    random.seed(seed)
+    generator = SudokuGenerator(options)
+    if generator.native():
+        db_seed(seed, order)
+    batch = PuzzleBatch.attach(name, count, order)
+    try:
+        _generate_range(batch, start, stop, generator)
+    finally:
+        batch.close()
+
+def _shares(count, workers):
+    """splits range(count) into (at most) workers contiguous (start, stop) ranges."""
+    workers = max(1, min(workers, count))
+    return [(count * worker // workers, count * (worker + 1) // workers) for worker in range(workers)]
+
+def _run(target, arguments):
+    """runs the target once per tuple of arguments, each in its own process, and waits for them all."""
+    context = multiprocessing.get_context()
+    processes = [context.Process(target=target, args=args) for args in arguments]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    failed = sum(1 for process in processes if process.exitcode != 0)
+    if failed:
+        raise SudokuError(f'PuzzleBatch: {failed} worker(s) failed')
+
+def score_batch(batch, scoring='c', sofa=False, workers=1, options=None): # pylint: disable=R0913
+    """scores every puzzle of the batch in place, with the given number of worker processes (or in this process if workers is 1).
+
+    scoring is one of SCORINGS, the options are only needed by the core metric (which is computed by a SudokuGame).
+    """
+    if scoring not in SCORINGS:
+        raise SudokuError(f'No such scoring: {scoring}')
+    if options is None:
+        options = Options()
+    if workers <= 1:
+        _score_range(batch, 0, batch.count, scoring, sofa, options)
+    else:
+        _run(_score_worker, [(batch.name, batch.count, batch.order, start, stop, scoring, sofa, options) for start, stop in _shares(batch.count, workers)])
+    return batch
+
+def generate_batch(count, options, workers=1):
+    """returns a new batch of count puzzles generated according to the options (with their difficulties), by the given number of worker processes."""
+    batch = PuzzleBatch(count, options.order)
+    try:
+        if workers <= 1:
+            _generate_range(batch, 0, count, SudokuGenerator(options))
+        else:
+            _run(_generate_worker, [(batch.name, count, options.order, start, stop, options, random.getrandbits(32)) for start, stop in _shares(count, workers)])
+    except BaseException:
+        batch.close()
+        raise
+    return batch
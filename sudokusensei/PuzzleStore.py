@@ -0,0 +1,248 @@
+"""PuzzleStore is an SQLite database of puzzles, indexed by their (precomputed) scores.
+
+Each puzzle is stored as its cells (row major with 0 for empty, the layout of Puzzle.cells and the C), together with
+its clue count, its no sofa and sofa difficulties (Daniel Beer's metric), and optionally its core metric. Every score
+is indexed, so a query like "difficulty 600 to 700 with 55 to 60 empty cells" only looks at the puzzles that match,
+rather than scoring every puzzle we know of. Random samples are drawn by offsetting into the matching rows, so they do
+not sort the whole table either.
+
+    python -m sudokusensei.PuzzleStore <path> --generate 1000 --boards
+"""
+
+import argparse
+import os.path
+import random
+import sqlite3
+import time
+
+from collections import namedtuple
+
+from .SudokuLib import SudokuError, Puzzle, resource_path, order2dim
+from .Options import Options
+from .DB import solve_puzzle, pyarray2puzzle
+from .PuzzleBatch import PuzzleBatch, generate_batch, score_batch
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS puzzles (
+    id INTEGER PRIMARY KEY,
+    board_order INTEGER NOT NULL,
+    cells BLOB NOT NULL UNIQUE,
+    clues INTEGER NOT NULL,
+    empty INTEGER NOT NULL,
+    difficulty INTEGER NOT NULL,
+    sofa_difficulty INTEGER NOT NULL,
+    metric INTEGER,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS by_difficulty ON puzzles (board_order, difficulty);
+CREATE INDEX IF NOT EXISTS by_sofa_difficulty ON puzzles (board_order, sofa_difficulty);
+CREATE INDEX IF NOT EXISTS by_empty ON puzzles (board_order, empty);
+CREATE INDEX IF NOT EXISTS by_metric ON puzzles (board_order, metric);
+'''
+
+# the scores a query can constrain, each to an inclusive (low, high) range, where either bound may be None.
+SCORES = ('clues', 'empty', 'difficulty', 'sofa_difficulty', 'metric')
+
+Record = namedtuple('Record', ['id', 'order', 'cells', 'clues', 'empty', 'difficulty', 'sofa_difficulty', 'metric', 'source'])
+
+def record2puzzle(record):
+    """returns the puzzle a record (of a query) describes."""
+    return pyarray2puzzle(record.cells)
+
+def score_puzzle(puzzle):
+    """returns the (difficulty, sofa_difficulty) of the puzzle, according to the C solver, or None if its solution is not unique."""
+    scores = []
+    for sofa in (False, True):
+        diff = [0]
+        if solve_puzzle(puzzle, None, diff, sofa) != 0:
+            return None
+        scores.append(diff[0])
+    return tuple(scores)
+
+
+class PuzzleStore:
+    """A (possibly empty) SQLite store of scored puzzles."""
+
+    # the stores new games are drawn from, indexed by path.
+    _shared = {}
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    @staticmethod
+    def shared(path):
+        """returns the (shared) store at the given path, which must exist (see main)."""
+        if path not in PuzzleStore._shared:
+            if not os.path.exists(path):
+                raise SudokuError(f'No such puzzle store: {path}')
+            PuzzleStore._shared[path] = PuzzleStore(path)
+        return PuzzleStore._shared[path]
+
+    def close(self):
+        """closes the underlying database."""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM puzzles').fetchone()[0]
+
+    def add(self, puzzle, difficulty, sofa_difficulty, metric=None, source=None): # pylint: disable=R0913
+        """adds the puzzle, and its scores, to the store (a puzzle that is already there is left alone)."""
+        self.add_many([(puzzle, difficulty, sofa_difficulty, metric, source)])
+
+    def add_many(self, rows):
+        """adds each (puzzle, difficulty, sofa_difficulty, metric, source) row to the store, in a single transaction."""
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO puzzles (board_order, cells, clues, empty, difficulty, sofa_difficulty, metric, source) '
+                                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                        [(puzzle.order, bytes(puzzle.cells), puzzle.elements - puzzle.empty_cells, puzzle.empty_cells,
+                                          difficulty, sofa_difficulty, metric, source)
+                                         for puzzle, difficulty, sofa_difficulty, metric, source in rows])
+
+    @staticmethod
+    def _where(order, ranges):
+        """returns the WHERE clause, and its parameters, selecting the puzzles of the given order whose scores lie in the ranges."""
+        clauses = ['board_order = ?']
+        parameters = [order]
+        for score, bounds in ranges.items():
+            if score not in SCORES:
+                raise SudokuError(f'No such score: {score}')
+            if bounds is None:
+                continue
+            low, high = bounds
+            if low is not None:
+                clauses.append(f'{score} >= ?')
+                parameters.append(low)
+            if high is not None:
+                clauses.append(f'{score} <= ?')
+                parameters.append(high)
+        return (' AND '.join(clauses), parameters)
+
+    def count(self, order=3, **ranges):
+        """returns the number of puzzles of the given order whose scores lie in the given (inclusive) ranges, e.g. difficulty=(600, 700)."""
+        where, parameters = self._where(order, ranges)
+        return self.connection.execute(f'SELECT COUNT(*) FROM puzzles WHERE {where}', parameters).fetchone()[0]
+
+    def query(self, order=3, limit=None, **ranges):
+        """returns the records of (at most limit of) the puzzles of the given order whose scores lie in the given ranges."""
+        where, parameters = self._where(order, ranges)
+        sql = f'SELECT * FROM puzzles WHERE {where}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+        return [Record(*row) for row in self.connection.execute(sql, parameters)]
+
+    def sample(self, count=1, order=3, **ranges):
+        """returns the records of (at most) count distinct puzzles chosen at random from those query would return."""
+        where, parameters = self._where(order, ranges)
+        matches = self.count(order, **ranges)
+        records = []
+        for offset in sorted(random.sample(range(matches), min(count, matches))):
+            row = self.connection.execute(f'SELECT * FROM puzzles WHERE {where} LIMIT 1 OFFSET ?', parameters + [offset]).fetchone()
+            records.append(Record(*row))
+        random.shuffle(records)
+        return records
+
+    def draw(self, order=3, **ranges):
+        """returns a random puzzle whose scores lie in the given ranges, as a (record, puzzle) pair, or None if there isn't one."""
+        records = self.sample(1, order, **ranges)
+        if not records:
+            return None
+        return (records[0], record2puzzle(records[0]))
+
+    def add_boards(self):
+        """adds the (uniquely solvable) boards in the package's data directory, returns the number added."""
+        directory = resource_path('data')
+        rows = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.sudoku'):
+                puzzle = Puzzle.path2puzzle(os.path.join(directory, name))
+                scores = score_puzzle(puzzle)
+                if scores is not None:
+                    rows.append((puzzle, *scores, None, name[:-len('.sudoku')]))
+        self.add_many(rows)
+        return len(rows)
+
+    def add_generated(self, count, options=None, workers=1, metric=False):
+        """generates count puzzles according to the options, scores them (in workers processes), and adds them to the store."""
+        options = options if options is not None else Options()
+        batch = generate_batch(count, options, workers)
+        try:
+            scores = {}
+            for sofa in (False, True):
+                score_batch(batch, 'c', sofa, workers)
+                scores[sofa] = batch.scores('difficulty')
+            codes = batch.scores('code')
+            if metric:
+                score_batch(batch, 'metric', workers=workers, options=options)
+            metrics = batch.scores('metric') if metric else [None] * count
+            rows = [(batch.puzzle(index), scores[False][index], scores[True][index], metrics[index], 'generated')
+                    for index in range(count) if codes[index] == 0]
+        finally:
+            batch.close()
+        self.add_many(rows)
+        return len(rows)
+
+
+def draw_for(options, store=None):
+    """returns a random (difficulty, puzzle) pair, from the store (by default the one in the options), that SudokuGame.new could have generated with the options, or None.
+
+    The puzzle's difficulty (sofa or not, according to the options) lies in [options.difficulty, options.difficulty + 100),
+    i.e. it reaches the target without overshooting it by a whole branch, and its clue count and core metric lie in the
+    ranges in the options. The store does not know the puzzles' symmetries, so they are not taken into account.
+    """
+    if store is None:
+        if options.puzzle_store is None:
+            return None
+        store = PuzzleStore.shared(options.puzzle_store)
+    score = 'sofa_difficulty' if options.sofa else 'difficulty'
+    max_clues = options.max_clues if options.max_clues is not None else order2dim(options.order) ** 2
+    ranges = {score: (options.difficulty, options.difficulty + 99), 'clues': (options.min_clues, max_clues), 'metric': options.metric_range}
+    drawn = store.draw(options.order, **ranges)
+    if drawn is None:
+        return None
+    record, puzzle = drawn
+    return (record.sofa_difficulty if options.sofa else record.difficulty, puzzle)
+
+
+def main():
+    """builds (or extends) a store, then compares a range query against scoring every puzzle."""
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('path', help='The store to build or extend')
+    arg_parser.add_argument('--generate', type=int, default=0, help='The number of puzzles to generate')
+    arg_parser.add_argument('--boards', action='store_true', help='Add the boards in the data directory')
+    arg_parser.add_argument('--metric', action='store_true', help='Compute the core metric of the generated puzzles (slow, unless --approximate)')
+    arg_parser.add_argument('--approximate', action='store_true', help='Approximate the core metric by propagation (in C) rather than with yices')
+    arg_parser.add_argument('--workers', type=int, default=1, help='The number of worker processes')
+    args = arg_parser.parse_args()
+    options = Options()
+    if args.approximate:
+        options.metric_engine = 'propagation'
+    with PuzzleStore(args.path) as store:
+        if args.boards:
+            print(f'Added {store.add_boards()} boards')
+        if args.generate > 0:
+            print(f'Added {store.add_generated(args.generate, options, args.workers, args.metric)} generated puzzles')
+        ranges = {'difficulty': (600, 700), 'empty': (55, 60)}
+        start = time.perf_counter()
+        matches = store.query(**ranges)
+        querying = time.perf_counter() - start
+        start = time.perf_counter()
+        puzzles = [record2puzzle(record) for record in store.query()]
+        with PuzzleBatch.from_puzzles(puzzles) as batch:
+            score_batch(batch, 'c', False, args.workers)
+            scored = sum(1 for difficulty, puzzle in zip(batch.scores('difficulty'), puzzles) if 600 <= difficulty <= 700 and 55 <= puzzle.empty_cells <= 60)
+        scoring = time.perf_counter() - start
+        print(f'{len(store)} puzzles, {len(matches)} with difficulty 600-700 and 55-60 empty cells: '
+              f'query {1e3 * querying:.2f} milliseconds, scoring everything {1e3 * scoring:.2f} milliseconds (found {scored})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""ScoreCache remembers the (uniqueness, difficulty) scores the python hardener has already computed.
+
+Hardening makes random flips, which frequently undo one another, so the same puzzle is often solved many times.
+A puzzle is identified by its Zobrist hash: the exclusive or of a fixed random 64 bit key for each of its (cell,
+value) clues, which the hardener updates as it sets and erases clues rather than rehashing the board. Since the
+hash depends only on the clues, a cache is shared across iterations, and across generation calls. The C hardener
+has its own cache (see the score cache in lib/sugen.c), configured via DB.cache_configure.
+"""
+
+import random
+
+from collections import OrderedDict
+
+from .SudokuLib import SudokuError, order2dim
+
+# the eviction policies, in the order of the CACHE_EVICT constants in sugen.h.
+EVICTIONS = ('lru', 'fifo')
+
+# the number of entries a cache holds unless told otherwise (the C's default too).
+DEFAULT_CAPACITY = 1 << 14
+
+# the (cached) Zobrist keys for each order, and the keys that distinguish their sofa scores.
+_KEYS = {}
+_SOFA_KEYS = {}
+
+# the cache the python generators share (see shared_cache).
+_SHARED = None
+
+def zobrist_keys(order=3):
+    """returns the (cached) Zobrist keys of the given order: keys[index][val] is the key of the clue val in the cell with that index (keys[index][0] is 0)."""
+    if order not in _KEYS:
+        dim = order2dim(order)
+        # our own generator, so the keys neither disturb, nor depend on, the random module's state
+        rng = random.Random(order)
+        _KEYS[order] = tuple(tuple(rng.getrandbits(64) if val else 0 for val in range(dim + 1)) for _ in range(dim * dim))
+        # drawn after the clues' keys (like zobrist_sofa in lib/sugen.c), so it is not a combination of them
+        _SOFA_KEYS[order] = rng.getrandbits(64)
+    return _KEYS[order]
+
+def sofa_key(order=3):
+    """returns the key that distinguishes sofa scores from no sofa scores of the same puzzle."""
+    zobrist_keys(order)
+    return _SOFA_KEYS[order]
+
+def puzzle_key(puzzle):
+    """returns the Zobrist hash of the puzzle's clues."""
+    keys = zobrist_keys(puzzle.order)
+    key = 0
+    for index, val in enumerate(puzzle.cells):
+        key ^= keys[index][val]
+    return key
+
+
+class ScoreCache:
+    """A bounded map from Zobrist hashes to (code, difficulty) pairs, that evicts the least recently used, or the oldest, entry when full."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, eviction='lru'):
+        if eviction not in EVICTIONS:
+            raise SudokuError(f'No such eviction policy: {eviction}')
+        self.capacity = capacity
+        self.eviction = eviction
+        self.entries = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self.insertions = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """returns the (code, difficulty) pair stored under key, or None if there isn't one."""
+        self.lookups += 1
+        score = self.entries.get(key)
+        if score is not None:
+            self.hits += 1
+            if self.eviction == 'lru':
+                self.entries.move_to_end(key)
+        return score
+
+    def put(self, key, score):
+        """stores the (code, difficulty) pair under key, evicting an entry if the cache is full."""
+        if self.capacity <= 0:
+            return
+        if key not in self.entries and len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = score
+        self.insertions += 1
+
+    def clear(self):
+        """empties the cache, and zeroes its statistics."""
+        self.entries.clear()
+        self.lookups = self.hits = self.insertions = self.evictions = 0
+
+    def hit_rate(self):
+        """returns the fraction of lookups that were hits (0.0 if there have been none)."""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def stats(self):
+        """returns the cache's statistics as a dictionary (the same keys as DB.cache_stats)."""
+        return {'lookups': self.lookups, 'hits': self.hits, 'insertions': self.insertions, 'evictions': self.evictions, 'hit_rate': self.hit_rate()}
+
+
+def shared_cache(capacity=DEFAULT_CAPACITY, eviction='lru'):
+    """returns the cache the python generators share, emptying and reconfiguring it if the capacity or eviction policy has changed."""
+    global _SHARED # pylint: disable=W0603
+    if _SHARED is None or _SHARED.capacity != capacity or _SHARED.eviction != eviction:
+        _SHARED = ScoreCache(capacity, eviction)
+    return _SHARED
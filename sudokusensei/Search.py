@@ -0,0 +1,175 @@
+"""Search is a flat, trail based, board for the python backtracking searches (the solver and the solution generator).
+
+Rather than cloning a Puzzle and pushing every set_cell and erase_cell through the freedom and sofa machinery, a
+SearchState keeps the board as flat lists indexed by cell index (see Peers), and each cell's forbidden values as a
+bitmask. Assigning a value records, on the trail, only the peers whose mask actually changed, so undoing the most
+recent assignment just pops the trail back to that assignment's mark.
+
+A SearchState built with sofa=True also maintains, for each unit and value, the number of the unit's empty cells
+that can take the value, and the number of the unit's cells that contain it. These are what the set-oriented freedom
+analysis (see sugen.c) needs to find the value with the fewest possible positions in some unit.
+"""
+
+from .Peers import peer_table
+
+
+class SearchState:
+    """The state of a backtracking search, whose assignments can be undone (last in, first out)."""
+
+    def __init__(self, puzzle, sofa=False):
+        self.table = peer_table(puzzle.order)
+        self.order = puzzle.order
+        self.dim = puzzle.dim
+        # the contents of each cell, 0 if empty
+        self.cells = [0] * self.table.elements
+        # the bitmask of the values each cell CANNOT take (bit val is set if a peer contains val)
+        self.masks = [0] * self.table.elements
+        # the number of bits set in each mask
+        self.forbidden = [0] * self.table.elements
+        # the cells that contain each value
+        self.value_map = [set() for _ in range(self.dim + 1)]
+        # the number of empty cells
+        self.empty_cells = self.table.elements
+        # the peers whose masks have changed, and where each assignment's changes start
+        self.trail = []
+        self.marks = []
+        # the per unit sofa counts, the count for value val in unit u is at u * (dim + 1) + val
+        self.tracks_sofa = sofa
+        if sofa:
+            self.candidates = [self.dim] * (len(self.table.units) * (self.dim + 1))
+            self.placed = [0] * len(self.candidates)
+        for index, (row, col) in enumerate(self.table.cells):
+            val = puzzle.get_cell(row, col)
+            if val is not None:
+                self.assign(index, val)
+        # the initial assignments are not undoable
+        self.trail.clear()
+        self.marks.clear()
+
+    def assign(self, index, val):
+        """puts val in the (empty) cell with the given index, recording the changes on the trail."""
+        bit = 1 << val
+        masks = self.masks
+        forbidden = self.forbidden
+        trail = self.trail
+        self.marks.append((len(trail), index))
+        if self.tracks_sofa:
+            self._update_sofa(index, val, -1)
+        for peer in self.table.peers[index]:
+            mask = masks[peer]
+            if not mask & bit:
+                masks[peer] = mask | bit
+                forbidden[peer] += 1
+                trail.append(peer)
+        if self.tracks_sofa:
+            self._update_peers(len(trail) - self.marks[-1][0], val, -1)
+        self.cells[index] = val
+        self.value_map[val].add(index)
+        self.empty_cells -= 1
+
+    def undo(self):
+        """undoes the most recent assignment, returning the index of the cell it emptied."""
+        mark, index = self.marks.pop()
+        val = self.cells[index]
+        bit = 1 << val
+        masks = self.masks
+        forbidden = self.forbidden
+        trail = self.trail
+        if self.tracks_sofa:
+            self._update_peers(len(trail) - mark, val, 1)
+        while len(trail) > mark:
+            peer = trail.pop()
+            masks[peer] &= ~bit
+            forbidden[peer] -= 1
+        self.cells[index] = 0
+        self.value_map[val].discard(index)
+        self.empty_cells += 1
+        if self.tracks_sofa:
+            self._update_sofa(index, val, 1)
+        return index
+
+    def _update_sofa(self, index, val, delta):
+        """the cell with the given index is being filled with (delta -1), or emptied of (delta 1), val."""
+        width = self.dim + 1
+        mask = self.masks[index]
+        candidates = self.candidates
+        for unit in self.table.cell_units[index]:
+            base = unit * width
+            self.placed[base + val] -= delta
+            for other in range(1, width):
+                if not mask & (1 << other):
+                    candidates[base + other] += delta
+
+    def _update_peers(self, changes, val, delta):
+        """the last changes peers on the trail can no longer (delta -1), or can once again (delta 1), take val."""
+        width = self.dim + 1
+        cells = self.cells
+        candidates = self.candidates
+        cell_units = self.table.cell_units
+        trail = self.trail
+        for position in range(len(trail) - changes, len(trail)):
+            peer = trail[position]
+            if cells[peer] == 0:
+                for unit in cell_units[peer]:
+                    candidates[unit * width + val] += delta
+
+    def depth(self):
+        """returns the number of assignments that can be undone."""
+        return len(self.marks)
+
+    def least_free(self):
+        """returns the index of the first empty cell with the least freedom, or -1 if there are no empty cells."""
+        least = -1
+        least_size = -1
+        forbidden = self.forbidden
+        for index, val in enumerate(self.cells):
+            if val == 0 and forbidden[index] > least_size:
+                least = index
+                least_size = forbidden[index]
+        return least
+
+    def choices(self, index):
+        """returns the values the cell with the given index can (immediately) take, in ascending order."""
+        mask = self.masks[index]
+        return [val for val in range(1, self.dim + 1) if not mask & (1 << val)]
+
+    def sofa(self):
+        """returns the (positions, value) pair of the value, missing from some unit, with the fewest possible positions in that unit.
+
+        Ties are broken exactly as sofa() in sugen.c does, positions is empty if there is a value with no possible
+        position, and (None, -1) is returned if no unit is missing a value. Requires a SearchState built with sofa=True.
+        """
+        width = self.dim + 1
+        candidates = self.candidates
+        placed = self.placed
+        best_size = -1
+        best_unit = -1
+        best_value = -1
+        for unit in self.table.sofa_units:
+            base = unit * width
+            value = -1
+            for val in range(1, width):
+                if not placed[base + val] and (value < 0 or candidates[base + val] < candidates[base + value]):
+                    value = val
+            if value >= 0 and (best_size < 0 or candidates[base + value] < best_size):
+                best_size = candidates[base + value]
+                best_unit = unit
+                best_value = value
+                if best_size == 0:
+                    break
+        if best_size < 0:
+            return (None, -1)
+        bit = 1 << best_value
+        masks = self.masks
+        return ([index for index in self.table.units[best_unit] if self.cells[index] == 0 and not masks[index] & bit], best_value)
+
+    def sane(self):
+        """returns True if no cell contains a value one of its peers also contains."""
+        return all(val == 0 or not self.masks[index] & (1 << val) for index, val in enumerate(self.cells))
+
+    def write(self, puzzle):
+        """fills the empty cells of the puzzle with the contents of the corresponding cells of the search."""
+        for index, (row, col) in enumerate(self.table.cells):
+            val = self.cells[index]
+            if val != 0 and puzzle.get_cell(row, col) is None:
+                puzzle.set_cell(row, col, val)
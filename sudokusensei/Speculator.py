@@ -0,0 +1,103 @@
+"""Speculator computes the next hint in the background, while the player is thinking.
+
+A hint (see SudokuSolver.get_hint) needs an unsat core for every empty cell, which takes a noticeable fraction of a
+second, or more. Since the player usually pauses after a move before asking for a hint, we start computing the hint
+for the new board, in a worker process, as soon as the board changes. A further change cancels (terminates) the worker
+and starts another, so by the time the player asks, the hint is usually ready.
+
+Each worker is a process of its own, with its own yices (which is not thread safe), that rebuilds the game from the
+contents of the board.
+"""
+
+import multiprocessing
+
+
+def _speculate(options, start, cells, connection):
+    """the worker: computes the hint for the board, sending it (or None if that fails) down the connection."""
+    from .SudokuGame import SudokuGame # pylint: disable=C0415
+    hint = None
+    try:
+        # the worker's options are its own copy, and the worker must not speculate (or trace) itself
+        options.speculative_hints = False
+        options.trace = False
+        game = SudokuGame(None)
+        game.options = options
+        game.resume(start, cells)
+        hint = game.get_hint()
+    except Exception as e: # pylint: disable=W0703
+        if options.debug:
+            print(f'speculation failed: {e}')
+        hint = None
+    connection.send(hint)
+    connection.close()
+
+
+class HintSpeculator:
+    """Keeps a worker computing the hint for the current board of the game."""
+
+    def __init__(self, game):
+        self.game = game
+        self.context = multiprocessing.get_context()
+        # the board the worker, and the answer, are for
+        self.key = None
+        self.worker = None
+        self.connection = None
+        self.answer = None
+        # the number of hints we had, or were computing, when asked, and the number we did not
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self):
+        """identifies the board, and the options, a hint depends on."""
+        game = self.game
+        return (bytes(game.start_puzzle.cells), bytes(game.puzzle.cells), game.options.encoding, game.options.unsat_core_cutoff)
+
+    def board_changed(self):
+        """cancels any speculation about the previous board, and starts speculating about the current one."""
+        self.cancel()
+        self.key = self._key()
+        receiver, sender = self.context.Pipe(duplex=False)
+        self.worker = self.context.Process(target=_speculate, args=(self.game.options, self.key[0], self.key[1], sender), daemon=True)
+        self.worker.start()
+        # the worker has its own copy
+        sender.close()
+        self.connection = receiver
+
+    def _reap(self):
+        """waits for the worker to finish, and releases it."""
+        self.worker.join()
+        self.connection.close()
+        self.worker = None
+        self.connection = None
+
+    def cancel(self):
+        """abandons the current speculation (if any)."""
+        if self.worker is not None:
+            if self.worker.is_alive():
+                self.worker.terminate()
+            self._reap()
+        self.key = None
+        self.answer = None
+
+    def ready(self):
+        """returns True if the hint for the current board has already been computed."""
+        if self.key != self._key():
+            return False
+        return self.answer is not None or (self.connection is not None and self.connection.poll())
+
+    def hint(self):
+        """returns the hint for the current board, waiting for the worker if it is still busy, or None if we were not speculating about this board."""
+        if self.key != self._key():
+            self.misses += 1
+            return None
+        if self.answer is None and self.worker is not None:
+            try:
+                self.answer = self.connection.recv()
+            except EOFError:
+                self.answer = None
+            self._reap()
+        if self.answer is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.answer
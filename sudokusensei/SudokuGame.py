@@ -12,9 +12,12 @@
 #
 
 from .SudokuLib import Puzzle, SudokuError
-from .SudokuSolver import SudokuSolver
 from .SudokuGenerator import SudokuGenerator
-from .SudokuOptions import Options
+from .DB import pyarray2puzzle, approximate_core_metric
+from .Options import Options
+from .BoardState import BoardState
+from .Speculator import HintSpeculator
+from .Profiling import traced, span, note
 
 class SudokuGame:
     """
@@ -30,13 +33,56 @@ class SudokuGame:
         self.puzzle = None
         # the non-0 entries in solution are 0 in puzzle
         self.solution = None
-        self.solver = SudokuSolver(self)
+        # the value counts and conflicts of puzzle, kept up to date by set_cell and erase_cell
+        self.state = None
+        # the (unique) solution of start_puzzle, computed on first use, and whether we have tried to compute it
+        self._start_solution = None
+        self._start_solved = False
+        # the number of solver calls answered from _start_solution, and the number that had to solve
+        self.solves_avoided = 0
+        self.solves = 0
+        # computes hints in the background (if the options say so), created on first use
+        self.speculator = None
+        # built on first use, so yices is only loaded once we need it
+        self._solver = None
+        # the trace of the last top level operation, if the options ask for traces (see Profiling.traced)
+        self.trace = None
+
+    @property
+    def solver(self):
+        """the yices solver, rebuilt whenever the order of the puzzle, or the user's choice of encoding, changes."""
+        from .SudokuSolver import SudokuSolver # pylint: disable=C0415
+        if self._solver is None or self._solver.syntax.order != self.start_puzzle.order or self._solver.syntax.encoding != self.options.encoding:
+            self._solver = SudokuSolver(self)
+        return self._solver
 
     def start(self):
         """start commences a new game."""
+        self.__begin(self.start_puzzle.clone())
+
+    def resume(self, start, cells):
+        """resumes a game with the given starting puzzle, and board, both given as row major sequences of values (0 for empty)."""
+        self.start_puzzle = pyarray2puzzle(start)
+        self.__begin(pyarray2puzzle(cells))
+
+    def __begin(self, puzzle):
+        """begins playing the puzzle, which extends start_puzzle."""
         self.game_over = False
-        self.puzzle = self.start_puzzle.clone()
+        self.puzzle = puzzle
         self.solution = None
+        self.state = BoardState(self.puzzle)
+        self._start_solution = None
+        self._start_solved = False
+        self.__board_changed()
+
+    def __board_changed(self):
+        """the board has changed, so any hint we are computing in the background is moot."""
+        if self.options.speculative_hints:
+            if self.speculator is None:
+                self.speculator = HintSpeculator(self)
+            self.speculator.board_changed()
+        elif self.speculator is not None:
+            self.speculator.cancel()
 
     def load(self, path):
         """loads the puzzle from the given path."""
@@ -47,34 +93,171 @@ class SudokuGame:
         """saves the puzzle to the given path."""
         self.puzzle.puzzle2path(path)
 
+    # the number of puzzles we generate looking for one whose core metric is in the desired range.
+    METRIC_ATTEMPTS = 10
+
+    @traced
     def new(self):
-        """start commences a newly generated game."""
+        """start commences a newly generated game (or one drawn from the user's puzzle store).
+
+        Returns (difficulty, target, empty cells, metric), where metric is the core metric of the puzzle if the options ask
+        for a metric_range (and None otherwise, or if the difficulty falls short of the target). If none of the puzzles we
+        generate has a metric in the range, we keep the one whose metric is closest to it, so the caller should check.
+        """
+        # only imported if there is a store, since it pulls in sqlite
+        if self.options.puzzle_store is not None:
+            from .PuzzleStore import draw_for # pylint: disable=C0415
+            with span('store'):
+                drawn = draw_for(self.options)
+            if drawn is not None:
+                score, puzzle = drawn
+                self.start_puzzle = puzzle
+                self.start()
+                note(difficulty=score, empty=puzzle.empty_cells)
+                metric = self.get_metric() if self.options.metric_range is not None else None
+                return (score, self.options.difficulty, puzzle.empty_cells, metric)
         generator = SudokuGenerator(self.options)
-        score, puzzle = generator.generate()
+        # the attempt whose metric is closest to the range: its distance from it, difficulty, puzzle and metric
+        closest_distance, closest_score, closest_puzzle, closest_metric = float('inf'), None, None, None
+        for _ in range(SudokuGame.METRIC_ATTEMPTS):
+            with span('generate'):
+                score, puzzle = generator.generate()
+                note(difficulty=score, empty=puzzle.empty_cells)
+            if self.options.debug:
+                puzzle.pprint()
+                print(f'Difficulty: {score} Target: {self.options.difficulty} Empty: {puzzle.empty_cells}')
+            self.start_puzzle = puzzle.clone()
+            self.start()
+            if self.options.metric_range is None:
+                return (score, self.options.difficulty, puzzle.empty_cells, None)
+            metric, distance = self.__metric_distance(score)
+            if closest_puzzle is None or distance < closest_distance:
+                closest_distance, closest_score, closest_puzzle, closest_metric = distance, score, self.start_puzzle, metric
+            if distance == 0:
+                break
+        if self.start_puzzle is not closest_puzzle:
+            self.start_puzzle = closest_puzzle
+            self.start()
+        return (closest_score, self.options.difficulty, closest_puzzle.empty_cells, closest_metric)
+
+    def __metric_distance(self, score):
+        """returns the core metric of the game, and how far it is from the metric range (infinite if the difficulty falls short).
+
+        The (expensive) core metric is only worth computing for puzzles that reached the target difficulty, so for the
+        others the metric is None.
+        """
+        if score < self.options.difficulty:
+            return (None, float('inf'))
+        low, high = self.options.metric_range
+        metric = self.get_metric()
         if self.options.debug:
-            puzzle.pprint()
-            print(f'Difficulty: {score} Target: {self.options.difficulty} Empty: {puzzle.empty_cells}')
-        self.start_puzzle = puzzle.clone()
-        self.start()
-        return (score, self.options.difficulty, puzzle.empty_cells)
+            print(f'Core metric: {metric} Range: [{low}, {high}]')
+        return (metric, max(low - metric, metric - high, 0))
 
+    @traced
     def solve(self):
         """solve uses the SMT solver to solve the current game."""
         self.solution = self.solver.solve()
         return self.solution is not None
 
+    def start_solution(self):
+        """returns the complete solution grid of start_puzzle, or None if it does not have exactly one.
+
+        This is computed once per game, with the C solver if it is available (and double checked by yices in debug mode).
+        """
+        if not self._start_solved:
+            self._start_solved = True
+            solution = Puzzle(order=self.start_puzzle.order)
+            if SudokuGenerator(self.options).solve(self.start_puzzle, solution, None) == 0:
+                if self.options.debug and not self.solver.is_unique_solution(self.start_puzzle, solution):
+                    raise SudokuError('start_solution: yices disagrees with the solver.')
+                self._start_solution = solution
+        return self._start_solution
+
+    def bypass_start_solution(self):
+        """makes the solver calls of the current game solve from scratch, as if start_puzzle did not have a unique solution (e.g. to time them)."""
+        self._start_solved = True
+        self._start_solution = None
+
+    def cached_solution(self, puzzle, complete=False):
+        """returns the solution of the puzzle, as SudokuSolver.solve would, if it is the start solution, and None otherwise.
+
+        That is the case when the puzzle contains every clue of start_puzzle, and its other entries agree with the start
+        solution. Otherwise the caller has to solve the puzzle itself.
+        """
+        solution = self.start_solution()
+        if solution is None or puzzle.order != solution.order or not self.__extends(puzzle, solution):
+            self.solves += 1
+            return None
+        self.solves_avoided += 1
+        if self.options.debug:
+            print(f'solves avoided: {self.solves_avoided} performed: {self.solves}')
+        if complete:
+            return solution.clone()
+        answer = Puzzle(order=puzzle.order)
+        answer.load(bytes(want if have == 0 else 0 for have, want in zip(self.puzzle.cells, solution.cells)))
+        return answer
+
+    def __extends(self, puzzle, solution):
+        """returns True if the puzzle contains the clues of start_puzzle, and otherwise agrees with its solution."""
+        start = self.start_puzzle.cells
+        return all(val == want or (val == 0 and clue == 0) for val, want, clue in zip(puzzle.cells, solution.cells, start))
+
+    @traced
+    def minimize(self, verify=False):
+        """replaces the starting puzzle with a minimal one, with the same solution, and returns the number of clues erased.
+
+        If verify is True, yices double checks that none of the remaining clues could also be erased.
+        """
+        minimal = SudokuGenerator(self.options).minimize(self.start_puzzle)
+        if verify and not self.solver.is_minimal(minimal):
+            raise SudokuError('minimize: yices found an erasable clue.')
+        removed = minimal.empty_cells - self.start_puzzle.empty_cells
+        self.start_puzzle = minimal
+        self.start()
+        return removed
+
+    def set_cell(self, row, col, val):
+        """the player puts val in the cell."""
+        self.puzzle.set_cell(row, col, val)
+        self.state.update(self.puzzle.table.index(row, col), val)
+        self.__board_changed()
+
+    def erase_cell(self, row, col):
+        """the player empties the cell."""
+        self.puzzle.erase_cell(row, col)
+        self.state.update(self.puzzle.table.index(row, col), 0)
+        self.__board_changed()
+
+    def conflicts(self):
+        """returns the set of [row, col] cells that contain the same value as one of their peers."""
+        return self.state.conflict_cells()
+
     def dispose(self):
-        """dispose cleans up the resources in the Yices library."""
-        self.solver.dispose()
+        """dispose cleans up the game's resources in the Yices library (see Registry.release for the rest)."""
+        if self.speculator is not None:
+            self.speculator.cancel()
+        if self._solver is not None:
+            self._solver.dispose()
 
+    @traced
     def count_solutions(self):
         """count_solutions returns the number of distinct solutions to the current board."""
+        if self.cached_solution(self.puzzle) is not None:
+            return 1
         return self.solver.count_models(self.options.debug)
 
+    @traced
     def get_hint(self):
-        """returns the easiest hint."""
+        """returns the easiest hint (which has usually already been computed in the background, see Speculator)."""
+        if self.speculator is not None:
+            hint = self.speculator.hint()
+            if hint is not None:
+                note(speculated=1)
+                return hint
         return self.solver.get_hint()
 
+    @traced
     def get_difficulty(self, sofa):
         """returns the difficulty of the puzzle, as is, or -1 if it is not solvable."""
         diff = [0]
@@ -84,28 +267,40 @@ class SudokuGame:
             return diff[0]
         return -1
 
+    @traced
     def get_metric(self):
-        """computes my notion of difficulty (should be a number between 0 and roughly 100)."""
+        """computes my notion of difficulty (should be a number between 0 and roughly 100), with the engine the options choose."""
+        if self.options.metric_engine == 'propagation':
+            with span('propagation'):
+                return approximate_core_metric(self.puzzle)
+        if self.options.metric_engine != 'yices':
+            raise SudokuError(f'No such metric engine: {self.options.metric_engine}')
         return self.solver.core_metric()
 
+    @traced
     def check(self):
         """Do a quick check that the puzzle is still solvable (i.e. we haven't goofed).
         If it is we return (True, None), otherwise we return (False, wrong) where
         wrong is the non None cells in puzzle that disagree with the solution.
+
+        The entries are compared with the solution of the starting puzzle (see start_solution), so we only need to
+        solve anything when the starting puzzle does not have a unique solution.
         """
-        solution = self.solver.solve()
-        if solution is not None:
-            return (True, None)
-        solution = self.solver.solve(self.start_puzzle)
+        solution = self.start_solution()
         if solution is None:
-            raise SudokuError("The starting puzzle is not solvable!")
+            if self.solver.solve() is not None:
+                return (True, None)
+            solution = self.solver.solve(self.start_puzzle, True)
+            if solution is None:
+                raise SudokuError("The starting puzzle is not solvable!")
+        else:
+            self.solves_avoided += 1
         wrong = []
-        for row in range(9):
-            for col in range(8):
-                if self.start_puzzle.get_cell(row, col) is None:
-                    current = self.puzzle.get_cell(row, col)
-                    if current is not None and current != solution.get_cell(row, col):
-                        wrong.append((row, col))
+        for index, current in enumerate(self.puzzle.cells):
+            if current != 0 and self.start_puzzle.cells[index] == 0 and current != solution.cells[index]:
+                wrong.append(self.puzzle.table.cells[index])
+        if not wrong:
+            return (True, None)
         return (False, wrong)
 
     def sanity_check(self):
@@ -113,6 +308,7 @@ class SudokuGame:
         if self.options.debug:
             print(f'puzzle.sanity_check() = {self.puzzle.sanity_check(self.options.debug)}')
             print(f'puzzle.sanity_check_sofa() = {self.puzzle.sanity_check_sofa()}')
+            print(f'state.agrees(puzzle) = {self.state.agrees(self.puzzle)}')
 
 
     def get_empty_cell_count(self):
@@ -128,7 +324,7 @@ class SudokuGame:
         if self.options.debug:
             freedom = self.puzzle.freedom_set(row, col)
             if freedom is not None:
-                vals = ' '.join([str(x) for x in range(1, 10) if x in freedom])
+                vals = ' '.join([str(x) for x in range(1, self.puzzle.dim + 1) if x in freedom])
                 print(f'[{row}, {col}]: {vals}')
             print(f'least free: {self.puzzle.least_free()}')
 
@@ -137,36 +333,8 @@ class SudokuGame:
         return self.puzzle.least_free()
 
     def check_win(self):
-        """check_win determines if the current game has been solved."""
-        for row in range(9):
-            if not self.__check_row(row):
-                return False
-        for column in range(9):
-            if not self.__check_column(column):
-                return False
-        for row in range(3):
-            for column in range(3):
-                if not self.__check_square(row, column):
-                    return False
+        """check_win determines if the current game has been solved (every row, column and block contains 1 through dim)."""
+        if not self.state.solved():
+            return False
         self.game_over = True
         return True
-
-    def __check_block(self, block): # pylint: disable=R0201
-        return set(block) == set(range(1, 10))
-
-    def __check_row(self, row):
-        return self.__check_block(self.puzzle.get_row(row))
-
-    def __check_column(self, column):
-        return self.__check_block(
-            [self.puzzle.get_cell(row, column) for row in range(9)]
-        )
-
-    def __check_square(self, row, column):
-        return self.__check_block(
-            [
-                self.puzzle.get_cell(r, c)
-                for r in range(row * 3, (row + 1) * 3)
-                for c in range(column * 3, (column + 1) * 3)
-            ]
-        )
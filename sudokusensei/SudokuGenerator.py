@@ -1,35 +1,90 @@
 """SudokuGenerator contains a port of Daniel Beer's puzzle generation code (see ../generator/sugen.c)."""
 
+import contextlib
+import multiprocessing
 import random
 
-from .SudokuLib import SudokuError, Puzzle
+from .SudokuLib import SudokuError, Puzzle, order2dim
 
-from .SudokuOptions import Options
+from .Options import Options
 
-from .DB import solve_puzzle, generate_puzzle
+from .DB import solve_puzzle, generate_puzzle, harden_puzzle, generate_grid, db_harden_puzzle, db_seed, puzzle2pyarray, pyarray2puzzle, native_available, minimize_puzzles, cache_configure, cache_stats, schedule_configure, schedule_stats
 
-_ELEMENTS = tuple(range(81))
+from .GridLibrary import GridLibrary
 
-_CELLS = tuple([(row, col) for row in range(9) for col in range(9)])
+from .Search import SearchState
+
+from .ScoreCache import shared_cache, puzzle_key, zobrist_keys, sofa_key
+
+from .Profiling import current_trace, span, note
+
+from .HardeningSchedule import HardeningSchedule
 
 _BOOLS = (True, False)
 
+# the symmetries the clues of a generated puzzle can respect, in the order of the SYMMETRY constants in sugen.h.
+SYMMETRIES = ('none', 'rotational', 'quarter', 'mirror', 'diagonal')
+
+# the (cached) cells of a board of a given order, in row major order, i.e. the cell with index i is _cells(order)[i].
+_CELLS = {}
+
+# the (cached) orbits of each cell, indexed by (symmetry, order).
+_ORBITS = {}
+
+# the (capacity, eviction) each order's C score cache was last configured with (in this process).
+_C_CACHES = {}
+
+# the (patience, min_odds) each order's C hardening schedule was last configured with (in this process).
+_C_SCHEDULES = {}
+
+def _cells(order=3):
+    """returns the (cached) tuple of the cells of a board of the given order."""
+    if order not in _CELLS:
+        dim = order2dim(order)
+        _CELLS[order] = tuple([(row, col) for row in range(dim) for col in range(dim)])
+    return _CELLS[order]
+
+def _orbit(index, symmetry, order=3):
+    """returns the indexes of the cells in the orbit of the given index under the given symmetry."""
+    dim = order2dim(order)
+    last = dim - 1
+    row, col = _cells(order)[index]
+    if symmetry == 'rotational':
+        cells = [(row, col), (last - row, last - col)]
+    elif symmetry == 'quarter':
+        cells = [(row, col), (col, last - row), (last - row, last - col), (last - col, row)]
+    elif symmetry == 'mirror':
+        cells = [(row, col), (row, last - col)]
+    elif symmetry == 'diagonal':
+        cells = [(row, col), (col, row)]
+    else:
+        cells = [(row, col)]
+    return tuple(dict.fromkeys(dim * r + c for r, c in cells))
+
+def _orbits(symmetry, order=3):
+    """returns the (cached) tuple of the orbits of each cell under the given symmetry."""
+    key = (symmetry, order)
+    if key not in _ORBITS:
+        _ORBITS[key] = tuple(_orbit(index, symmetry, order) for index in range(len(_cells(order))))
+    return _ORBITS[key]
+
 def flip():
     """randomly chooses between True and False."""
     return random.choice(_BOOLS)
 
-def random_cell():
+def random_cell(order=3):
     """randomly chooses a cell,"""
-    return random.choice(_CELLS)
+    return random.choice(_cells(order))
 
-def random_index():
-    """randomly chooses an index into the _CELLS tuple."""
-    return random.choice(_ELEMENTS)
+def random_index(order=3):
+    """randomly chooses an index into the tuple of cells."""
+    return random.randrange(len(_cells(order)))
 
-def index2cell(index):
+def index2cell(index, order=3):
     """get the cell corresponding to the given index."""
-    if 0 <= index < 81:
-        return _CELLS[index]
+    cells = _cells(order)
+    if 0 <= index < len(cells):
+        return cells[index]
     raise SudokuError(f'index2cell error: {index}')
 
 def pick_one(choices):
@@ -37,10 +92,10 @@ def pick_one(choices):
     return random.choice(tuple(choices))
 
 def _choose_b1(puzzle):
-    """randomly fills the upper-left block with unique values from range(1, 10)."""
-    choices = set(range(1, 10))
-    for row in range(3):
-        for col in range(3):
+    """randomly fills the upper-left block with unique values from range(1, dim + 1)."""
+    choices = set(range(1, puzzle.dim + 1))
+    for row in range(puzzle.order):
+        for col in range(puzzle.order):
             val = pick_one(choices)
             choices.remove(val)
             puzzle.set_cell(row, col, val)
@@ -83,40 +138,47 @@ def _choose_b3(puzzle):
 def _choose_c1(puzzle):
     """randomly fills in the rest of the first column."""
     col = 0
-    for row in range(3, 9):
+    for row in range(puzzle.order, puzzle.dim):
         choices = puzzle.freedom_set(row, col)
         val = pick_one(choices)
         puzzle.set_cell(row, col, val)
 
 
 def _choose_rest(puzzle):
-    least_free_cell = puzzle.freedom.least_free(puzzle.grid)
-    if least_free_cell is None:
+    """randomly fills in the rest of the puzzle, using a (trail based) backtracking search."""
+    state = SearchState(puzzle)
+    if _choose_rest_recurse(state):
+        state.write(puzzle)
         return True
-    row, col = least_free_cell
+    return False
 
-    choices = puzzle.freedom.freedom_set(*least_free_cell)
+def _choose_rest_recurse(state):
+    index = state.least_free()
+    if index < 0:
+        return True
 
-    while len(choices) > 0:
-        val = pick_one(choices)
-        choices.remove(val)
-        puzzle.set_cell(row, col, val)
+    choices = state.choices(index)
+    random.shuffle(choices)
 
-        if _choose_rest(puzzle):
+    for val in choices:
+        state.assign(index, val)
+        if _choose_rest_recurse(state):
             return True
+        state.undo()
 
-    puzzle.erase_cell(row, col)
     return False
 
 def choose_solution(puzzle):
-    """choose_solution generates a random solution for an empty puzzle."""
+    """choose_solution generates a random solution for an empty puzzle (of any order)."""
     _choose_b1(puzzle)
-    while True:
-        if _choose_b2(puzzle):
-            break
-    while True:
-        if _choose_b3(puzzle):
-            break
+    # as in sugen.c the rest of the top band is only filled in without backtracking in the order 3 case.
+    if puzzle.order == 3:
+        while True:
+            if _choose_b2(puzzle):
+                break
+        while True:
+            if _choose_b3(puzzle):
+                break
     _choose_c1(puzzle)
     while True:
         if _choose_rest(puzzle):
@@ -128,29 +190,113 @@ def choose_solution(puzzle):
 
 class SolveContext:
     """SolveContext is the python analog to David Beer's solve_context struct."""
-    def __init__(self, problem, solution):
-        self.problem = problem.clone()
+    def __init__(self, problem, solution, sofa=False):
+        self.problem = problem
+        self.state = SearchState(problem, sofa)
         self.count = 0
         self.solution = solution
         self.branch_score = 0
 
 
-def _p_solve(problem, solution, diff, debug):
+def _multiplier(elements):
+    """the multiplier of the branch score in the difficulty, as in sugen.c: the first power of 10 that exceeds the number of cells."""
+    mult = 1
+    while mult <= elements:
+        mult *= 10
+    return mult
+
+
+def _p_solve(problem, solution, diff, debug, sofa=False):
     """python equivalent to David Beer's solve function."""
-    ctx = SolveContext(problem, solution)
     if not problem.sanity_check(debug):
         return -1
-    _p_solve_recurse(ctx, 0)
+    ctx = SolveContext(problem, solution, sofa)
+    if sofa:
+        _p_solve_recurse_sofa(ctx, 0)
+    else:
+        _p_solve_recurse(ctx, 0)
     # calculate a difficulty score
     if diff is not None:
-        diff[0] = (ctx.branch_score * 100) + problem.empty_cells
+        diff[0] = (ctx.branch_score * _multiplier(problem.elements)) + problem.empty_cells
     if debug:
-        print(f'solver returns {ctx.count - 1}  diff {diff[0] if diff is not None else "?"} empty {problem.empty_cells}')
+        print(f'solver (sofa={sofa}) returns {ctx.count - 1}  diff {diff[0] if diff is not None else "?"} empty {problem.empty_cells}')
     return ctx.count - 1
 
 
 def _p_solve_recurse(ctx, diff):
-    """python equivalent to David Beer's solve_recurse function (no sofa)."""
+    """python equivalent to David Beer's solve_recurse function (no sofa), undoing each assignment via the search state's trail."""
+    state = ctx.state
+    index = state.least_free()
+    if index < 0:
+        if ctx.count == 0:
+            ctx.branch_score = diff
+            if ctx.solution is not None:
+                ctx.solution.copy(ctx.problem)
+                state.write(ctx.solution)
+        ctx.count += 1
+        return
+    free = state.choices(index)
+    bf = len(free) - 1
+    diff += bf * bf
+    for val in free:
+        state.assign(index, val)
+        _p_solve_recurse(ctx, diff)
+        state.undo()
+        if ctx.count >= 2:
+            return
+
+
+def _p_solve_recurse_sofa(ctx, diff):
+    """python equivalent to David Beer's solve_recurse_sofa function."""
+    state = ctx.state
+    index = state.least_free()
+    if index < 0:
+        if ctx.count == 0:
+            ctx.branch_score = diff
+            if ctx.solution is not None:
+                ctx.solution.copy(ctx.problem)
+                state.write(ctx.solution)
+        ctx.count += 1
+        return
+    free = state.choices(index)
+    # if we can't determine the cell's value, see if set-oriented backtracking provides a smaller branching factor.
+    if len(free) > 1:
+        positions, value = state.sofa()
+        if positions is not None and len(positions) < len(free):
+            bf = len(positions) - 1
+            diff += bf * bf
+            for position in positions:
+                state.assign(position, value)
+                _p_solve_recurse_sofa(ctx, diff)
+                state.undo()
+                if ctx.count >= 2:
+                    return
+            return
+    # otherwise, fall back to cell-oriented backtracking.
+    bf = len(free) - 1
+    diff += bf * bf
+    for val in free:
+        state.assign(index, val)
+        _p_solve_recurse_sofa(ctx, diff)
+        state.undo()
+        if ctx.count >= 2:
+            return
+
+
+#the clone and mutate version of _p_solve, kept for comparison (see Benchmarks).
+def _p_solve_clone(problem, solution, diff, debug):
+    """python equivalent to David Beer's solve function, searching a clone of the problem."""
+    if not problem.sanity_check(debug):
+        return -1
+    ctx = SolveContext(problem.clone(), solution)
+    _p_solve_clone_recurse(ctx, 0)
+    if diff is not None:
+        diff[0] = (ctx.branch_score * _multiplier(problem.elements)) + problem.empty_cells
+    return ctx.count - 1
+
+
+def _p_solve_clone_recurse(ctx, diff):
+    """python equivalent to David Beer's solve_recurse function (no sofa), mutating the problem itself."""
     least_free_cell = ctx.problem.least_free()
     if least_free_cell is None:
         if ctx.count == 0:
@@ -165,84 +311,406 @@ def _p_solve_recurse(ctx, diff):
     diff += bf * bf
     for val in free:
         ctx.problem.set_cell(row, col, val)
-        _p_solve_recurse(ctx, diff)
+        _p_solve_clone_recurse(ctx, diff)
         if ctx.count >= 2:
             return
     ctx.problem.erase_cell(row, col)
 
 
+def _p_solve_cached(cache, problem, key, diff, debug, sofa=False): # pylint: disable=R0913
+    """_p_solve(problem, None, diff, debug, sofa) via the score cache, where key is the problem's Zobrist hash."""
+    if sofa:
+        key ^= sofa_key(problem.order)
+    score = cache.get(key)
+    if score is None:
+        sx = [0]
+        score = (_p_solve(problem, None, sx, debug, sofa), sx[0])
+        cache.put(key, score)
+    if diff is not None:
+        diff[0] = score[1]
+    return score[0]
+
+def _p_minimize(puzzle, shuffle, debug):
+    """python equivalent to minimize_puzzle in sugen.c, returns the number of clues erased (-1 if the puzzle does not have a unique solution) and the minimal copy."""
+    minimal = puzzle.clone()
+    if _p_solve(minimal, None, None, debug, True) != 0:
+        return (-1, minimal)
+    cells = list(minimal.table.cells)
+    if shuffle:
+        random.shuffle(cells)
+    removed = 0
+    for row, col in cells:
+        val = minimal.get_cell(row, col)
+        if val is None:
+            continue
+        minimal.erase_cell(row, col)
+        # the sofa search is much quicker at discovering a second solution
+        if _p_solve(minimal, None, None, debug, True) == 0:
+            removed += 1
+        else:
+            minimal.set_cell(row, col, val)
+    return (removed, minimal)
+
+
+@contextlib.contextmanager
+def _harden_span(iterations, stats):
+    """times a hardening run as a stage of the current trace, noting how many puzzles it scored, and how many of those the score cache (whose stats are given) knew."""
+    with span('harden', iterations=iterations):
+        before = stats() if current_trace() is not None else None
+        try:
+            yield
+        finally:
+            if before is not None:
+                after = stats()
+                note(scored=after['lookups'] - before['lookups'], cached=after['hits'] - before['hits'])
+
+def _harden_chain(options, seed, best, board, grid, stop):
+    """runs a single hardening chain, in its own process, on behalf of SudokuGenerator.generate_parallel."""
+    # forked chains inherit the state of both random number generators
+    random.seed(seed)
+    generator = SudokuGenerator(options)
+    if generator.native():
+        db_seed(seed, options.order)
+    generator.harden_chain(best, board, grid, stop)
+
+
 class SudokuGenerator:
     """The puzzle generation algorithm of Daniel Beer."""
 
     MAX_DIFF = -1
 
+    # the number of iterations a C chain performs between looking at what the others are up to.
+    CHAIN_CHUNK = 10
+
+    # the number of slices without progress after which a C chain that has fallen behind continues from the best so far.
+    CHAIN_STALL = 5
+
     def __init__(self, options=None):
         self.options = options if options is not None else Options()
+        # the schedule of the last python hardening (see HardeningSchedule)
+        self.schedule = None
+
+    def native(self):
+        """returns True if we use the C, i.e. the user wants to and the C library for the order is available."""
+        return self.options.use_c and native_available(self.options.order)
 
     def solve(self, problem, solution, diff, sofa=None):
         """solve a puzzle according the user's options."""
         sofa = self.options.sofa if sofa is None else sofa
-        if not self.options.use_c:
-            return  _p_solve(problem, solution, diff, self.options.debug)
-        return solve_puzzle(problem, solution, diff, sofa)
-
+        if not self.native():
+            with span('python solve', sofa=sofa):
+                return _p_solve(problem, solution, diff, self.options.debug, sofa)
+        with span('c solve', sofa=sofa):
+            return solve_puzzle(problem, solution, diff, sofa)
+
+
+    def minimize(self, puzzle, shuffle=True):
+        """returns a minimal copy of the (uniquely solvable) puzzle: every clue whose removal leaves the solution unique is erased.
+
+        The clues are tried in a random order if shuffle is True, and in row major order otherwise.
+        """
+        return self.minimize_batch([puzzle], shuffle)[0]
+
+    def minimize_batch(self, puzzles, shuffle=True):
+        """returns a minimal copy of each of the puzzles (see minimize), using a single call to the C if the puzzles all have the same order."""
+        with span('minimize', puzzles=len(puzzles)):
+            if puzzles and self.options.use_c and native_available(puzzles[0].order) and all(puzzle.order == puzzles[0].order for puzzle in puzzles):
+                results = minimize_puzzles(puzzles, shuffle)
+            else:
+                results = [_p_minimize(puzzle, shuffle, self.options.debug) for puzzle in puzzles]
+            note(removed=sum(removed for removed, _ in results if removed > 0))
+        if any(removed < 0 for removed, _ in results):
+            raise SudokuError('minimize: the puzzle does not have a unique solution.')
+        return [minimal for _, minimal in results]
 
     def generate(self):
         """generate a puzzle, either using the python version of Daniel Beer's harden_puzzle, or the actual C."""
-        if not self.options.use_c:
+        if self.options.workers > 1:
+            with span('chains', workers=self.options.workers):
+                return self.generate_parallel(self.options.workers)
+        if not self.native():
             return self._p_generate()
-        return generate_puzzle(self.options.difficulty, self.options.sofa, -1, self.options.iterations)
+        self.configure_cache()
+        self.configure_schedule()
+        # db_generate_puzzle is just the two, so when tracing we time the grid and the hardening separately
+        if self.options.templates or self.constrained() or current_trace() is not None:
+            with span('grid', templates=self.options.templates):
+                grid = self.choose_grid()
+            with _harden_span(self.options.iterations, lambda: cache_stats(self.options.order)):
+                return harden_puzzle(grid, self.options.difficulty, self.options.sofa, -1, self.options.iterations, *self.constraints())
+        return generate_puzzle(self.options.difficulty, self.options.sofa, -1, self.options.iterations, self.options.order)
+
+    def configure_cache(self):
+        """configures the C score cache of the order we generate according to the user's options (if they have changed)."""
+        config = (self.options.score_cache, self.options.cache_eviction)
+        if _C_CACHES.get(self.options.order) != config:
+            cache_configure(*config, self.options.order)
+            _C_CACHES[self.options.order] = config
+
+    def configure_schedule(self):
+        """configures the C hardening schedule of the order we generate according to the user's options (if they have changed)."""
+        schedule = HardeningSchedule.from_options(self.options)
+        config = (schedule.patience, schedule.min_odds)
+        if _C_SCHEDULES.get(self.options.order) != config:
+            schedule_configure(*config, self.options.order)
+            _C_SCHEDULES[self.options.order] = config
+
+    def schedule_stats(self):
+        """returns the statistics of the generator's last hardening (the C's if we use the C), see HardeningSchedule.stats."""
+        if self.native():
+            return schedule_stats(self.options.order)
+        return self.schedule.stats() if self.schedule is not None else None
+
+    def score_cache(self):
+        """returns the python score cache, as configured by the user's options."""
+        return shared_cache(self.options.score_cache, self.options.cache_eviction)
+
+    def cache_stats(self):
+        """returns the statistics of the score cache the generator uses (the C one if we use the C)."""
+        if self.native():
+            self.configure_cache()
+            return cache_stats(self.options.order)
+        return self.score_cache().stats()
+
+    def elements(self):
+        """returns the number of cells in the puzzles we generate."""
+        return order2dim(self.options.order) ** 2
+
+    def choose_grid(self):
+        """returns a random (C) solution grid as a pyarray, either from the grid library or from scratch, according to the user's options."""
+        if self.options.templates:
+            return list(GridLibrary.default(self.options.order).draw())
+        return generate_grid(self.options.order)
+
+    def constraints(self):
+        """returns the (symmetry, min_clues, max_clues) constraints, as the C hardener expects them, from the user's options."""
+        if self.options.symmetry not in SYMMETRIES:
+            raise SudokuError(f'No such symmetry: {self.options.symmetry}')
+        max_clues = self.elements() if self.options.max_clues is None else self.options.max_clues
+        return (SYMMETRIES.index(self.options.symmetry), self.options.min_clues, max_clues)
+
+    def constrained(self):
+        """returns True if the user's options constrain the generated puzzles beyond Daniel Beer's original."""
+        return self.constraints() != (SYMMETRIES.index('rotational'), 0, self.elements())
+
+    def satisfies_constraints(self, puzzle):
+        """returns True if the puzzle respects the symmetry and clue count constraints in the user's options."""
+        _, min_clues, max_clues = self.constraints()
+        clues = puzzle.elements - puzzle.empty_cells
+        if not min_clues <= clues <= max_clues:
+            return False
+        for orbit in _orbits(self.options.symmetry, puzzle.order):
+            if len({puzzle.get_cell(*index2cell(index, puzzle.order)) is None for index in orbit}) != 1:
+                return False
+        return True
 
-    def _p_generate(self):
-        """generate a puzzle, a version of Daniel Beer's harden_puzzle."""
+    def generate_parallel(self, workers):
+        """generate a puzzle by running workers independent hardening chains, each in its own process, and keeping the best.
+
+        The chains share the best-so-far puzzle (and its solution grid): a C chain that has stalled behind it continues from it,
+        and they all stop as soon as one of them reaches the target difficulty.
+        """
+        context = multiprocessing.get_context()
+        best = context.Value('i', -1)
+        board = context.Array('B', self.elements())
+        grid = context.Array('B', self.elements())
+        stop = context.Event()
+        chains = [context.Process(target=_harden_chain, args=(self.options, random.getrandbits(32), best, board, grid, stop)) for _ in range(workers)]
+        for chain in chains:
+            chain.start()
+        for chain in chains:
+            chain.join()
+        if best.value < 0:
+            raise SudokuError('generate_parallel: no chain produced a puzzle.')
+        return (best.value, pyarray2puzzle(board[:]))
+
+    def harden_chain(self, best, board, grid, stop):
+        """runs one chain of generate_parallel, sharing the best puzzle (and its solution grid) in best, board and grid, until stop is set.
+
+        A python chain hardens in one go, and only publishes its puzzle at the end (it never continues from another chain's).
+        A C chain hardens in slices of CHAIN_CHUNK iterations, and after each one publishes its puzzle if it is the best so far,
+        or continues from the best so far if it is behind and has made no progress for CHAIN_STALL slices. Either way the chain
+        follows the user's hardening schedule (see HardeningSchedule), a C chain judging its runs' progress slice by slice. A
+        schedule that restarts stalled runs replaces continuing from the best so far, so its runs are the chain's own.
+        """
+        target = self.options.difficulty
+
+        if not self.native():
+            generated = self._p_generate(stop)
+            if generated is None:
+                return
+            score, puzzle = generated
+            with best.get_lock():
+                if score > best.value:
+                    best.value = score
+                    board[:] = puzzle2pyarray(puzzle)
+            if score >= target:
+                stop.set()
+            return
 
-        puzzle = Puzzle()
+        self.configure_cache()
+        # the slices are too short for the C's schedule, so the chain follows the user's schedule across them
+        schedule = HardeningSchedule.from_options(self.options)
+        self.schedule = schedule
+        schedule_configure(0, schedule.min_odds, self.options.order)
+        _C_SCHEDULES[self.options.order] = (0, schedule.min_odds)
+        solution = self.choose_grid()
+        puzzle = solution.copy()
+        diff = [0]
+        # the iterations, best score, and last iteration that made progress, of the current run
+        used, run_best, progress = 0, 0, 0
+        # the chain's score after the last slice, and the number of slices since it improved
+        last, stalled = 0, 0
+        constraints = self.constraints()
+        while schedule.remaining > used and not stop.is_set():
+            chunk = min(SudokuGenerator.CHAIN_CHUNK, schedule.remaining - used)
+            db_harden_puzzle(solution, puzzle, diff, target, -1, chunk, self.options.sofa, *constraints)
+            used += schedule_stats(self.options.order)['iterations']
+            # the score of this run's own puzzle, which is all the schedule gets to see
+            score = diff[0]
+            stalled = 0 if score > last else stalled + 1
+            last = score
+            with best.get_lock():
+                if score > best.value:
+                    best.value = score
+                    board[:] = puzzle
+                    grid[:] = solution
+                elif score < best.value and stalled >= SudokuGenerator.CHAIN_STALL and schedule.patience == 0:
+                    puzzle[:] = board[:]
+                    solution[:] = grid[:]
+                    last, stalled = best.value, 0
+            if score >= target:
+                stop.set()
+            if score > run_best:
+                run_best, progress = score, used
+            if 0 < schedule.patience <= used - progress:
+                if not schedule.another(run_best, used):
+                    return
+                solution = self.choose_grid()
+                puzzle = solution.copy()
+                used, run_best, progress = 0, 0, 0
+                last, stalled = 0, 0
+
+    def choose_solution(self):
+        """returns a random solution grid, either from the grid library or from scratch, according to the user's options."""
+        if self.options.templates:
+            return GridLibrary.default(self.options.order).draw_puzzle()
+        puzzle = Puzzle(order=self.options.order)
         choose_solution(puzzle)
-        solution = puzzle.clone()
+        return puzzle
 
-        if self.options.debug:
-            puzzle.pprint()
+    def _p_generate(self, stop=None):
+        """generate a puzzle, a version of Daniel Beer's harden_puzzle (that gives up early if stop is set), restarting according to the user's schedule."""
+
+        cache = self.score_cache()
+        schedule = HardeningSchedule.from_options(self.options)
+        self.schedule = schedule
+        best_score = -1
+        best_puzzle = None
+
+        while True:
+            with span('grid', templates=self.options.templates):
+                puzzle = self.choose_solution()
+            solution = puzzle.clone()
+
+            if self.options.debug:
+                puzzle.pprint()
+
+            with _harden_span(schedule.remaining, cache.stats):
+                hardened = self._p_harden(puzzle, solution, stop, schedule.remaining, schedule.patience)
+            if hardened is None:
+                return None
+            score, puzzle, used = hardened
+            if score > best_score:
+                best_score = score
+                best_puzzle = puzzle
+            if (stop is not None and stop.is_set()) or not schedule.another(score, used):
+                return (best_score, best_puzzle)
+
+    def _p_harden(self, puzzle, solution, stop, iterations, patience=0): # pylint: disable=R0913
+        """the hardening loop of _p_generate, starting from the solution grid puzzle (a copy of solution).
+
+        Returns (score, puzzle, the number of iterations made), giving up after patience iterations without progress (if patience is positive).
+        """
+
+        order = self.options.order
+        symmetry, min_clues, max_clues = self.constraints()
+        orbits = _orbits(SYMMETRIES[symmetry], order)
+        cache = self.score_cache()
+        keys = zobrist_keys(order)
 
         best = [0]
-        code = _p_solve(puzzle, None, best, self.options.debug)
+        key = puzzle_key(puzzle)
+        code = _p_solve_cached(cache, puzzle, key, best, self.options.debug, self.options.sofa)
 
         if code != 0:
             print("Bug")
             return None
 
-        for i in range(self.options.iterations):
+        # until we have a puzzle with at most max_clues we only look for valid puzzles with fewer clues.
+        feasible = puzzle.elements - puzzle.empty_cells <= max_clues
+        # the last iteration that made progress
+        progress = 0
+
+        i = 0
+        while i < iterations:
+
+            if stop is not None and stop.is_set():
+                break
+
+            if 0 < patience <= i - progress:
+                break
 
             if self.options.debug:
                 print(f'\tIteration: {i} {best[0]}')
 
             next_puzzle = puzzle.clone()
+            next_key = key
 
-            for j in range(18):
+            for j in range(2 * puzzle.dim):
                 sx = [0]
-                cx = random_index()
-                r1, c1 = index2cell(cx)
-                r2, c2 = index2cell(81 - cx - 1)
+                cells = [index2cell(cx, order) for cx in orbits[random_index(order)]]
 
                 if flip():
-                    next_puzzle.set_cell(r1, c1, solution.get_cell(r1, c1))
-                    next_puzzle.set_cell(r2, c2, solution.get_cell(r2, c2))
+                    for row, col in cells:
+                        if next_puzzle.get_cell(row, col) is None:
+                            next_key ^= keys[puzzle.dim * row + col][solution.get_cell(row, col)]
+                        next_puzzle.set_cell(row, col, solution.get_cell(row, col))
                 else:
-                    next_puzzle.erase_cell(r1, c1)
-                    next_puzzle.erase_cell(r2, c2)
+                    removed = sum(1 for row, col in cells if next_puzzle.get_cell(row, col) is not None)
+                    if next_puzzle.elements - next_puzzle.empty_cells - removed < min_clues:
+                        continue
+                    for row, col in cells:
+                        if next_puzzle.get_cell(row, col) is not None:
+                            next_key ^= keys[puzzle.dim * row + col][next_puzzle.get_cell(row, col)]
+                        next_puzzle.erase_cell(row, col)
+
+                clues = next_puzzle.elements - next_puzzle.empty_cells
+                if clues > max_clues:
+                    # getting closer to the bounds (or moving along a plateau) is progress, if the puzzle is still valid
+                    if not feasible and clues <= puzzle.elements - puzzle.empty_cells and _p_solve_cached(cache, next_puzzle, next_key, None, self.options.debug, self.options.sofa) == 0:
+                        puzzle.copy(next_puzzle)
+                        key = next_key
+                        progress = i
+                    continue
 
-                code = _p_solve(next_puzzle, None, sx, self.options.debug)
+                code = _p_solve_cached(cache, next_puzzle, next_key, sx, self.options.debug, self.options.sofa)
 
                 if code == 0:
-                    if sx[0] > best[0]:
+                    if sx[0] > best[0] or not feasible:
                         puzzle.copy(next_puzzle)
+                        key = next_key
+                        feasible = True
+                        progress = i
                     best[0] = sx[0]
 
                     if sx[0] >= self.options.difficulty:
                         if self.options.debug:
                             print(f'Iteration {i} {j}')
-                        return (best[0], puzzle)
+                        return (best[0], puzzle, i + 1)
 
+            i += 1
 
         if self.options.debug:
-            print(f'Iteration {self.options.iterations}')
-        return (best[0], puzzle)
+            print(f'Iteration {i}')
+        return (best[0], puzzle, i)
@@ -2,15 +2,14 @@
 
 import os.path
 import argparse
+import heapq
 
-import pkg_resources as pkg
+from array import array
 
-from yices.Types import Types
-from yices.Terms import Terms
+from .Peers import ORDERS, peer_table
 
-from .StringBuilder import StringBuilder
-
-int_t = Types.int_type()
+# the characters used to write the values 1 through 25 (0 is the empty cell), as in sugen.c.
+ALPHABET = '0123456789ABCDEFGHIJKLMNOP'
 
 class SudokuError(Exception):
     """An application specific error."""
@@ -32,46 +31,55 @@ def parse_arguments():
     return args['board']
 
 
-def make_grid():
-    """make_grid constructs a 9x9 grid all whose entries are initially None."""
-    grid = [None] * 9
-    for i in range(9):
-        grid[i] = [None] * 9
+def resource_path(name):
+    """returns the path of one of the package's files, e.g. data/351.sudoku (without the cost of importing pkg_resources)."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+
+def order2dim(order):
+    """returns the dimension (the length of a row) of a board of the given order, e.g. 9 for order 3."""
+    if order not in ORDERS:
+        raise SudokuError(f'Unsupported order: {order}')
+    return order * order
+
+def dim2order(dim):
+    """returns the order of a board whose rows have the given length, e.g. 3 for 9."""
+    for order in ORDERS:
+        if order * order == dim:
+            return order
+    raise SudokuError(f'Unsupported dimension: {dim}')
+
+def make_grid(dim=9):
+    """make_grid constructs a dim x dim grid all whose entries are initially None."""
+    grid = [None] * dim
+    for i in range(dim):
+        grid[i] = [None] * dim
     return grid
 
-def make_constants():
-    """make_constants makes a map from the digits 1 through 9 to the Yices constant denoting that digit."""
-    constants = {}
-    for i in range(1, 10):
-        constants[i] = Terms.integer(i)
-    return constants
-
-def make_variables():
-    """make_variables creates a 9x9 grid with each cell containing the Yices term representing that cell."""
-    variables = make_grid()
-    for i in range(9):
-        for j in range(9):
-            variables[i][j] = Terms.new_uninterpreted_term(int_t)
-    return variables
-
-def make_cell_map():
+def make_cell_map(dim=9):
     """constructs an initially empty cell map."""
     cell_map = {}
-    for row in range(9):
-        for col in range(9):
+    for row in range(dim):
+        for col in range(dim):
             cell_map[(row, col)] = set()
     return cell_map
 
+def make_count_map(dim=9):
+    """constructs a map from cells to (initially zero) counts of each value, indexed 1 through dim."""
+    count_map = {}
+    for row in range(dim):
+        for col in range(dim):
+            count_map[(row, col)] = [0] * (dim + 1)
+    return count_map
+
 def clear_cell_map(cm):
     """resets a cell map so that it is empty."""
-    for row in range(9):
-        for col in range(9):
-            cm[(row, col)].clear()
+    for cell in cm:
+        cm[cell].clear()
 
-def make_value_map():
+def make_value_map(dim=9):
     """constructs an initially empty mapping from values to cells."""
     v2c = {}
-    for val in range(1, 10):
+    for val in range(1, dim + 1):
         v2c[val] = set()
     return v2c
 
@@ -83,13 +91,22 @@ class Freedom:
     whether they contain a value already). The map is updated as the puzzle is mutated.
     """
 
-    def __init__(self):
+    def __init__(self, order=3):
+
+        self.order = order
+        self.dim = order2dim(order)
+        self.values = range(1, self.dim + 1)
+        # the static peer tables
+        self.table = peer_table(order)
 
         # the set represents the values a cell CANNOT take
-        self.freedom = make_cell_map()
+        self.freedom = make_cell_map(self.dim)
+
+        # counts[cell][val] is the number of the cell's peers that contain val (so val is in freedom[cell] iff it is positive)
+        self.counts = make_count_map(self.dim)
 
         # the set represents the cells that CANNOT contain the 'val'
-        self.sofa_map = make_value_map()
+        self.sofa_map = make_value_map(self.dim)
 
     def dump(self, puzzle):
         """prints out the maps for debugging."""
@@ -98,39 +115,19 @@ class Freedom:
 
     def dump_freedom(self):
         """prints out the freedom map for debugging."""
-        for row in range(9):
-            for col in range(9):
+        for row in range(self.dim):
+            for col in range(self.dim):
                 print(f'[{row}, {col}]: {self.freedom_set(row, col)}')
 
 
     def dump_sofa(self, puzzle):
         """prints out the sofa map for debugging."""
-        for val in range(1, 10):
+        for val in self.values:
             print(f'\n{val} (|{puzzle.empty_cells - len(self.sofa_map[val])}|):\t{self.sofa_map[val]}')
 
-    def update_sofa(self, row, col, val, oval):
-        """update the sofa map.
-
-        We are changing the contents of [row, col] from oval to val.
-        So only sofa_map[oval] and sofa_map[val] will change, and they will only
-        change for cells in Regions.influence(row, col).
-        """
-        assert oval is not None or val is None
-        assert oval is not val
-        # the empty cells that cannot contain oval (should decrease)
-        oval_set = self.sofa_map[oval]
-        # the empty cells that cannot contain val (should increase)
-        val_set = self.sofa_map[val] if val is not None else None
-        for cell in Regions.influence(row, col):
-            fset = self.freedom[cell]
-            if oval not in fset:
-                oval_set.discard(cell)
-            if val is not None and val in fset:
-                val_set.add(cell)
-
     def sanity_check_sofa(self, grid):
         """We check that every sofa set agrees with the freedom analysis."""
-        for val in range(1, 10):
+        for val in self.values:
             for cell in self.sofa_map[val]:
                 if grid[cell[0]][cell[1]] is not None:
                     print(f'Wrong: {val} {cell} is not empty.')
@@ -152,30 +149,55 @@ class Freedom:
         self.update(grid, row, col, None, oval)
 
     def update(self, grid, row, col, val, oval):
-        """update the freedom map (using Regions) by adding the fact that the cell (row, col) contents is being updated from oval to val."""
-        if oval is None and val is not None:
-            # the easy case, just need to add the new information
-            for cell in Regions.influence(row, col):
-                if cell != (row, col):
-                    self.freedom[cell].add(val)
-                    # the sofa is almost straight forward:
+        """update the freedom and sofa maps by adding the fact that the cell (row, col) contents is being updated from oval to val.
+
+        Each peer's count of oval goes down, and its count of val goes up, so every update (fill, erase or overwrite) is O(peers).
+        """
+        freedom = self.freedom
+        counts = self.counts
+        peer_cells = self.table.peer_cells[self.dim * row + col]
+        if oval is not None:
+            oval_set = self.sofa_map[oval]
+            for cell in peer_cells:
+                count = counts[cell]
+                count[oval] -= 1
+                if count[oval] == 0:
+                    freedom[cell].discard(oval)
+                    if grid[cell[0]][cell[1]] is None:
+                        oval_set.discard(cell)
+        if val is not None:
+            val_set = self.sofa_map[val]
+            for cell in peer_cells:
+                count = counts[cell]
+                count[val] += 1
+                if count[val] == 1:
+                    freedom[cell].add(val)
                     if grid[cell[0]][cell[1]] is None:
-                        self.sofa_map[val].add(cell)
-                    # but we also have to incorporate the fact that [row, col] is no longer empty:
-                    for x in range(1, 10):
-                        self.sofa_map[x].discard((row, col))
-        else:
-            # for the freedom map: just recompute the entire region of influence
-            for cell in Regions.influence(row, col):
-                self.freedom[cell] = Regions.forbidden_set(grid, cell[0], cell[1])
-            # once the freedom map is done we can do the sofa map
-            self.update_sofa(row, col, val, oval)
+                        val_set.add(cell)
+        sofa_map = self.sofa_map
+        # the sofa map only contains empty cells, so [row, col] leaves it, or rejoins it.
+        if oval is None:
+            for x in self.values:
+                sofa_map[x].discard((row, col))
+        elif val is None:
+            for x in freedom[(row, col)]:
+                sofa_map[x].add((row, col))
 
     def constrain(self, matrix):
-        """computes the cell freedom analysis."""
-        for row in range(9):
-            for col in range(9):
-                self.freedom[(row, col)] = Regions.forbidden_set(matrix, row, col)
+        """computes the cell freedom analysis (and the counts and sofa map behind it) from scratch."""
+        for val in self.values:
+            self.sofa_map[val].clear()
+        for index, cell in enumerate(self.table.cells):
+            count = [0] * (self.dim + 1)
+            for row, col in self.table.peer_cells[index]:
+                val = matrix[row][col]
+                if val is not None:
+                    count[val] += 1
+            self.counts[cell] = count
+            self.freedom[cell] = {val for val in self.values if count[val] > 0}
+            if matrix[cell[0]][cell[1]] is None:
+                for val in self.freedom[cell]:
+                    self.sofa_map[val].add(cell)
 
     def contains(self, row, col, val):
         """returns true if the val is one of the possible (immediate) choices for the given cell."""
@@ -188,14 +210,14 @@ class Freedom:
         I.e. the complement of the set we store in the map for the given cell.
         """
         sx = self.freedom[(row, col)]
-        return set(range(1, 10)).difference(sx)
+        return set(self.values).difference(sx)
 
     def least_free(self, matrix):
         """least_free returns the empty cell with the least freedom."""
         least = None
-        least_size = 0
-        for row in range(9):
-            for col in range(9):
+        least_size = -1
+        for row in range(self.dim):
+            for col in range(self.dim):
                 if matrix[row][col] is None:
                     sx = self.freedom[(row, col)]
                     sxz = len(sx)
@@ -206,80 +228,66 @@ class Freedom:
 
     def clone(self):
         """return an exact copy that shares no structure."""
-        copy = Freedom()
-        for row in range(9):
-            for col in range(9):
-                copy.freedom[(row, col)].update(self.freedom[(row, col)])
+        copy = Freedom(self.order)
+        for cell in self.table.cells:
+            copy.freedom[cell].update(self.freedom[cell])
+            copy.counts[cell] = self.counts[cell].copy()
+        for val in self.values:
+            copy.sofa_map[val].update(self.sofa_map[val])
         return copy
 
 
-class Regions:
-    """see if caching can speed things up a bit."""
-
-    _block_map = {}
+def forbidden_set(grid, peer_cells):
+    """returns the set of values held by the given peer cells, i.e. the values their cell CANNOT contain in the given grid."""
+    retval = {grid[row][col] for row, col in peer_cells}
+    retval.discard(None)
+    return retval
 
-    _row_map = {}
 
-    _column_map = {}
+class Regions:
+    """Regions of the board as frozen sets of cells (the hot paths use the tables in Peers directly)."""
 
-    _influence_map = {}
+    @staticmethod
+    def _check(row, col, order, what):
+        dim = order * order
+        if not (0 <= row < dim and 0 <= col < dim):
+            raise SudokuError(f'{what} error: {row} {col}')
+        return peer_table(order)
 
     @staticmethod
-    def block(orow, ocol):
+    def block(orow, ocol, order=3):
         """returns a list of cells that make up the block the cell belongs to."""
-        if 0 <= orow <= 8 and 0 <= ocol <= 8:
-            row = 3 * (orow // 3)
-            col = 3 * (ocol // 3)
-            if (row, col) in Regions._block_map:
-                return Regions._block_map[(row, col)]
-            retval = frozenset({(r, c) for r in range(row, row + 3) for c in range(col, col + 3)})
-            Regions._block_map[(row, col)] = retval
-            return retval
-        raise SudokuError(f'block error: {orow} {ocol}')
+        table = Regions._check(orow, ocol, order, 'block')
+        return frozenset(table.unit_cells[2 * table.dim + table.block_of[table.index(orow, ocol)]])
 
     @staticmethod
-    def row(rw):
-        """returns the (cached) row at the given index."""
-        if 0 <= rw <= 8:
-            if rw in Regions._row_map:
-                return Regions._row_map[rw]
-            retval = frozenset({(rw, c) for c in range(9)})
-            Regions._row_map[rw] = retval
-            return retval
-        raise SudokuError(f'row error: {rw}')
+    def row(rw, order=3):
+        """returns the row at the given index."""
+        table = Regions._check(rw, 0, order, 'row')
+        return frozenset(table.unit_cells[rw])
 
     @staticmethod
-    def column(cl):
-        """returns the (cached) column at the given index."""
-        if 0 <= cl <= 8:
-            if cl in Regions._column_map:
-                return Regions._column_map[cl]
-            retval = frozenset({(r, cl) for r in range(9)})
-            Regions._column_map[cl] = retval
-            return retval
-        raise SudokuError(f'column error: {cl}')
+    def column(cl, order=3):
+        """returns the column at the given index."""
+        table = Regions._check(0, cl, order, 'column')
+        return frozenset(table.unit_cells[table.dim + cl])
 
     @staticmethod
-    def influence(row, col):
-        """returns the (cached) frozen set of cells influenced by the given cell."""
-        if 0 <= row <= 8 and  0 <= col <= 8:
-            if (row, col) in Regions._influence_map:
-                return Regions._influence_map[(row, col)]
-            retval = frozenset(Regions.block(row, col).union(Regions.row(row), Regions.column(col)))
-            Regions._influence_map[(row, col)] = retval
-            return retval
-        raise SudokuError(f'influence error: {row} {col}')
+    def influence(row, col, order=3):
+        """returns the frozen set of cells influenced by the given cell."""
+        table = Regions._check(row, col, order, 'influence')
+        return frozenset(table.influence[table.index(row, col)])
 
 
     @staticmethod
-    def forbidden_set(grid, row, col):
+    def forbidden_set(grid, row, col, order=3):
         """returns the set of values that the given cell CANNOT contain in the given grid."""
-        influence = Regions.influence(row, col)
-        return {grid[cell[0]][cell[1]] for cell in influence if grid[cell[0]][cell[1]] is not None and cell != (row, col)}
+        table = Regions._check(row, col, order, 'forbidden_set')
+        return forbidden_set(grid, table.peer_cells[table.index(row, col)])
 
 
 class Puzzle:
-    """Puzzle is a 9x9 grid of digits between 1 and 9 inclusive, or None."""
+    """Puzzle is a dim x dim grid of digits between 1 and dim inclusive, or None (dim is 9 for the default order of 3)."""
 
     def puzzle2path(self, path):
         """puzzle2path writes the puzzle out the the file specified by 'path'."""
@@ -290,79 +298,138 @@ class Puzzle:
     def path2puzzle(path):
         """path2puzzle reads, parses and creates a puzzle from the given 'path'."""
         with open(path, 'r') as fp:
-            matrix = make_grid()
+            # the length of the first line determines the order of the puzzle
+            dim = None
+            matrix = None
             row = 0
             col = 0
             for line in fp:
                 line = line.strip()
-                if len(line) != 9:
-                    raise SudokuError('Each line in the sudoku puzzle must be 9 chars long.')
+                if dim is None:
+                    dim = len(line)
+                    if dim not in [order * order for order in ORDERS]:
+                        raise SudokuError(f'The first line of the sudoku puzzle has an unsupported length: {dim}')
+                    matrix = make_grid(dim)
+                if len(line) != dim:
+                    raise SudokuError(f'Each line in the sudoku puzzle must be {dim} chars long.')
                 for char in line:
-                    if not char.isdigit():
-                        raise SudokuError('Valid characters for a sudoku puzzle must be in 0-9')
-                    digit = int(char)
+                    digit = ALPHABET.find(char.upper())
+                    if not 0 <= digit <= dim:
+                        raise SudokuError(f'Valid characters for a sudoku puzzle must be in {ALPHABET[:dim + 1]}')
                     if digit != 0:
                         matrix[row][col] = digit # pylint: disable=E1137
                     col += 1
                 row += 1
                 col = 0
-                if row == 9:
+                if row == dim:
                     break
-            return Puzzle(matrix)
+            if matrix is None:
+                raise SudokuError('The sudoku puzzle is empty.')
+            return Puzzle(matrix, dim2order(dim))
 
     @staticmethod
     def resource2puzzle(name):
         """creates a puzzle from a named resource (the basename of the file in the data directory)."""
         if name is None:
             name = 'empty'
-        board_file = pkg.resource_filename('sudokusensei', f'data/{name}.sudoku')
+        board_file = resource_path(f'data/{name}.sudoku')
         if not os.path.exists(board_file):
             raise SudokuError(f'No such board: {board_file}')
         return Puzzle.path2puzzle(board_file)
 
 
     @staticmethod
-    def block(orow, ocol):
+    def block(orow, ocol, order=3):
         """returns a list of cells that make up the block the cell belongs to."""
-        return Regions.block(orow, ocol)
+        return Regions.block(orow, ocol, order)
 
     @staticmethod
-    def _block(orow, ocol):
+    def _block(orow, ocol, order=3):
         """returns a list of cells that make up the block the cell belongs to."""
-        if 0 <= orow <= 8 and 0 <= ocol <= 8:
-            row = 3 * (orow // 3)
-            col = 3 * (ocol // 3)
-            return [(r, c) for r in range(row, row + 3) for c in range(col, col + 3)]
+        dim = order * order
+        if 0 <= orow < dim and 0 <= ocol < dim:
+            row = order * (orow // order)
+            col = order * (ocol // order)
+            return [(r, c) for r in range(row, row + order) for c in range(col, col + order)]
         raise SudokuError(f'block error: {orow} {ocol}')
 
 
 
-    def __init__(self, matrix=None):
-        # the grid is the 9x9 matrix
-        self.grid = make_grid()
-        # the freedom obj mantains the freedom analysis
-        self.freedom = Freedom()
-        # the number of empty cells (informational carrot)
-        self.empty_cells = 81
-        # keep track of the cells that each digit resides in (for the sofa analysis)
-        self.value_map = make_value_map()
-
+    def __init__(self, matrix=None, order=3):
+        self.reset(order)
         if matrix is not None:
-            for i in range(9):
-                for j in range(9):
+            for i in range(self.dim):
+                for j in range(self.dim):
                     val = matrix[i][j]
                     if val is not None:
                         self.set_cell(i, j, val)
 
+    def reset(self, order):
+        """makes the puzzle an empty one of the given order (which may differ from its current one)."""
+        # the order of the puzzle, 3 for a regular sudoku
+        self.order = order
+        # the length of a row (or column, or block)
+        self.dim = order2dim(order)
+        # the number of cells
+        self.elements = self.dim * self.dim
+        # the grid is the dim x dim matrix
+        self.grid = make_grid(self.dim)
+        # the static peer tables
+        self.table = peer_table(order)
+        # the freedom obj mantains the freedom analysis
+        self.freedom = Freedom(order)
+        # the number of empty cells (informational carrot)
+        self.empty_cells = self.elements
+        # keep track of the cells that each digit resides in (for the sofa analysis)
+        self.value_map = make_value_map(self.dim)
+        # the contents of the cells, row major with 0 for empty, as a contiguous buffer the C library can use in place
+        self.cells = bytearray(self.elements)
+        # the indexes of the cells whose contents have changed since the last take_dirty (e.g. for the UI to redraw)
+        self.dirty = set(range(self.elements))
+
     def copy(self, puzzle):
         """copy the state of another puzzle."""
-        self.__init__(puzzle.grid)
+        if puzzle.order != self.order:
+            self.reset(puzzle.order)
+        self.load(puzzle.cells)
+
+    def buffer(self):
+        """returns a (writable) memoryview of the cells, row major with 0 for empty, e.g. for ctypes' from_buffer."""
+        return memoryview(self.cells)
+
+    def load(self, cells):
+        """sets the contents of every cell from a row major sequence of elements values (0 for empty), e.g. a C buffer.
+
+        This rebuilds the freedom analysis in one pass, rather than replaying a set_cell for each clue.
+        """
+        if len(cells) != self.elements:
+            raise SudokuError(f'load error: {len(cells)} values for {self.elements} cells')
+        if max(cells) > self.dim:
+            raise SudokuError(f'load error: {max(cells)} is out of range')
+        self.cells[:] = cells
+        self.grid = make_grid(self.dim)
+        self.value_map = make_value_map(self.dim)
+        self.empty_cells = self.elements
+        for index, val in enumerate(self.cells):
+            if val != 0:
+                row, col = self.table.cells[index]
+                self.grid[row][col] = val
+                self.value_map[val].add((row, col))
+                self.empty_cells -= 1
+        self.dirty.update(range(self.elements))
+        self.freedom.constrain(self.grid)
+
+    def take_dirty(self):
+        """returns the indexes of the cells whose contents have changed since the last call, and forgets them."""
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
 
 
     def agree(self, puzzle):
         """see if two puzzles agree on non-None cells."""
-        for row in range(9):
-            for col in range(9):
+        for row in range(self.dim):
+            for col in range(self.dim):
                 mine = self.get_cell(row, col)
                 theirs = puzzle.get_cell(row, col)
                 if mine is not None and theirs is not None:
@@ -372,14 +439,14 @@ class Puzzle:
 
     def sanity_check(self, debug):
         """a quick sanity check to make sure the puzzle is not obviously unsolvable."""
-        for row in range(9):
-            for col in range(9):
-                val = self.grid[row][col]
-                if val is not None:
-                    if not self.freedom.contains(row, col, val):
-                        if debug:
-                            print(f'Insane: [{row}, {col}]: {val}')
-                        return False
+        grid = self.grid
+        freedom = self.freedom.freedom
+        for cell in self.table.cells:
+            val = grid[cell[0]][cell[1]]
+            if val is not None and val in freedom[cell]:
+                if debug:
+                    print(f'Insane: [{cell[0]}, {cell[1]}]: {val}')
+                return False
         return True
 
     def sanity_check_sofa(self):
@@ -389,23 +456,25 @@ class Puzzle:
 
     def get_row(self, row):
         """get_row returns a copy of the given row."""
-        if 0 <= row <= 8:
+        if 0 <= row < self.dim:
             return self.grid[row].copy()
         raise SudokuError(f'get_row error: {row}')
 
 
     def clone(self):
         """clone creates a deep copy of the puzzle."""
-        matrix = [self.get_row(row) for row in range(9)]
-        return Puzzle(matrix)
+        matrix = [self.get_row(row) for row in range(self.dim)]
+        return Puzzle(matrix, self.order)
 
     def erase_cell(self, i, j):
         """erase_cell erases the contents of the cell in the puzzle."""
-        if 0 <= i <= 8 and 0 <= j <= 8:
+        if 0 <= i < self.dim and 0 <= j < self.dim:
             val = self.grid[i][j]
             if val is not None:
                 self.empty_cells += 1
                 self.grid[i][j] = None
+                self.cells[self.dim * i + j] = 0
+                self.dirty.add(self.dim * i + j)
                 self.value_map[val].remove((i, j))
                 self.freedom.constrain_erase_cell(self.grid, i, j, val)
             return None
@@ -413,7 +482,7 @@ class Puzzle:
 
     def set_cell(self, i, j, val):
         """set_cell set the value of the given cell to the provided value."""
-        if 0 <= i <= 8 and 0 <= j <= 8 and 1 <= val <= 9:
+        if 0 <= i < self.dim and 0 <= j < self.dim and 1 <= val <= self.dim:
             oval = self.grid[i][j]
             if oval != val:
                 if oval is None and val is not None:
@@ -421,6 +490,8 @@ class Puzzle:
                 if oval is not None:
                     self.value_map[oval].remove((i, j))
                 self.grid[i][j] = val
+                self.cells[self.dim * i + j] = val
+                self.dirty.add(self.dim * i + j)
                 self.value_map[val].add((i, j))
                 self.freedom.constrain_set_cell(self.grid, i, j, val, oval)
             return None
@@ -428,23 +499,23 @@ class Puzzle:
 
     def get_cell(self, i, j):
         """get_cell returns the contents of the given cell (which could be None)."""
-        if 0 <= i <= 8 and 0 <= j <= 8:
+        if 0 <= i < self.dim and 0 <= j < self.dim:
             return self.grid[i][j]
         raise SudokuError(f'get_cell error:{i} {j}')
 
     def dump_value_map(self):
         """print out the current state of the value map"""
-        for val in range(1, 10):
+        for val in range(1, self.dim + 1):
             print(f'{val}: {self.value_map[val]}')
 
     def to_string(self, pad='  ', blank='.', newline='\n'):
         """to_string produces a string reresentation of the puzzle."""
         def pp(i, j, blank='.'):
             val = self.get_cell(i, j)
-            return str(val) if val is not None else blank
+            return ALPHABET[val] if val is not None else blank
         rows = []
-        for row in range(9):
-            line = [pp(row, col, blank) for col in range(9)]
+        for row in range(self.dim):
+            line = [pp(row, col, blank) for col in range(self.dim)]
             rows.append(pad.join(line))
         return newline.join(rows)
 
@@ -462,133 +533,68 @@ class Puzzle:
         return self.freedom.least_free(self.grid)
 
 
-class Syntax:
-    """Syntax defines the terms and rules of the Sudoku game."""
-
-    def __init__(self):
-        self.constants = make_constants()
-        self.variables = make_variables()
-
-        # maps non-trivial rules to an informative string describing them
-        self.explanation = {}
-        # dividing the rules into trivial and non trivial is used in getting unsat cores (of non-trivial rules)
-        self.trivial_rules = self.make_trivial_rules()
-        self.duplicate_rules = self.make_duplicate_rules()
-        self.all_rules = self.trivial_rules.copy()
-        self.all_rules.extend(self.duplicate_rules)
-
-
-    def var(self, i, j):
-        """var returns the variable that represents the given cell."""
-        return self.variables[i][j]
-
-
-    def make_trivial_rules(self):
-        """make_trivial_rules creates the rules that force the variables to range over 1 through 9."""
-        # x is between 1 and 9
-        def between_1_and_9(x):
-            return Terms.yor([Terms.eq(x, self.constants[i+1]) for i in range(9)])
-        rules = []
-        # Every variable is between 1 and 9 inclusive
-        for i in range(9):
-            for j in range(9):
-                rules.append(between_1_and_9(self.var(i, j)))
-        return rules
-
-
-    def make_duplicate_rules(self):
-        """make_duplicate_rules create the list of rules asserting that each row, column and block cannot containn duplicates."""
-        rules = []
-        # All elements in a row must be distinct
-        for i in range(9):
-            rule = Terms.distinct([self.var(i, j) for j in range(9)])
-            self.explanation[rule] = f'Row {i + 1} cannot contain duplicates'
-            rules.append(rule)
-        # All elements in a column must be distinct
-        for i in range(9):
-            rule = Terms.distinct([self.var(j, i) for j in range(9)]) # pylint: disable=W1114
-            self.explanation[rule] = f'Column {i + 1} cannot contain duplicates'
-            rules.append(rule)
-        # All elements in each 3x3 square must be distinct
-        def block(row, column):
-            rname = {0: 'Top', 1: 'Middle', 2: 'Bottom'}
-            cname = {0: 'left', 1: 'center', 2: 'right'}
-            return f'{rname[row]}-{cname[column]}'
-        for row in range(3):
-            for column in range(3):
-                rule = Terms.distinct([self.var(i + 3 * row, j + 3 * column) for i in range(3) for j in range(3)])
-                self.explanation[rule] = f'{block(row,column)} block cannot contain duplicates'
-                rules.append(rule)
-        return rules
-
-    def cell_equality(self, i, j, val):
-        """cell_equality returns the yices term stating that the given cell equals the given value."""
-        return Terms.arith_eq_atom(self.var(i, j), self.constants[val])
-
-    def cell_inequality(self, i, j, val):
-        """cell_inequality returns the yices term stating that the given cell differs the given value."""
-        return Terms.arith_neq_atom(self.var(i, j), self.constants[val])
-
-    def diagram(self, puzzle):
-        """diagram returns the set of yices terms stating that cells in the puzzle contain the their non-None values, skippn cells with None in them."""
-        terms = []
-        for i in range(9):
-            for j in range(9):
-                val = puzzle.get_cell(i, j)
-                if val is not None:
-                    terms.append(self.cell_equality(i, j, val))
-        return terms
+class Cores:
+    """Cores area data structure for maintaining, filtering, and ranking unsat cores.
 
-    def explain(self, terms):
-        """explain returns a multiline string explaining the given terms (which should be elements of duplicate_rules."""
-        sb = StringBuilder()
-        count = 1
+    Each core is a subset of the rules (the duplicate_rules of a Syntax), so rather than keeping its list of terms we
+    keep it as a bit mask over the rules, in a column of masks alongside columns of the cells, values and core sizes.
+    That is a dozen or so bytes per core, rather than a tuple and a list of terms, and ranking the cores, or computing
+    the metric, only looks at the column of sizes. The terms of a core are rebuilt from its mask when it is asked for.
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        self.maximum = len(rules)
+        # the bit of each rule in a mask
+        self.bits = {rule: bit for bit, rule in enumerate(rules)}
+        self.rows = array('B')
+        self.cols = array('B')
+        self.vals = array('B')
+        self.sizes = array('B')
+        # the masks fit in an unsigned 64 bit column unless there are more rules than that (i.e. order 5 and beyond).
+        self.masks = array('Q') if self.maximum <= 64 else []
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def mask(self, terms):
+        """returns the mask of the given rules."""
+        mask = 0
         for term in terms:
-            sb.append(f'Rule {count}: ').append(self.explanation.get(term)).append('\n')
-            count += 1
-        return str(sb)
+            mask |= 1 << self.bits[term]
+        return mask
 
-
-
-class Cores:
-    """Cores area data structure for maintaining, filtering, and ranking unsat cores."""
-    def __init__(self, card):
-        self.core_map = {}
-        self.maximum = card
+    def terms(self, mask):
+        """returns the rules in the mask, in the order of self.rules (so it can be handed to Syntax.explain)."""
+        return [rule for bit, rule in enumerate(self.rules) if mask >> bit & 1]
 
     def add(self, i, j, val, core):
         """adds the fact that the unsat_core of [i,j] != val is core."""
-        key = len(core)
-        entry = []
-        if key not in self.core_map:
-            self.core_map[key] = entry
-        else:
-            entry = self.core_map[key]
-        entry.append(tuple([i, j, val, core]))
+        self.rows.append(i)
+        self.cols.append(j)
+        self.vals.append(val)
+        self.sizes.append(len(core))
+        self.masks.append(self.mask(core))
+
+    def core(self, index):
+        """returns the index-th core (in the order they were added) as an (i, j, val, terms) tuple."""
+        return (self.rows[index], self.cols[index], self.vals[index], self.terms(self.masks[index]))
 
     def least(self, count):
-        """returns a list of the count smallest cores."""
-        retval = []
-        counter = 0
-        for i in range(self.maximum + 1):
-            if i in self.core_map:
-                vec = self.core_map[i]
-                for v in vec: # pylint: disable=C0103
-                    retval.append(v)
-                    #print(f'OK: {v[0]} {v[1]} {v[2]}   {len(v[3])} / {self.maximum}')
-                    counter += 1
-                    if counter >= count:
-                        return retval
-        return retval
+        """returns a list of the count smallest cores (the earliest added first among cores of the same size)."""
+        # nsmallest is stable, i.e. sorted(..., key=...)[:count]
+        smallest = heapq.nsmallest(count, range(len(self.sizes)), key=self.sizes.__getitem__)
+        return [self.core(index) for index in smallest]
 
     def metric(self, debug):
         """ returns my measure of difficulty (should be a number between 0 and roughly 100)."""
-        summation = 0
-        for i in self.core_map:
-            # ugly to have 27 (i.e. |distinct_rules|) hard coded in all these places.
-            count = len(self.core_map[i])
-            cellv = ((2 * i) / 27) * count
-            summation += cellv
-            if debug:
-                print(f'{i} : {cellv} {count} {summation}')
+        # each core contributes 2 * size / maximum, the maximum being |duplicate_rules|, i.e. 27 for a regular sudoku.
+        summation = 2 * sum(self.sizes) / self.maximum if self.maximum else 0
+        if debug:
+            counts = array('I', bytes(4 * (self.maximum + 1)))
+            for size in self.sizes:
+                counts[size] += 1
+            for size, count in enumerate(counts):
+                if count:
+                    print(f'{size} : {((2 * size) / self.maximum) * count} {count}')
+            print(f'metric: {summation}')
         return int(summation)
@@ -1,4 +1,4 @@
-"""For handling what's going on under the hood."""
+"""The UI for handling what's going on under the hood."""
 import tkinter as tk
 import os.path
 
@@ -6,33 +6,9 @@ from tkinter import filedialog
 
 from pathlib import Path
 
-import pkg_resources as pkg
-
-from .DB import db_debug
-
-class Options:    # pylint: disable=R0902
-    """For retaining the user's chosen options."""
-
-    def __init__(self):
-        # turns on all sorts of whingeing and whining
-        self.debug = False
-        # allows one to edit the "original" puzzle squares
-        self.edit = False
-        # uses the C versions of the slow routines.
-        self.use_c = True
-        # use set oriented freedom in the solving phase, which can eliminate
-        # a lot of backtracking (and hence the difficulty metric).
-        self.sofa = False
-        # the desired metric, note sofa vs no sofa metrics are very different.
-        # sofa numbers are genrally a lot smaller.
-        self.difficulty = 400
-        # game generation iterations.
-        self.iterations = 200
-        # we compute the cores for all empty cells, then cream off the smallest "cutoff"
-        # ones, and reduce them further.
-        self.unsat_core_cutoff = 5
-        # aleph_nought
-        self.aleph_nought = 64
+from .Options import Options # pylint: disable=W0611
+from .SudokuLib import resource_path
+from .DB import db_debug, native_available
 
 
 PADX = 20
@@ -44,7 +20,7 @@ class SudokuOptions(tk.Toplevel):
     def __init__(self, game_ui, title, options):
         tk.Toplevel.__init__(self)
         width = 600
-        height = 600
+        height = 720
         self.options = options
         self.title(title)
         self.game_ui = game_ui
@@ -67,6 +43,9 @@ class SudokuOptions(tk.Toplevel):
         self._create_iterations_controls(5)
         self._create_cutoff_controls(6)
         self._create_aleph_nought_controls(7)
+        self._create_encoding_controls(8)
+        self._create_metric_controls(9)
+        self._create_hint_controls(10)
 
         self._create_buttons()
 
@@ -81,7 +60,7 @@ class SudokuOptions(tk.Toplevel):
 
     def _get_resource_directory(self, saving=False):
         if not saving or self.options.debug:
-            empty_file = pkg.resource_filename('sudokusensei', 'data/empty.sudoku')
+            empty_file = resource_path('data/empty.sudoku')
             if os.path.exists(empty_file):
                 return os.path.dirname(empty_file)
         home = str(Path.home())
@@ -111,7 +90,8 @@ class SudokuOptions(tk.Toplevel):
 
         def update_debug():
             self.options.debug = debug.get()
-            db_debug(self.options.debug)
+            if native_available(self.options.order):
+                db_debug(self.options.debug, self.options.order)
 
         debugging = tk.Label(self.checkboxes, text="Debugging: ")
         debugging.grid(row=row, column=0, sticky='w', padx=PADX, pady=PADY)
@@ -149,13 +129,68 @@ class SudokuOptions(tk.Toplevel):
         language = tk.Label(self.checkboxes, text="Search Language: ")
         language.grid(row=row, column=0, sticky='w', padx=PADX, pady=PADY)
 
-        use_c = tk.Radiobutton(self.checkboxes, text='C', variable=cvar, value=True, command=update_language)
+        native = native_available(self.options.order)
+        use_c = tk.Radiobutton(self.checkboxes, text='C' if native else 'C (unavailable)', variable=cvar, value=True, command=update_language,
+                               state=tk.NORMAL if native else tk.DISABLED)
         use_c.grid(row=row, column=1, sticky='w', padx=PADX, pady=PADY)
 
         use_python = tk.Radiobutton(self.checkboxes, text='Python', variable=cvar, value=False, command=update_language)
         use_python.grid(row=row, column=2, sticky='w', padx=PADX, pady=PADY)
 
 
+    def _create_encoding_controls(self, row):
+        encoding = tk.StringVar()
+        encoding.set(self.options.encoding)
+
+        def update_encoding():
+            self.options.encoding = encoding.get()
+
+        rules = tk.Label(self.checkboxes, text="Rule Encoding: ")
+        rules.grid(row=row, column=0, sticky='w', padx=PADX, pady=PADY)
+
+        use_integer = tk.Radiobutton(self.checkboxes, text='Integer', variable=encoding, value='integer', command=update_encoding)
+        use_integer.grid(row=row, column=1, sticky='w', padx=PADX, pady=PADY)
+
+        use_boolean = tk.Radiobutton(self.checkboxes, text='Boolean', variable=encoding, value='boolean', command=update_encoding)
+        use_boolean.grid(row=row, column=2, sticky='w', padx=PADX, pady=PADY)
+
+
+    def _create_metric_controls(self, row):
+        engine = tk.StringVar()
+        engine.set(self.options.metric_engine)
+
+        def update_engine():
+            self.options.metric_engine = engine.get()
+
+        metric = tk.Label(self.checkboxes, text="Core Metric: ")
+        metric.grid(row=row, column=0, sticky='w', padx=PADX, pady=PADY)
+
+        use_yices = tk.Radiobutton(self.checkboxes, text='Unsat Cores', variable=engine, value='yices', command=update_engine)
+        use_yices.grid(row=row, column=1, sticky='w', padx=PADX, pady=PADY)
+
+        native = native_available(self.options.order)
+        use_propagation = tk.Radiobutton(self.checkboxes, text='Propagation' if native else 'Propagation (unavailable)', variable=engine, value='propagation',
+                                         command=update_engine, state=tk.NORMAL if native else tk.DISABLED)
+        use_propagation.grid(row=row, column=2, sticky='w', padx=PADX, pady=PADY)
+
+
+    def _create_hint_controls(self, row):
+        speculative = tk.BooleanVar()
+        speculative.set(self.options.speculative_hints)
+
+        def update_speculative():
+            self.options.speculative_hints = speculative.get()
+
+        hints = tk.Label(self.checkboxes, text="Hints: ")
+        hints.grid(row=row, column=0, sticky='w', padx=PADX, pady=PADY)
+
+        use_speculative = tk.Radiobutton(self.checkboxes, text='Speculative', variable=speculative, value=True, command=update_speculative)
+        use_speculative.grid(row=row, column=1, sticky='w', padx=PADX, pady=PADY)
+
+        on_demand = tk.Radiobutton(self.checkboxes, text='On Demand', variable=speculative, value=False, command=update_speculative)
+        on_demand.grid(row=row, column=2, sticky='w', padx=PADX, pady=PADY)
+
+
     def _create_sofa_controls(self, row):
         sofa = tk.BooleanVar()
         sofa.set(self.options.sofa)
@@ -1,10 +1,11 @@
 """SudokuSolver is the interface with the Yices2 SMT solver."""
 
-from yices import Census, Context, Model, Terms, Status, Yices
+from yices import Census, Context, Model, Terms, Status
 
-from .SudokuLib import Puzzle, Syntax, Cores
+from .SudokuLib import Puzzle, Cores
+from .Syntax import Registry
 
-from .Profiling import profile
+from .Profiling import profile, span, note
 
 class SudokuSolver:
 
@@ -17,8 +18,11 @@ class SudokuSolver:
     """
     def __init__(self, game):
         self.game = game
-        self.syntax = Syntax()
-        # the matrix of uninterpreted terms
+        # the terms and rules are shared with every other solver, see Registry
+        self.syntax = Registry.syntax(game.options.encoding, game.start_puzzle.order)
+        # the length of a row, column or block
+        self.dim = self.syntax.dim
+        # the matrix of uninterpreted terms (in the boolean encoding each cell is a map from values to terms)
         self.variables = self.syntax.variables
         # the numerals as yices constants
         self.numerals = self.syntax.constants
@@ -29,11 +33,10 @@ class SudokuSolver:
         # the union of the trivial rules and the duplicate rules
         self.all_rules = self.syntax.all_rules
 
-    def dispose(self): # pylint: disable=R0201
-        """dispose cleans up the solver's resources."""
+    def dispose(self):
+        """dispose cleans up the solver's resources (the shared terms live on until Registry.release)."""
         if self.game.options.debug:
             print(Census.dump())
-        Yices.exit(True)
 
     def var(self, i, j):
         """var returns the variable at the specified cell."""
@@ -59,16 +62,19 @@ class SudokuSolver:
         """the yices term asserting that cell [i, j] differs from val."""
         return self.syntax.cell_inequality(i, j, val)
 
+    def _check_indices(self, i, j, val):
+        """complains if [i, j] = val makes no sense."""
+        if not (0 <= i < self.dim and 0 <= j < self.dim and 1 <= val <= self.dim):
+            raise Exception(f'Index error: {i} {j} {val}')
+
     def assert_value(self, ctx, i, j, val):
         """asserts that cell [i, j] contains val."""
-        if not (0 <= i <= 8 and 0 <= j <= 8 and 1 <= val <= 9):
-            raise Exception(f'Index error: {i} {j} {val}')
+        self._check_indices(i, j, val)
         ctx.assert_formula(self._equality(i, j, val))
 
     def assert_not_value(self, ctx, i, j, val):
         """asserts that cell [i, j] is not val."""
-        if not (0 <= i <= 8 and 0 <= j <= 8 and 1 <= val <= 9):
-            raise Exception(f'Index error: {i} {j} {val}')
+        self._check_indices(i, j, val)
         ctx.assert_formula(self._inequality(i, j, val))
 
     def assert_puzzle(self, ctx, puzzle):
@@ -80,48 +86,72 @@ class SudokuSolver:
         """Adds the diagram, with the single given exception, of the current state of the puzzle."""
         assert ans == puzzle.get_cell(row, col)
         terms = []
-        for i in range(9):
-            for j in range(9):
-                if i != row and j != col:
+        for i in range(self.dim):
+            for j in range(self.dim):
+                if (i, j) != (row, col):
                     val = puzzle.get_cell(i, j)
                     if val is not None:
                         terms.append(self._equality(i, j, val))
         ctx.assert_formulas(terms)
 
-    def solve(self, puzzle=None):
-        """Attempts to solve the puzzle, returning either None if there is no solution, or a board with the correct MISSING entries."""
+    def solve(self, puzzle=None, complete=False):
+        """Attempts to solve the puzzle, returning either None if there is no solution, or a board with the correct MISSING entries.
+
+        The missing entries are those of the game's current puzzle, unless complete is True, in which case the board is the entire solution.
+        """
         if puzzle is None:
             puzzle = self.game.puzzle
-        solution = None
-        context = Context()
-        self.assert_puzzle(context, puzzle)
-        self.assert_rules(context)
-        smt_stat = context.check_context(None)
+        # the game knows the solution of its starting puzzle, which is the solution of any consistent extension of it
+        solution = self.game.cached_solution(puzzle, complete)
+        if solution is not None:
+            note(cached=1)
+            return solution
+        with span('context'):
+            context = Context()
+            self.assert_puzzle(context, puzzle)
+            self.assert_rules(context)
+        with span('check'):
+            smt_stat = context.check_context(None)
         if smt_stat != Status.SAT:
             print(f'No solution: smt_stat = {smt_stat}')
         else:
             #get the model
             model = Model.from_context(context, 1)
             #return the model as a board with ONLY the newly found values inserted.
-            solution = self.puzzle_from_model(model, True)
+            solution = self.puzzle_from_model(model, not complete)
             model.dispose()
         context.dispose()
         return solution
 
+    def is_unique_solution(self, puzzle, solution):
+        """is_unique_solution returns True if the (complete) solution satisfies the rules and the puzzle, and is the puzzle's only solution."""
+        context = Context()
+        self.assert_puzzle(context, puzzle)
+        self.assert_rules(context)
+        diagram = Terms.yand(self.syntax.diagram(solution))
+        context.push()
+        context.assert_formula(diagram)
+        valid = context.check_context(None) == Status.SAT
+        context.pop()
+        context.assert_formula(Terms.ynot(diagram))
+        unique = context.check_context(None) == Status.UNSAT
+        context.dispose()
+        return valid and unique
+
     def puzzle_from_model(self, model, only_new=False):
         """puzzle_from_model builds a puzzle from the given model.
 
         If the only_new argument is True, then only newly solved cells are included in returned the puzzle."""
         if model is None:
             return None
-        puzzle = Puzzle()
-        for i in range(9):
-            for j in range(9):
+        puzzle = Puzzle(order=self.syntax.order)
+        for i in range(self.dim):
+            for j in range(self.dim):
                 if only_new:
                     if self.game.puzzle.get_cell(i, j) is None:
-                        puzzle.set_cell(i, j, model.get_value(self.var(i, j)))
+                        puzzle.set_cell(i, j, self.syntax.value(model, i, j))
                 else:
-                    puzzle.set_cell(i, j, model.get_value(self.var(i, j)))
+                    puzzle.set_cell(i, j, self.syntax.value(model, i, j))
         return puzzle
 
     #we could contrast the following with the  yices_assert_blocking_clause
@@ -130,19 +160,18 @@ class SudokuSolver:
         """count_model returns the number of distinct solutions/models to the current problem."""
         def model2term(model):
             termlist = []
-            for i in range(9):
-                for j in range(9):
+            for i in range(self.dim):
+                for j in range(self.dim):
                     if self.game.puzzle.get_cell(i, j) is None:
-                        val = model.get_value(self.variables[i][j])
-                        var = self.variables[i][j]
-                        value = self.numerals[val]
-                        termlist.append(Terms.arith_eq_atom(var, value))
+                        val = self.syntax.value(model, i, j)
+                        termlist.append(self._equality(i, j, val))
             return Terms.yand(termlist)
         result = 0
-        context = Context()
-        self.assert_puzzle(context, self.game.puzzle)
-        self.assert_rules(context)
-        while  context.check_context(None) == Status.SAT:
+        with span('context'):
+            context = Context()
+            self.assert_puzzle(context, self.game.puzzle)
+            self.assert_rules(context)
+        while  self._check(context) == Status.SAT:
             model = Model.from_context(context, 1)
             diagram = model2term(model)
             if debug:
@@ -155,22 +184,32 @@ class SudokuSolver:
             if result >= self.game.options.aleph_nought:
                 break
         context.dispose()
+        note(models=result)
         return result
 
+    @staticmethod
+    def _check(context):
+        """checks the context, as a stage of the current trace."""
+        with span('check'):
+            return context.check_context(None)
+
     @profile
     def core_metric(self):
         """computes my notion of difficulty (should be a number between 0 and roughly 100)."""
         # this could be improved by doing the filtering in the core computation
         cutoff = self.game.puzzle.empty_cells
-        solution = self.solve()
+        with span('solve'):
+            solution = self.solve()
         if solution is None:
             return -1
-        cores = self.compute_cores(solution)
+        with span('cores'):
+            cores = self.compute_cores(solution)
         smallest = cores.least(cutoff)
-        filtered = Cores(len(self.duplicate_rules))
-        for core in smallest:
-            ncore = self.filter_core(core)
-            filtered.add(*ncore)
+        filtered = Cores(self.duplicate_rules)
+        with span('minimize'):
+            for core in smallest:
+                ncore = self.filter_core(core)
+                filtered.add(*ncore)
         return filtered.metric(self.game.options.debug)
 
     #this doesn't speed things up!?
@@ -186,25 +225,27 @@ class SudokuSolver:
 
     def filter_cores(self, solution, cutoff):
         """computes the unsat cores, and then filters the 'cutoff' smallest ones."""
-        cores = self.compute_cores(solution)
+        with span('cores'):
+            cores = self.compute_cores(solution)
         if cores is None:
             return None
         #print('\nCores:\n')
         smallest = cores.least(cutoff)
-        filtered = Cores(len(self.duplicate_rules))
-        for core in smallest:
-            ncore = self.filter_core(core)
-            filtered.add(*ncore)
+        filtered = Cores(self.duplicate_rules)
+        with span('minimize'):
+            for core in smallest:
+                ncore = self.filter_core(core)
+                filtered.add(*ncore)
         #print('\nFiltered Cores:\n')
         smallest = filtered.least(self.game.options.unsat_core_cutoff)
         return smallest
 
     def compute_cores(self, solution):
         """computes the unsat cores of all the unfilled cells in the puzzle."""
-        cores = Cores(len(self.duplicate_rules))
+        cores = Cores(self.duplicate_rules)
         if solution is not None:
-            for i in range(9):
-                for j in range(9):
+            for i in range(self.dim):
+                for j in range(self.dim):
                     slot = self.game.puzzle.get_cell(i, j)
                     if slot is None:
                         ans = solution.get_cell(i, j)
@@ -216,10 +257,10 @@ class SudokuSolver:
 
     def _compute_minimal_cores(self, solution):
         """computes the MINIMAL unsat cores of all the unfilled cells in the puzzle."""
-        cores = Cores(len(self.duplicate_rules))
+        cores = Cores(self.duplicate_rules)
         if solution is not None:
-            for i in range(9):
-                for j in range(9):
+            for i in range(self.dim):
+                for j in range(self.dim):
                     slot = self.game.puzzle.get_cell(i, j)
                     if slot is None:
                         ans = solution.get_cell(i, j)
@@ -231,13 +272,14 @@ class SudokuSolver:
 
     def compute_core(self, i, j, val):
         """We compute the unsat core of the duplicate_rules when asserting self.var(i, j) != val w.r.t the puzzle (val is assumed to be the unique solution)."""
-        if not (0 <= i <= 8 and 0 <= j <= 8 and 1 <= val <= 9):
-            raise Exception(f'Index error: {i} {j} {val}')
-        context = Context()
-        self.assert_puzzle(context, self.game.puzzle)
-        self.assert_not_value(context, i, j, val)
-        self.assert_trivial_rules(context)
-        smt_stat = context.check_context_with_assumptions(None, self.duplicate_rules)
+        self._check_indices(i, j, val)
+        with span('context'):
+            context = Context()
+            self.assert_puzzle(context, self.game.puzzle)
+            self.assert_not_value(context, i, j, val)
+            self.assert_trivial_rules(context)
+        with span('check'):
+            smt_stat = context.check_context_with_assumptions(None, self.duplicate_rules)
         # a valid puzzle should have a unique solution, so this should not happen, if it does we bail
         if smt_stat != Status.UNSAT:
             if self.game.options.debug:
@@ -251,14 +293,14 @@ class SudokuSolver:
             return None
         core = context.get_unsat_core()
         context.dispose()
+        note(size=len(core))
         if self.game.options.debug:
             print(f'Unsat Core: {i} {j} {val}   {len(core)} / {len(self.duplicate_rules)}')
         return (i, j, val, core)
 
     def _compute_minimal_core(self, i, j, val):
         """We compute the MINIMAL unsat core of the duplicate_rules when asserting self.var(i, j) != val w.r.t the puzzle (val is assumed to be the unique solution)."""
-        if not (0 <= i <= 8 and 0 <= j <= 8 and 1 <= val <= 9):
-            raise Exception(f'Index error: {i} {j} {val}')
+        self._check_indices(i, j, val)
         context = Context()
         self.assert_puzzle(context, self.game.puzzle)
         self.assert_not_value(context, i, j, val)
@@ -290,37 +332,57 @@ class SudokuSolver:
     def filter_core(self, core):
         """given a core, removes every unnecessary member until it has a minimal core."""
         i, j, val, terms = core
-        context = Context()
-        self.assert_puzzle(context, self.game.puzzle)
-        self.assert_not_value(context, i, j, val)
-        self.assert_trivial_rules(context)
+        with span('context'):
+            context = Context()
+            self.assert_puzzle(context, self.game.puzzle)
+            self.assert_not_value(context, i, j, val)
+            self.assert_trivial_rules(context)
         filtered = terms.copy()
-        for term in terms:
-            filtered.remove(term)
-            smt_stat = context.check_context_with_assumptions(None, filtered)
-            if smt_stat != Status.UNSAT:
-                filtered.append(term)
+        with span('check'):
+            for term in terms:
+                filtered.remove(term)
+                smt_stat = context.check_context_with_assumptions(None, filtered)
+                if smt_stat != Status.UNSAT:
+                    filtered.append(term)
         context.dispose()
+        note(checks=len(terms), size=len(filtered))
         if self.game.options.debug:
             print(f'Filtered unsat core: {i} {j} {val}   {len(filtered)} / {len(self.duplicate_rules)}')
         return (i, j, val, filtered)
 
-    def erasable(self, ctx, i, j, val):
+    def erasable(self, ctx, i, j, val, puzzle=None):
         """erasable returns True if puzzle (with [row, col] = val omitted) implies that [row, col] = val, it returns False otherwise.
 
-        It is assumed that puzzle.get_cell(i,j) == val
+        It is assumed that puzzle.get_cell(i,j) == val, the puzzle defaults to the game's.
         The context has already been informed of the rules.
         """
+        if puzzle is None:
+            puzzle = self.game.puzzle
         ctx.push()
-        self.assert_puzzle_except(ctx, self.game.puzzle, i, j, val)
+        self.assert_puzzle_except(ctx, puzzle, i, j, val)
         self.assert_not_value(ctx, i, j, val)
         smt_stat = ctx.check_context(None)
         ctx.pop()
         return smt_stat == Status.UNSAT
 
+    def is_minimal(self, puzzle):
+        """is_minimal returns True if none of the clues of the (uniquely solvable) puzzle is erasable, i.e. if the puzzle is minimal.
+
+        This is the (slow) SMT verification of the C minimizer, see SudokuGenerator.minimize.
+        """
+        context = Context()
+        self.assert_rules(context)
+        clues = [(i, j, puzzle.get_cell(i, j)) for i in range(self.dim) for j in range(self.dim) if puzzle.get_cell(i, j) is not None]
+        erasable = next((clue for clue in clues if self.erasable(context, *clue, puzzle)), None)
+        context.dispose()
+        if erasable is not None and self.game.options.debug:
+            print(f'Erasable clue: [{erasable[0]}, {erasable[1]}] = {erasable[2]}')
+        return erasable is None
+
     def get_hint(self):
         """get_hint returns the easiest cell to solve, using unsat_cores."""
-        solution = self.solve()
+        with span('solve'):
+            solution = self.solve()
         if solution is None:
             return (None, "There is no solution")
         cores = self.filter_cores(solution, self.game.options.unsat_core_cutoff)
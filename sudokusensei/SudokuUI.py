@@ -11,6 +11,8 @@
 # All changes are recorded in the git commits.
 #
 
+import time
+
 import tkinter as tk
 
 from tkinter import messagebox
@@ -44,6 +46,15 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
         self.freedom = None
         self.notes = make_cell_map()
         self.options = game.options
+        # the canvas items of each cell, what they currently show, and the puzzle they show it for
+        self.cell_items = {}
+        self.cell_views = {}
+        self.shown_puzzle = None
+        # the cells (shown in red) that contain the same value as one of their peers
+        self.conflicts = set()
+        # the time taken by, and the number of cells reconfigured by, the most recent refresh
+        self.frame_time = 0.0
+        self.frame_cells = 0
         self.__init_ui(parent)
 
 
@@ -78,7 +89,8 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
         self._create_controls(self.controls)
 
         self.__draw_grid()
-        self.__draw_puzzle()
+        self.__init_cells()
+        self.__refresh()
 
         self.canvas.bind('<Button-1>', self.__cell_clicked)
         self.canvas.bind('<Key>', self.__key_pressed)
@@ -89,8 +101,7 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
         if self.options.debug:
             print(f'Loading: {path}')
         self.game.load(path)
-        self.__draw_grid()
-        self.__draw_puzzle()
+        self.__refresh()
         self.message_text.set('Loaded!')
 
     def save_game(self, path):
@@ -168,7 +179,7 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
             self.__clear_messages()
         else:
             pass
-        self.__draw_puzzle()
+        self.__refresh()
 
 
     def __show_options(self):
@@ -193,51 +204,92 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
             self.canvas.create_line(x0, y0, x1, y1, fill=color)
 
 
-    def __draw_notes(self, row, col):
+    def __init_cells(self):
+        """creates the (blank) canvas items of every cell once, thereafter __refresh only reconfigures them."""
+        for row in range(9):
+            for col in range(9):
+                x = MARGIN + col * SIDE
+                y = MARGIN + row * SIDE
+                number = self.canvas.create_text(x + SIDE / 2, y + SIDE / 2, text='', tags='numbers', font=SudokuUI.font)
+                notes = self.canvas.create_text(x + 2 * delta, y + 2 * delta, text='', tags='notes', fill='grey', font=SudokuUI.note_font_a)
+                free = [self.canvas.create_text(x + (1 + (val - 1) % 3) * delta, y + (1 + (val - 1) // 3) * delta, text='', tags='free', fill='red', font=SudokuUI.free_font)
+                        for val in range(1, 10)]
+                self.cell_items[(row, col)] = (number, notes, free)
+                self.cell_views[(row, col)] = None
+
+    def __notes_view(self, row, col):
         contents = self.notes[(row, col)]
         count = len(contents)
         if count == 0:
-            return
-        x = MARGIN + col * SIDE
-        y = MARGIN + row * SIDE
+            return None
         font = SudokuUI.note_font_a if count < 4 else SudokuUI.note_font_b if count < 7 else SudokuUI.note_font_c
-        elements = list(contents)
-        elements.sort()
-        text = ''.join([str(e) for e in elements])
-        self.canvas.create_text(x + 2 * delta, y + 2 * delta, text=text, tags='notes', fill='grey', font=font)
-
-    def __draw_free(self, row, col, free):
-        x = MARGIN + col * SIDE
-        y = MARGIN + row * SIDE
-        for val in free:
-            dx, dy = (1 + (val - 1)%3) * delta, (1 + (val - 1)//3) * delta
-            self.canvas.create_text(x + dx, y + dy, text=str(val), tags='free', fill='red', font=SudokuUI.free_font)
-
-
-    def __draw_puzzle(self):
-        self.canvas.delete('numbers')
-        self.canvas.delete('free')
-        self.canvas.delete('notes')
-        for row in range(9):
-            for col in range(9):
-                answer = self.game.puzzle.get_cell(row, col)
-                if answer is not None:
-                    x = MARGIN + col * SIDE + SIDE / 2
-                    y = MARGIN + row * SIDE + SIDE / 2
-                    original = self.game.start_puzzle.get_cell(row, col)
-                    color = 'black' if answer == original else 'sea green'
-                    self.canvas.create_text(x, y, text=answer, tags='numbers', fill=color, font=SudokuUI.font)
-                elif self.game.solution is not None:
-                    solution = self.game.solution.get_cell(row, col)
-                    if solution is not None:
-                        x = MARGIN + col * SIDE + SIDE / 2
-                        y = MARGIN + row * SIDE + SIDE / 2
-                        self.canvas.create_text(x, y, text=solution, tags='numbers', fill='purple', font=SudokuUI.font)
-                else:
-                    if self.freedom is not None:
-                        self.__draw_free(row, col, self.freedom.freedom_set(row, col))
-                    else:
-                        self.__draw_notes(row, col)
+        return ('notes', ''.join(str(e) for e in sorted(contents)), font)
+
+    def __cell_view(self, row, col):
+        """returns what the cell should show: ('number', val, color), ('free', values), ('notes', text, font) or None (nothing)."""
+        answer = self.game.puzzle.get_cell(row, col)
+        if answer is not None:
+            original = self.game.start_puzzle.get_cell(row, col)
+            if answer == original:
+                return ('number', answer, 'black')
+            return ('number', answer, 'red' if (row, col) in self.conflicts else 'sea green')
+        if self.game.solution is not None:
+            solution = self.game.solution.get_cell(row, col)
+            return ('number', solution, 'purple') if solution is not None else None
+        if self.freedom is not None:
+            return ('free', frozenset(self.freedom.freedom_set(row, col)))
+        return self.__notes_view(row, col)
+
+    def __configure_cell(self, cell, view):
+        """reconfigures just those canvas items of the cell that differ between what it shows and the (different) view."""
+        number, notes, free = self.cell_items[cell]
+        old = self.cell_views[cell]
+        old_kind = old[0] if old is not None else None
+        kind = view[0] if view is not None else None
+        if kind == 'number':
+            self.canvas.itemconfigure(number, text=view[1], fill=view[2])
+        elif old_kind == 'number':
+            self.canvas.itemconfigure(number, text='')
+        if kind == 'notes':
+            self.canvas.itemconfigure(notes, text=view[1], font=view[2])
+        elif old_kind == 'notes':
+            self.canvas.itemconfigure(notes, text='')
+        shown = old[1] if old_kind == 'free' else frozenset()
+        wanted = view[1] if kind == 'free' else frozenset()
+        for val in shown ^ wanted:
+            self.canvas.itemconfigure(free[val - 1], text=str(val) if val in wanted else '')
+        self.cell_views[cell] = view
+
+    def __refresh(self, cells=None):
+        """brings the canvas up to date with the game, looking at the given cells (all of them if None) and those the puzzle has changed.
+
+        Only the cells whose view has changed are reconfigured, so a keystroke costs a handful of canvas operations.
+        """
+        start = time.perf_counter()
+        puzzle = self.game.puzzle
+        dirty = puzzle.take_dirty()
+        conflicts = self.game.conflicts()
+        if cells is None or puzzle is not self.shown_puzzle:
+            cells = self.cell_items.keys()
+            self.shown_puzzle = puzzle
+        else:
+            cells = set(cells) | (conflicts ^ self.conflicts)
+            for index in dirty:
+                cells.add(puzzle.table.cells[index])
+                # a change to a cell changes the freedom of its peers
+                if self.freedom is not None:
+                    cells.update(puzzle.table.peer_cells[index])
+        self.conflicts = conflicts
+        changed = 0
+        for cell in cells:
+            view = self.__cell_view(*cell)
+            if view != self.cell_views[cell]:
+                self.__configure_cell(cell, view)
+                changed += 1
+        self.frame_time = time.perf_counter() - start
+        self.frame_cells = changed
+        if self.options.debug:
+            print(f'refresh: {changed} cells reconfigured in {1e3 * self.frame_time:.3f} milliseconds')
 
     def __draw_cursor(self):
         self.canvas.delete('cursor')
@@ -293,7 +345,7 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
 
     def __handle_input(self, val):
         if val == 0:
-            self.game.puzzle.erase_cell(self.row, self.col)
+            self.game.erase_cell(self.row, self.col)
             return
         notes = self.notes[(self.row, self.col)]
         if len(notes) != 0:
@@ -302,38 +354,42 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
                 if len(notes) == 1:
                     last = list(notes)[0]
                     notes.remove(last)
-                    self.game.puzzle.set_cell(self.row, self.col, last)
+                    self.game.set_cell(self.row, self.col, last)
             else:
                 notes.add(val)
         else:
             oval = self.game.puzzle.get_cell(self.row, self.col)
             if oval is None:
-                self.game.puzzle.set_cell(self.row, self.col, val)
+                self.game.set_cell(self.row, self.col, val)
                 return
             if oval != val:
                 notes.add(oval)
                 notes.add(val)
-                self.game.puzzle.erase_cell(self.row, self.col)
+                self.game.erase_cell(self.row, self.col)
 
 
     def __key_pressed(self, event):
+        self.press(event.keysym, event.char)
+
+    def press(self, keysym, char):
+        """handles a key press in the selected cell, redrawing just the cells that change."""
         if self.game.game_over:
             return
         if self.row < 0 or self.col < 0:
             return
-        if event.keysym == "BackSpace":
+        if keysym == "BackSpace":
             notes = self.notes[(self.row, self.col)]
             if len(notes) == 0:
-                self.game.puzzle.erase_cell(self.row, self.col)
+                self.game.erase_cell(self.row, self.col)
             else:
                 notes.clear()
-        elif event.char in '1234567890' and len(event.char) == 1:  #iam: ('' in '123') is True
-            self.__handle_input(int(event.char))
+        elif char in '1234567890' and len(char) == 1:  #iam: ('' in '123') is True
+            self.__handle_input(int(char))
         else:
             return
         #iam: now that we can make notes this is not what we want...
         #self.col, self.row = -1, -1
-        self.__draw_puzzle()
+        self.__refresh([(self.row, self.col)])
         self.__draw_cursor()
         if self.game.check_win():
             self.__draw_victory()
@@ -345,9 +401,13 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
 
     def __new_puzzle(self):
         self.__clear_messages()
-        difficulty, target, empty_cells = self.game.new()
-        self.message_text.set(f'Difficulty: {difficulty} Target: {target} Empty: {empty_cells}')
-        self.__draw_puzzle()
+        difficulty, target, empty_cells, metric = self.game.new()
+        message = f'Difficulty: {difficulty} Target: {target} Empty: {empty_cells}'
+        if metric is not None:
+            low, high = self.game.options.metric_range
+            message += f' Metric: {metric}' if low <= metric <= high else f' Metric: {metric} (not in [{low}, {high}])'
+        self.message_text.set(message)
+        self.__refresh()
 
     def __clear_puzzle(self):
         self.game.start()
@@ -360,7 +420,7 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
     def __solve_puzzle(self):
         if not self.game.solve():
             self.__draw_no_solution()
-        self.__draw_puzzle()
+        self.__refresh()
 
     def __show_solution_count(self):
         count = self.game.count_solutions()
@@ -397,7 +457,7 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
 
     def __show_freedom(self):
         self.freedom = self.game.puzzle.freedom
-        self.__draw_puzzle()
+        self.__refresh()
 
 
     def __show_sofa(self):
@@ -411,7 +471,7 @@ class SudokuUI(tk.Frame): # pylint: disable=R0901,R0902
             for col in range(9):
                 if self.game.puzzle.get_cell(row, col) is None:
                     self.notes[(row, col)].update(freedom.freedom_set(row, col))
-        self.__draw_puzzle()
+        self.__refresh()
 
     def __sanity_check(self):
         self.game.sanity_check()
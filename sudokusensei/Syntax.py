@@ -0,0 +1,248 @@
+"""Syntax is the SMT side of Sudoku Sensei: the yices terms and rules of the game, in each encoding, and the registry that shares them.
+
+Everything that touches yices lives here (and in SudokuSolver), so the rest of the engine can be imported without it.
+"""
+
+from yices.Types import Types
+from yices.Terms import Terms
+from yices.Yices import Yices
+
+from .StringBuilder import StringBuilder
+from .SudokuLib import SudokuError, make_grid, order2dim
+
+int_t = Types.int_type()
+
+bool_t = Types.bool_type()
+
+def make_constants(dim=9):
+    """make_constants makes a map from the digits 1 through dim to the Yices constant denoting that digit."""
+    constants = {}
+    for i in range(1, dim + 1):
+        constants[i] = Terms.integer(i)
+    return constants
+
+def make_variables(dim=9):
+    """make_variables creates a dim x dim grid with each cell containing the Yices term representing that cell."""
+    variables = make_grid(dim)
+    for i in range(dim):
+        for j in range(dim):
+            variables[i][j] = Terms.new_uninterpreted_term(int_t)
+    return variables
+
+def make_booleans(dim=9):
+    """make_booleans creates a dim x dim grid with each cell containing a map from the values 1 through dim to the Yices Boolean term representing that the cell contains that value."""
+    booleans = make_grid(dim)
+    for i in range(dim):
+        for j in range(dim):
+            booleans[i][j] = {val: Terms.new_uninterpreted_term(bool_t) for val in range(1, dim + 1)}
+    return booleans
+
+def at_most_one(terms):
+    """at_most_one returns the (pairwise) Yices term stating that at most one of the given Boolean terms is true."""
+    return Terms.yand([Terms.yor([Terms.ynot(terms[i]), Terms.ynot(terms[j])]) for i in range(len(terms)) for j in range(i + 1, len(terms))])
+
+def exactly_one(terms):
+    """exactly_one returns the Yices term stating that exactly one of the given Boolean terms is true."""
+    return Terms.yand([Terms.yor(terms), at_most_one(terms)])
+
+
+class Syntax:
+    """Syntax defines the terms and rules of the Sudoku game (each cell is an integer variable)."""
+
+    encoding = 'integer'
+
+    def __init__(self, order=3):
+        self.order = order
+        self.dim = order2dim(order)
+        self.constants = make_constants(self.dim)
+        self.variables = self.make_variables()
+        # the (prebuilt) atoms stating that a cell does, or does not, contain a value, indexed by (row, col, val)
+        self.equalities = {}
+        self.inequalities = {}
+        for i in range(self.dim):
+            for j in range(self.dim):
+                for val in range(1, self.dim + 1):
+                    self.equalities[(i, j, val)] = self.equality_atom(i, j, val)
+                    self.inequalities[(i, j, val)] = self.inequality_atom(i, j, val)
+
+        # maps non-trivial rules to an informative string describing them
+        self.explanation = {}
+        # dividing the rules into trivial and non trivial is used in getting unsat cores (of non-trivial rules)
+        self.trivial_rules = self.make_trivial_rules()
+        self.duplicate_rules = self.make_duplicate_rules()
+        self.all_rules = self.trivial_rules.copy()
+        self.all_rules.extend(self.duplicate_rules)
+
+
+    def make_variables(self):
+        """make_variables creates the terms that represent the cells."""
+        return make_variables(self.dim)
+
+    def var(self, i, j):
+        """var returns the variable that represents the given cell."""
+        return self.variables[i][j]
+
+    def value(self, model, i, j):
+        """value returns the value of the given cell in the model."""
+        return model.get_value(self.var(i, j))
+
+    def in_range(self, i, j):
+        """in_range returns the rule stating that the given cell contains one of 1 through dim."""
+        return Terms.yor([Terms.eq(self.var(i, j), self.constants[val + 1]) for val in range(self.dim)])
+
+    def no_duplicates(self, cells):
+        """no_duplicates returns the rule stating that the given cells (a row, column or block) contain distinct values."""
+        return Terms.distinct([self.var(i, j) for i, j in cells])
+
+    def make_trivial_rules(self):
+        """make_trivial_rules creates the rules that force the variables to range over 1 through dim."""
+        rules = []
+        # Every variable is between 1 and dim inclusive
+        for i in range(self.dim):
+            for j in range(self.dim):
+                rules.append(self.in_range(i, j))
+        return rules
+
+
+    def make_duplicate_rules(self):
+        """make_duplicate_rules create the list of rules asserting that each row, column and block cannot containn duplicates."""
+        rules = []
+        dim = self.dim
+        order = self.order
+        # All elements in a row must be distinct
+        for i in range(dim):
+            rule = self.no_duplicates([(i, j) for j in range(dim)])
+            self.explanation[rule] = f'Row {i + 1} cannot contain duplicates'
+            rules.append(rule)
+        # All elements in a column must be distinct
+        for i in range(dim):
+            rule = self.no_duplicates([(j, i) for j in range(dim)])
+            self.explanation[rule] = f'Column {i + 1} cannot contain duplicates'
+            rules.append(rule)
+        # All elements in each order x order square must be distinct
+        def block(row, column):
+            if order != 3:
+                return f'Block ({row + 1}, {column + 1})'
+            rname = {0: 'Top', 1: 'Middle', 2: 'Bottom'}
+            cname = {0: 'left', 1: 'center', 2: 'right'}
+            return f'{rname[row]}-{cname[column]}'
+        for row in range(order):
+            for column in range(order):
+                rule = self.no_duplicates([(i + order * row, j + order * column) for i in range(order) for j in range(order)])
+                self.explanation[rule] = f'{block(row,column)} block cannot contain duplicates'
+                rules.append(rule)
+        return rules
+
+    def equality_atom(self, i, j, val):
+        """equality_atom builds the yices term stating that the given cell equals the given value."""
+        return Terms.arith_eq_atom(self.var(i, j), self.constants[val])
+
+    def inequality_atom(self, i, j, val):
+        """inequality_atom builds the yices term stating that the given cell differs the given value."""
+        return Terms.arith_neq_atom(self.var(i, j), self.constants[val])
+
+    def cell_equality(self, i, j, val):
+        """cell_equality returns the yices term stating that the given cell equals the given value."""
+        return self.equalities[(i, j, val)]
+
+    def cell_inequality(self, i, j, val):
+        """cell_inequality returns the yices term stating that the given cell differs the given value."""
+        return self.inequalities[(i, j, val)]
+
+    def diagram(self, puzzle):
+        """diagram returns the set of yices terms stating that cells in the puzzle contain the their non-None values, skippn cells with None in them."""
+        terms = []
+        for i in range(self.dim):
+            for j in range(self.dim):
+                val = puzzle.get_cell(i, j)
+                if val is not None:
+                    terms.append(self.cell_equality(i, j, val))
+        return terms
+
+    def explain(self, terms):
+        """explain returns a multiline string explaining the given terms (which should be elements of duplicate_rules."""
+        sb = StringBuilder()
+        count = 1
+        for term in terms:
+            sb.append(f'Rule {count}: ').append(self.explanation.get(term)).append('\n')
+            count += 1
+        return str(sb)
+
+
+
+class BooleanSyntax(Syntax):
+    """BooleanSyntax is the one-hot encoding of the Sudoku game: a Boolean variable for each (cell, value) pair.
+
+    The rules come in the same groups as Syntax (one range rule per cell, one duplicate rule per row, column and block),
+    so explain and Cores work unchanged, but Yices never has to reason about arithmetic.
+    """
+
+    encoding = 'boolean'
+
+    def make_variables(self):
+        """make_variables creates the Boolean terms that represent each (cell, value) pair."""
+        return make_booleans(self.dim)
+
+    def var(self, i, j):
+        """var returns the map from values to the Boolean variables that represent the given cell."""
+        return self.variables[i][j]
+
+    def value(self, model, i, j):
+        """value returns the value of the given cell in the model."""
+        for val, term in self.var(i, j).items():
+            if model.get_bool_value(term):
+                return val
+        return None
+
+    def in_range(self, i, j):
+        """in_range returns the rule stating that the given cell contains exactly one of 1 through dim."""
+        return exactly_one(list(self.var(i, j).values()))
+
+    def no_duplicates(self, cells):
+        """no_duplicates returns the rule stating that each value occurs exactly once in the given cells (a row, column or block)."""
+        return Terms.yand([exactly_one([self.var(i, j)[val] for i, j in cells]) for val in range(1, self.dim + 1)])
+
+    def equality_atom(self, i, j, val):
+        """equality_atom builds the yices term stating that the given cell equals the given value."""
+        return self.var(i, j)[val]
+
+    def inequality_atom(self, i, j, val):
+        """inequality_atom builds the yices term stating that the given cell differs the given value."""
+        return Terms.ynot(self.var(i, j)[val])
+
+
+# the encodings of the rules the user can choose between.
+ENCODINGS = {
+    Syntax.encoding: Syntax,
+    BooleanSyntax.encoding: BooleanSyntax,
+}
+
+def make_syntax(encoding='integer', order=3):
+    """make_syntax returns the terms and rules of the game, of the given order, in the given encoding."""
+    if encoding not in ENCODINGS:
+        raise SudokuError(f'No such encoding: {encoding}')
+    return ENCODINGS[encoding](order)
+
+
+class Registry:
+    """Registry is the process-wide collection of syntaxes, so that every solver (and game) shares one warm yices term space.
+
+    The registry's lifecycle is that of the process, not of a game: release it once we are done with yices altogether.
+    """
+
+    # the syntaxes, indexed by (encoding, order)
+    _syntaxes = {}
+
+    @staticmethod
+    def syntax(encoding='integer', order=3):
+        """returns the (shared) terms and rules of the game, of the given order, in the given encoding."""
+        key = (encoding, order)
+        if key not in Registry._syntaxes:
+            Registry._syntaxes[key] = make_syntax(encoding, order)
+        return Registry._syntaxes[key]
+
+    @staticmethod
+    def release():
+        """forgets every syntax and exits yices, which throws away the entire term table."""
+        Registry._syntaxes.clear()
+        Yices.exit(True)
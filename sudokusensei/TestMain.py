@@ -2,9 +2,7 @@
 
 import os.path
 
-import pkg_resources as pkg
-
-from .SudokuLib import parse_arguments, Puzzle
+from .SudokuLib import parse_arguments, resource_path, Puzzle
 from .SudokuGame import SudokuGame
 from .SudokuSolver import SudokuSolver
 from .SudokuGenerator import SudokuGenerator, choose_solution
@@ -34,7 +32,7 @@ def main():
         print(f'Difficulty: {score} Target: {generator.options.difficulty} Empty: {puzzle.empty_cells} ')
         return
 
-    board_file = pkg.resource_filename('sudoku', f'data/{board_name}.sudoku')
+    board_file = resource_path(f'data/{board_name}.sudoku')
 
     if not os.path.exists(board_file):
         print(f'No such board: {board_file}')
@@ -64,6 +62,6 @@ def main():
     solution.pprint()
 
     print(f'Difficulty: {diff[0]}')
-    print(f'#clues = {81 - game.puzzle.empty_cells}')
+    print(f'#clues = {game.puzzle.elements - game.puzzle.empty_cells}')
 
     print(solution.agree(smt_solution))
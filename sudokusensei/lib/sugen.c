@@ -61,7 +61,12 @@ void db_debug(bool dbg){
  * unsolvable.
  */
 
+/* iam: 25 values (ORDER 5) do not fit in 16 bits */
+#if ORDER > 4
+typedef uint32_t set_t;
+#else
 typedef uint16_t set_t;
+#endif
 
 #define SINGLETON(v) (1 << ((v) - 1))
 #define ALL_VALUES ((1 << DIM) - 1)
@@ -607,7 +612,14 @@ static void choose_col1(uint8_t *problem)
   }
 }
 
-static int choose_rest(uint8_t *grid, const set_t *freedom)
+/* iam: the backtracking in choose_rest has a heavy tail for the larger
+ * orders (a 25x25 grid usually takes milliseconds, but occasionally takes
+ * minutes) so we give each attempt a budget of recursive calls, and if it
+ * is exhausted we start again from scratch.
+ */
+#define GRID_BUDGET (ELEMENTS * 4)
+
+static int choose_rest(uint8_t *grid, const set_t *freedom, uint32_t *budget)
 {
   int i = search_least_free(grid, freedom);
   set_t set;
@@ -615,6 +627,10 @@ static int choose_rest(uint8_t *grid, const set_t *freedom)
   if (i < 0)
     return 0;
 
+  if (!*budget)
+    return -1;
+  (*budget)--;
+
   set = freedom[i];
   while (set) {
     set_t new_free[ELEMENTS];
@@ -626,7 +642,7 @@ static int choose_rest(uint8_t *grid, const set_t *freedom)
     memcpy(new_free, freedom, sizeof(new_free));
     freedom_eliminate(new_free, i % DIM, i / DIM, v);
 
-    if (!choose_rest(grid, new_free))
+    if (!choose_rest(grid, new_free, budget))
       return 0;
   }
 
@@ -637,18 +653,177 @@ static int choose_rest(uint8_t *grid, const set_t *freedom)
 static void choose_grid(uint8_t *grid)
 {
   set_t freedom[ELEMENTS];
+  uint32_t budget;
 
-  memset(grid, 0, sizeof(grid[0]) * ELEMENTS);
+  do {
+    memset(grid, 0, sizeof(grid[0]) * ELEMENTS);
 
-  choose_b1(grid);
+    choose_b1(grid);
 #if ORDER == 3
-  choose_b2(grid);
-  choose_b3(grid);
+    choose_b2(grid);
+    choose_b3(grid);
 #endif
-  choose_col1(grid);
+    choose_col1(grid);
+
+    init_freedom(grid, freedom);
+    budget = GRID_BUDGET;
+  } while (choose_rest(grid, freedom, &budget));
+}
+
+/************************************************************************
+ * Score cache
+ *
+ * Hardening often revisits a puzzle it has already solved (random flips
+ * frequently undo each other), so we remember what solve() said about the
+ * puzzles we have seen. A puzzle is identified by its Zobrist hash: the
+ * exclusive or of a fixed random 64 bit key for each of its (cell, value)
+ * clues, which is cheap to update as clues come and go. Since the hash is
+ * of the clues themselves, entries are shared across iterations, and across
+ * hardening runs (on the same, or any other, solution grid).
+ *
+ * The cache is set associative (CACHE_WAYS entries per set), and a full set
+ * evicts either its least recently used, or its oldest, entry. Only the hash
+ * is stored, so a (vanishingly unlikely) collision returns another puzzle's
+ * score.
+ */
+
+#define CACHE_WAYS 4
+#define CACHE_DEFAULT_CAPACITY (1 << 14)
+
+struct cache_entry {
+  uint64_t key;
+  int32_t  result;
+  uint32_t diff;
+  uint32_t stamp;   /* when it was last used (LRU) or inserted (FIFO), 0 if the entry is empty */
+};
+
+static uint64_t zobrist[ELEMENTS][DIM + 1];
+static uint64_t zobrist_sofa;
+static bool zobrist_initialized = false;
+
+static struct cache_entry *cache = NULL;
+static uint32_t cache_sets = 0;         /* 0 if the cache is disabled */
+static int32_t cache_eviction = CACHE_EVICT_LRU;
+static uint32_t cache_clock = 0;
+static uint64_t cache_stats[CACHE_STATS];
+static bool cache_configured = false;
+
+/* iam: splitmix64, so the keys neither disturb, nor depend on, random() */
+static uint64_t splitmix64(uint64_t *state)
+{
+  uint64_t z = (*state += 0x9E3779B97F4A7C15ULL);
+
+  z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+  z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+  return z ^ (z >> 31);
+}
+
+static void zobrist_initialize(void)
+{
+  uint64_t state = ORDER;
+  int i, v;
+
+  if (zobrist_initialized)
+    return;
+
+  for (i = 0; i < ELEMENTS; i++)
+    for (v = 0; v <= DIM; v++)
+      zobrist[i][v] = v ? splitmix64(&state) : 0;
+  zobrist_sofa = splitmix64(&state);
+  /* only once the keys are all there */
+  zobrist_initialized = true;
+}
+
+static uint64_t puzzle_key(const uint8_t *puzzle)
+{
+  uint64_t key = 0;
+  int i;
+
+  for (i = 0; i < ELEMENTS; i++)
+    key ^= zobrist[i][puzzle[i]];
+
+  return key;
+}
 
-  init_freedom(grid, freedom);
-  choose_rest(grid, freedom);
+static int32_t cache_configure(uint32_t capacity, int32_t eviction)
+{
+  uint32_t sets = 1;
+
+  free(cache);
+  cache = NULL;
+  cache_sets = 0;
+  cache_clock = 0;
+  cache_eviction = eviction;
+  cache_configured = true;
+  memset(cache_stats, 0, sizeof(cache_stats));
+
+  if (!capacity)
+    return 0;
+
+  while (sets * CACHE_WAYS < capacity)
+    sets <<= 1;
+
+  cache = calloc(sets * CACHE_WAYS, sizeof(struct cache_entry));
+  if (!cache)
+    return -1;
+
+  cache_sets = sets;
+  return sets * CACHE_WAYS;
+}
+
+static void cache_initialize(void)
+{
+  zobrist_initialize();
+  if (!cache_configured)
+    cache_configure(CACHE_DEFAULT_CAPACITY, CACHE_EVICT_LRU);
+}
+
+/* solve(puzzle, NULL, diff, sofa), where key is the puzzle's Zobrist hash */
+static int32_t cached_solve(const uint8_t *puzzle, uint64_t key, uint32_t *diff, bool sofa)
+{
+  struct cache_entry *set;
+  struct cache_entry *victim;
+  int32_t result;
+  int i;
+
+  if (!cache_sets)
+    return solve(puzzle, NULL, diff, sofa);
+
+  if (sofa)
+    key ^= zobrist_sofa;
+
+  set = cache + (key & (cache_sets - 1)) * CACHE_WAYS;
+  victim = set;
+  cache_stats[CACHE_LOOKUPS]++;
+  cache_clock++;
+
+  for (i = 0; i < CACHE_WAYS; i++) {
+    struct cache_entry *e = set + i;
+
+    if (e->stamp && e->key == key) {
+      cache_stats[CACHE_HITS]++;
+      if (cache_eviction == CACHE_EVICT_LRU)
+        e->stamp = cache_clock;
+      *diff = e->diff;
+      return e->result;
+    }
+
+    /* empty entries first, then the least recently used (or oldest) */
+    if (e->stamp < victim->stamp)
+      victim = e;
+  }
+
+  *diff = 0;
+  result = solve(puzzle, NULL, diff, sofa);
+
+  if (victim->stamp)
+    cache_stats[CACHE_EVICTIONS]++;
+  cache_stats[CACHE_INSERTIONS]++;
+  victim->key = key;
+  victim->result = result;
+  victim->diff = *diff;
+  victim->stamp = cache_clock;
+  return result;
 }
 
 /************************************************************************
@@ -664,54 +839,515 @@ static void choose_grid(uint8_t *grid)
  * To avoid getting stuck in local minima in the space of puzzles, we allow
  * the algorithm to wander for a few steps before starting again from the
  * best-so-far puzzle.
+ *
+ * iam: clues are added and removed an orbit at a time, where the orbits
+ * are those of the chosen symmetry, so every puzzle we visit has that
+ * symmetry (Daniel Beer's original uses the rotational pairs c and
+ * ELEMENTS - c - 1). Removals that would leave fewer than min_clues are
+ * not made. While the best-so-far puzzle has more than max_clues we only
+ * look for valid puzzles with fewer clues (regardless of difficulty), and
+ * once within the bounds we never solve puzzles with more than max_clues,
+ * so the search stays within the bounds rather than filtering afterwards.
  */
 
-static int harden_puzzle(const uint8_t *solution, uint8_t *puzzle, int max_iter, int max_score, int target_score, bool sofa)
+struct harden_constraints {
+  int32_t  symmetry;
+  int32_t  min_clues;
+  int32_t  max_clues;
+};
+
+static const struct harden_constraints default_constraints = { SYMMETRY_ROTATIONAL, 0, ELEMENTS };
+
+static int orbit_add(int *cells, int n, int c)
+{
+  int i;
+
+  for (i = 0; i < n; i++)
+    if (cells[i] == c)
+      return n;
+
+  cells[n] = c;
+  return n + 1;
+}
+
+static int orbit(int c, int32_t symmetry, int *cells)
+{
+  int x = c % DIM;
+  int y = c / DIM;
+  int n = 0;
+  int i;
+
+  n = orbit_add(cells, n, c);
+
+  switch (symmetry) {
+  case SYMMETRY_ROTATIONAL:
+    n = orbit_add(cells, n, ELEMENTS - c - 1);
+    break;
+
+  case SYMMETRY_QUARTER:
+    for (i = 1; i < 4; i++) {
+      int t = x;
+
+      x = DIM - 1 - y;
+      y = t;
+      n = orbit_add(cells, n, y * DIM + x);
+    }
+    break;
+
+  case SYMMETRY_MIRROR:
+    n = orbit_add(cells, n, y * DIM + DIM - 1 - x);
+    break;
+
+  case SYMMETRY_DIAGONAL:
+    n = orbit_add(cells, n, x * DIM + y);
+    break;
+  }
+
+  return n;
+}
+
+static int count_clues(const uint8_t *puzzle)
+{
+  int clues = 0;
+  int i;
+
+  for (i = 0; i < ELEMENTS; i++)
+    if (puzzle[i])
+      clues++;
+
+  return clues;
+}
+
+/* iam: gives up after patience iterations without progress (if patience is
+ * positive), and puts the number of iterations it made in *used.
+ */
+static int harden_puzzle(const uint8_t *solution, uint8_t *puzzle, int max_iter, int max_score, int target_score, bool sofa,
+                         const struct harden_constraints *constraints, int patience, int *used)
 {
   uint32_t best = 0;
+  int base_clues = count_clues(puzzle);
+  bool feasible = base_clues <= constraints->max_clues;
+  uint64_t key;
+  int progress = 0;
   int i;
 
-  solve(puzzle, NULL, &best, sofa);
+  cache_initialize();
+  key = puzzle_key(puzzle);
+  cached_solve(puzzle, key, &best, sofa);
 
   for (i = 0; i < max_iter; i++) {
     uint8_t next[ELEMENTS];
+    uint64_t next_key = key;
+    int clues;
     int j;
 
+    if (patience > 0 && i - progress >= patience)
+      break;
+
     if (debug)
       printf("\tIteration: %d   %d\n", i, best);
 
     memcpy(next, puzzle, sizeof(next));
+    clues = base_clues;
 
     for (j = 0; j < DIM * 2; j++) {
-      int c = random() % ELEMENTS;
+      int cells[4];
+      int n = orbit(random() % ELEMENTS, constraints->symmetry, cells);
+      int k;
       uint32_t s;
 
       if (random() & 1) {
-        next[c] = solution[c];
-        next[ELEMENTS - c - 1] = solution[ELEMENTS - c - 1];
+        for (k = 0; k < n; k++) {
+          if (!next[cells[k]]) {
+            clues++;
+            next_key ^= zobrist[cells[k]][solution[cells[k]]];
+          }
+          next[cells[k]] = solution[cells[k]];
+        }
       } else {
-        next[c] = 0;
-        next[ELEMENTS - c - 1] = 0;
+        int removed = 0;
+
+        for (k = 0; k < n; k++)
+          if (next[cells[k]])
+            removed++;
+
+        if (clues - removed < constraints->min_clues)
+          continue;
+
+        for (k = 0; k < n; k++) {
+          next_key ^= zobrist[cells[k]][next[cells[k]]];
+          next[cells[k]] = 0;
+        }
+        clues -= removed;
       }
 
-      if (!solve(next, NULL, &s, sofa) && s > best && (s <= max_score || max_score < 0)) {
+      if (clues > constraints->max_clues) {
+        /* getting closer to the bounds (or moving along a plateau) is progress, if the puzzle is still valid */
+        if (!feasible && clues <= base_clues && !cached_solve(next, next_key, &s, sofa)) {
+          memcpy(puzzle, next, sizeof(puzzle[0]) * ELEMENTS);
+          base_clues = clues;
+          key = next_key;
+          progress = i;
+        }
+        continue;
+      }
+
+      if (!cached_solve(next, next_key, &s, sofa) && (s > best || !feasible) && (s <= max_score || max_score < 0)) {
         memcpy(puzzle, next, sizeof(puzzle[0]) * ELEMENTS);
+        base_clues = clues;
+        key = next_key;
+        feasible = true;
         best = s;
+        progress = i;
 
         if (target_score >= 0 && s >= target_score) {
           if (debug)
             printf("iteration: %d target_score: %d current: %d\n", i, target_score, best);
+          *used = i + 1;
           return best;
         }
       }
     }
   }
   if (debug)
-    printf("max iteration: %d target_score: %d current: %d\n", max_iter, target_score, best);
+    printf("max iteration: %d target_score: %d current: %d\n", i, target_score, best);
+  *used = i;
+  return best;
+}
+
+/************************************************************************
+ * Hardening schedule
+ *
+ * A single hardening run often stalls well short of the target, and then
+ * spends the rest of its iterations making no progress. So, when the
+ * schedule is on, a run that has made no progress for patience iterations
+ * is abandoned, and we start again from the solution grid (or, if we are
+ * free to, from a fresh grid), keeping the best puzzle of all the runs.
+ *
+ * Once a few runs have failed we also estimate the odds that the runs we
+ * still have the iterations for will reach the target. If the best scores
+ * of the failed runs have mean m and variance v, Cantelli's inequality
+ * bounds the chance that a run reaches the target t > m by v / (v + (t -
+ * m)^2), and the chance that any of the next n does by n times that. This
+ * bound is optimistic, so when even it falls below min_odds we give up.
+ */
+
+#define SCHEDULE_MIN_RUNS 3
+
+struct harden_schedule {
+  int32_t  patience;    /* 0 is Daniel Beer's single run */
+  double   min_odds;
+};
+
+static struct harden_schedule schedule = { 0, 0.0 };
+static uint32_t schedule_stats[SCHEDULE_STATS];
+
+/* an upper bound on the odds of any of the runs the remaining iterations pay for reaching the target */
+static double schedule_odds(uint32_t runs, double sum, double sum_squares, uint32_t iterations, int remaining, int target_score)
+{
+  double mean = sum / runs;
+  double variance = sum_squares / runs - mean * mean;
+  double gap = target_score - mean;
+  double chance;
+
+  if (gap <= 0)
+    return 1.0;
+
+  if (variance < 0)
+    variance = 0;
+
+  chance = variance / (variance + gap * gap);
+  /* each future run is expected to last as long as the failed ones did */
+  return chance * remaining * runs / (iterations ? iterations : 1);
+}
+
+static int harden_scheduled(uint8_t *solution, uint8_t *puzzle, bool fresh_grids, int max_iter, int max_score, int target_score, bool sofa,
+                            const struct harden_constraints *constraints)
+{
+  uint8_t run_solution[ELEMENTS];
+  uint8_t run_puzzle[ELEMENTS];
+  int remaining = max_iter;
+  int best = -1;
+  uint32_t runs = 0;
+  uint32_t iterations = 0;
+  double sum = 0;
+  double sum_squares = 0;
+
+  memset(schedule_stats, 0, sizeof(schedule_stats));
+  memcpy(run_solution, solution, sizeof(run_solution));
+  memcpy(run_puzzle, puzzle, sizeof(run_puzzle));
+
+  for (;;) {
+    int used = 0;
+    int score = harden_puzzle(run_solution, run_puzzle, remaining, max_score, target_score, sofa, constraints, schedule.patience, &used);
+
+    remaining -= used;
+    schedule_stats[SCHEDULE_RUNS]++;
+    schedule_stats[SCHEDULE_ITERATIONS] += used;
+
+    if (score > best) {
+      best = score;
+      memcpy(solution, run_solution, sizeof(run_solution));
+      memcpy(puzzle, run_puzzle, sizeof(run_puzzle));
+    }
+
+    if ((target_score >= 0 && score >= target_score) || remaining <= 0)
+      break;
+
+    runs++;
+    iterations += used;
+    sum += score;
+    sum_squares += (double)score * score;
+
+    if (target_score >= 0 && runs >= SCHEDULE_MIN_RUNS &&
+        schedule_odds(runs, sum, sum_squares, iterations, remaining, target_score) < schedule.min_odds) {
+      schedule_stats[SCHEDULE_GAVE_UP] = 1;
+      if (debug)
+        printf("giving up: %d runs, %d iterations left, best: %d\n", runs, remaining, best);
+      break;
+    }
+
+    if (fresh_grids)
+      choose_grid(run_solution);
+    memcpy(run_puzzle, run_solution, sizeof(run_puzzle));
+  }
+
   return best;
 }
 
 
+/************************************************************************
+ * Minimizer
+ *
+ * A puzzle is minimal if erasing any one of its clues leaves a puzzle with
+ * more than one solution. We try each clue in turn (in row major order, or
+ * in a random order) and erase it for good if the puzzle is still uniquely
+ * solvable. One pass suffices: erasing more clues only adds solutions, so a
+ * clue that was needed stays needed.
+ */
+
+static int minimize_puzzle(uint8_t *puzzle, bool shuffle)
+{
+  int cells[ELEMENTS];
+  int removed = 0;
+  int i;
+
+  if (solve(puzzle, NULL, NULL, true) != 0)
+    return -1;
+
+  for (i = 0; i < ELEMENTS; i++)
+    cells[i] = i;
+
+  if (shuffle)
+    for (i = ELEMENTS - 1; i > 0; i--) {
+      int j = random() % (i + 1);
+      int c = cells[i];
+
+      cells[i] = cells[j];
+      cells[j] = c;
+    }
+
+  for (i = 0; i < ELEMENTS; i++) {
+    int c = cells[i];
+    uint8_t v = puzzle[c];
+
+    if (!v)
+      continue;
+
+    puzzle[c] = 0;
+    //iam: the sofa search is much quicker at discovering a second solution.
+    if (solve(puzzle, NULL, NULL, true) == 0)
+      removed++;
+    else
+      puzzle[c] = v;
+  }
+
+  return removed;
+}
+
+/************************************************************************
+ * Approximate unsat cores
+ *
+ * The core metric (see SudokuSolver.core_metric) asks yices, for each empty
+ * cell, for a minimal set of units (rows, columns and blocks) whose "no
+ * duplicates" rules, together with the clues, rule out every value but the
+ * solution's. That is a handful of SMT calls per cell, so we approximate it
+ * with propagation: assume the cell differs from its solution value, then
+ * repeatedly place naked singles (a cell with one candidate) and hidden
+ * singles (a value with one position in a unit), using only the units in
+ * the active set. If that runs into a contradiction (a cell with no
+ * candidates, or a unit with no room for a value) the active units
+ * suffice.
+ *
+ * Starting from all the units, we drop each unit in turn (in the order of
+ * Syntax.duplicate_rules: rows, columns, then blocks) and keep it dropped if
+ * the rest still suffice, which leaves a minimal (not necessarily minimum)
+ * set, just as SudokuSolver.filter_core does. A cell that propagation cannot
+ * settle even with every unit needs search, and counts as needing them all.
+ */
+
+#define UNITS (3 * DIM)
+
+static int unit_cells[UNITS][DIM];
+static int cell_units[ELEMENTS][3];
+static bool units_initialized = false;
+
+static void units_initialize(void)
+{
+  int u, i;
+
+  if (units_initialized)
+    return;
+
+  for (u = 0; u < DIM; u++)
+    for (i = 0; i < DIM; i++) {
+      int row = u * DIM + i;
+      int col = i * DIM + u;
+      int block = ((u / ORDER) * ORDER + i / ORDER) * DIM + (u % ORDER) * ORDER + i % ORDER;
+
+      unit_cells[u][i] = row;
+      cell_units[row][0] = u;
+      unit_cells[DIM + u][i] = col;
+      cell_units[col][1] = DIM + u;
+      unit_cells[2 * DIM + u][i] = block;
+      cell_units[block][2] = 2 * DIM + u;
+    }
+  /* only once the tables are all there */
+  units_initialized = true;
+}
+
+static int singleton_value(set_t set)
+{
+  int v;
+
+  for (v = 1; v <= DIM; v++)
+    if (set == SINGLETON(v))
+      return v;
+
+  return 0;
+}
+
+/* true if propagating over the active units refutes cell != v */
+static bool refutes(const uint8_t *puzzle, int cell, int v, const uint8_t *active)
+{
+  set_t candidates[ELEMENTS];
+  uint8_t placed[ELEMENTS];
+  int queue[ELEMENTS];
+  int top = 0;
+  bool progress = true;
+  int i, u, w;
+
+  for (i = 0; i < ELEMENTS; i++) {
+    candidates[i] = puzzle[i] ? SINGLETON(puzzle[i]) : ALL_VALUES;
+    placed[i] = 0;
+    if (puzzle[i])
+      queue[top++] = i;
+  }
+  candidates[cell] &= ~SINGLETON(v);
+
+  while (progress) {
+    while (top) {
+      int c = queue[--top];
+      set_t mask;
+      int k;
+
+      w = singleton_value(candidates[c]);
+      mask = ~SINGLETON(w);
+
+      placed[c] = w;
+      for (k = 0; k < 3; k++) {
+        u = cell_units[c][k];
+        if (!active[u])
+          continue;
+
+        for (i = 0; i < DIM; i++) {
+          int o = unit_cells[u][i];
+
+          if (o == c || !(candidates[o] & ~mask))
+            continue;
+
+          candidates[o] &= mask;
+          if (!candidates[o])
+            return true;
+          /* iam: a cell is queued once, when it becomes a singleton */
+          if (!placed[o] && count_bits(candidates[o]) == 1)
+            queue[top++] = o;
+        }
+      }
+    }
+
+    progress = false;
+    for (u = 0; u < UNITS; u++) {
+      if (!active[u])
+        continue;
+
+      for (w = 1; w <= DIM; w++) {
+        int where = -1;
+        int count = 0;
+
+        for (i = 0; i < DIM; i++)
+          if (candidates[unit_cells[u][i]] & SINGLETON(w)) {
+            where = unit_cells[u][i];
+            count++;
+          }
+
+        if (!count)
+          return true;
+
+        if (count == 1 && candidates[where] != SINGLETON(w)) {
+          candidates[where] = SINGLETON(w);
+          queue[top++] = where;
+          progress = true;
+        }
+      }
+    }
+  }
+
+  return false;
+}
+
+static int core_size(const uint8_t *puzzle, int cell, int v)
+{
+  uint8_t active[UNITS];
+  int size = UNITS;
+  int u;
+
+  memset(active, 1, sizeof(active));
+  if (!refutes(puzzle, cell, v, active))
+    return UNITS;
+
+  for (u = 0; u < UNITS; u++) {
+    active[u] = 0;
+    if (refutes(puzzle, cell, v, active))
+      size--;
+    else
+      active[u] = 1;
+  }
+
+  return size;
+}
+
+static int32_t core_sizes(const uint8_t *puzzle, uint8_t *sizes)
+{
+  uint8_t solution[ELEMENTS];
+  int32_t total = 0;
+  int i;
+
+  if (solve(puzzle, solution, NULL, true) != 0)
+    return -1;
+
+  units_initialize();
+  for (i = 0; i < ELEMENTS; i++) {
+    int size = puzzle[i] ? 0 : core_size(puzzle, i, solution[i]);
+
+    if (sizes)
+      sizes[i] = size;
+    total += size;
+  }
+
+  return total;
+}
+
 /************************************************************************
  * API
  *
@@ -722,14 +1358,88 @@ int32_t db_solve_puzzle(const uint8_t* puzzle, uint8_t* solution, uint32_t* diff
   return solve(puzzle, solution, difficultyp, sofa);
 }
 
-void db_generate_puzzle(uint8_t* puzzle, uint32_t* difficultyp, uint32_t difficulty, int32_t max_difficulty, uint32_t iterations, bool sofa){
-  uint8_t grid[ELEMENTS];
+int32_t db_order(void){
+  return ORDER;
+}
+
+static void initialize(void){
   if (!initialized) {
     initialized = true;
     srandom(time(NULL));
   }
+}
+
+void db_seed(uint32_t seed){
+  initialized = true;
+  srandom(seed);
+}
+
+void db_generate_puzzle(uint8_t* puzzle, uint32_t* difficultyp, uint32_t difficulty, int32_t max_difficulty, uint32_t iterations, bool sofa){
+  uint8_t grid[ELEMENTS];
+  initialize();
   choose_grid(grid);
   memcpy(puzzle, grid, ELEMENTS * sizeof(uint8_t));
-  *difficultyp = harden_puzzle(grid, puzzle, iterations, max_difficulty, difficulty, sofa);
+  *difficultyp = harden_scheduled(grid, puzzle, true, iterations, max_difficulty, difficulty, sofa, &default_constraints);
   return;
 }
+
+void db_generate_grid(uint8_t* grid){
+  initialize();
+  choose_grid(grid);
+}
+
+void db_harden_puzzle(const uint8_t* solution, uint8_t* puzzle, uint32_t* difficultyp, uint32_t difficulty, int32_t max_difficulty, uint32_t iterations, bool sofa,
+                      int32_t symmetry, int32_t min_clues, int32_t max_clues){
+  struct harden_constraints constraints = { symmetry, min_clues, max_clues };
+  uint8_t grid[ELEMENTS];
+
+  initialize();
+  /* the puzzle must agree with the given solution, so restarts start from it again */
+  memcpy(grid, solution, sizeof(grid));
+  *difficultyp = harden_scheduled(grid, puzzle, false, iterations, max_difficulty, difficulty, sofa, &constraints);
+}
+
+int32_t db_minimize_puzzles(uint8_t* puzzles, int32_t* removed, uint32_t count, bool shuffle){
+  int32_t minimized = 0;
+  uint32_t i;
+
+  initialize();
+  for (i = 0; i < count; i++) {
+    int32_t r = minimize_puzzle(puzzles + i * ELEMENTS, shuffle);
+
+    if (removed)
+      removed[i] = r;
+    if (r >= 0)
+      minimized++;
+  }
+  return minimized;
+}
+
+int32_t db_cache_configure(uint32_t capacity, int32_t eviction){
+  zobrist_initialize();
+  return cache_configure(capacity, eviction);
+}
+
+void db_cache_clear(void){
+  if (cache)
+    memset(cache, 0, cache_sets * CACHE_WAYS * sizeof(struct cache_entry));
+  cache_clock = 0;
+  memset(cache_stats, 0, sizeof(cache_stats));
+}
+
+void db_cache_stats(uint64_t* stats){
+  memcpy(stats, cache_stats, sizeof(cache_stats));
+}
+
+int32_t db_core_sizes(const uint8_t* puzzle, uint8_t* sizes){
+  return core_sizes(puzzle, sizes);
+}
+
+void db_schedule_configure(int32_t patience, double min_odds){
+  schedule.patience = patience;
+  schedule.min_odds = min_odds;
+}
+
+void db_schedule_stats(uint32_t* stats){
+  memcpy(stats, schedule_stats, sizeof(schedule_stats));
+}
@@ -4,11 +4,43 @@
 /**
  * Attempts to generate a puzzle of the desired difficulty within the given number of iterations.
  * Returns 0 on success, or a negative error code if something goes wrong.
- * puzzle should be big enough to accept 81 integers. The actual difficulty will
+ * puzzle should be big enough to accept ELEMENTS (81 for ORDER 3) integers. The actual difficulty will
  * be placed in diff.
  */
 void db_generate_puzzle(uint8_t* puzzle, uint32_t* difficultyp, uint32_t difficulty, int32_t max_difficulty, uint32_t iterations, bool sofa);
 
+/**
+ * Seeds the random number generator used by the generators (otherwise it is seeded with the time on first use).
+ * Processes forked from a parent that has already used the library should call this, lest they all make the same choices.
+ */
+void db_seed(uint32_t seed);
+
+/**
+ * Fills grid (which should be big enough to accept ELEMENTS integers) with a randomly chosen
+ * valid solution grid.
+ */
+void db_generate_grid(uint8_t* grid);
+
+/**
+ * The symmetries the clues of a generated puzzle can be made to respect.
+ */
+#define SYMMETRY_NONE        0
+#define SYMMETRY_ROTATIONAL  1
+#define SYMMETRY_QUARTER     2
+#define SYMMETRY_MIRROR      3
+#define SYMMETRY_DIAGONAL    4
+
+/**
+ * Hardens the puzzle, which must agree with the given solution grid, for at most the given number of
+ * iterations or until the desired difficulty is reached. Passing a copy of the solution as the puzzle
+ * skips the grid generation step of db_generate_puzzle. The actual difficulty will be placed in diff.
+ * Clues are only added and removed in ways that respect the given symmetry, and the search only
+ * accepts puzzles with between min_clues and max_clues clues (db_generate_puzzle uses
+ * SYMMETRY_ROTATIONAL, 0, ELEMENTS).
+ */
+void db_harden_puzzle(const uint8_t* solution, uint8_t* puzzle, uint32_t* difficultyp, uint32_t difficulty, int32_t max_difficulty, uint32_t iterations, bool sofa,
+                      int32_t symmetry, int32_t min_clues, int32_t max_clues);
+
 /**
  * Solves the puzzle, if solution is not NULL, it copies the soltion into it
  * if difficultyp is not NULL it also computes the difficulty and stoes it there.
@@ -16,6 +48,86 @@ void db_generate_puzzle(uint8_t* puzzle, uint32_t* difficultyp, uint32_t difficu
  */
 int32_t db_solve_puzzle(const uint8_t* puzzle, uint8_t* solution, uint32_t* difficultyp, bool sofa);
 
+/**
+ * Minimizes each of the count puzzles, stored one after another (ELEMENTS cells each) in puzzles, by erasing
+ * every clue whose removal leaves the solution unique. Clues are tried in row major order, or in a random
+ * order if shuffle is true. If removed is not NULL, removed[i] is the number of clues erased from puzzle i,
+ * or -1 if it does not have a unique solution (in which case it is left untouched). Returns the number
+ * of puzzles that were minimized.
+ */
+int32_t db_minimize_puzzles(uint8_t* puzzles, int32_t* removed, uint32_t count, bool shuffle);
+
+/**
+ * Approximates the unsat core metric: for each empty cell, sizes[i] (if sizes is not NULL) is the size of a minimal
+ * set of units (rows, columns and blocks, 3 * DIM of them) whose no duplicates rules, together with the clues, force
+ * the cell's value by propagation (naked and hidden singles) alone, or 3 * DIM if propagation cannot force it.
+ * sizes[i] is 0 for the clues. Returns the sum of the sizes, or -1 if the puzzle does not have a unique solution.
+ */
+int32_t db_core_sizes(const uint8_t* puzzle, uint8_t* sizes);
+
+/**
+ * The eviction policies of the score cache, which remembers the outcome of solving the puzzles db_harden_puzzle
+ * (and db_generate_puzzle) visit: a full set of the cache evicts its least recently used, or its oldest, entry.
+ */
+#define CACHE_EVICT_LRU      0
+#define CACHE_EVICT_FIFO     1
+
+/**
+ * The statistics db_cache_stats reports, in this order.
+ */
+#define CACHE_LOOKUPS        0
+#define CACHE_HITS           1
+#define CACHE_INSERTIONS     2
+#define CACHE_EVICTIONS      3
+#define CACHE_STATS          4
+
+/**
+ * Empties the score cache, and resizes it to hold (at least) capacity entries (0 disables it), with the given
+ * eviction policy. Returns the actual capacity, or -1 if the memory could not be allocated (the cache is then
+ * disabled). Until this is called the cache holds 16384 entries, and evicts the least recently used.
+ */
+int32_t db_cache_configure(uint32_t capacity, int32_t eviction);
+
+/**
+ * Empties the score cache, and zeroes its statistics.
+ */
+void db_cache_clear(void);
+
+/**
+ * Copies the CACHE_STATS statistics of the score cache (since it was last configured or cleared) into stats.
+ */
+void db_cache_stats(uint64_t* stats);
+
+/**
+ * Configures the hardening schedule of db_generate_puzzle and db_harden_puzzle. With a positive patience a run
+ * that has made no progress for that many iterations is abandoned, and hardening starts again (from a fresh grid in
+ * db_generate_puzzle, from the solution in db_harden_puzzle), keeping the best puzzle so far, until the target is
+ * reached or the iterations run out. Once a few runs have failed, hardening also stops early when an (optimistic)
+ * estimate of the odds that the remaining iterations reach the target falls below min_odds. A patience of 0, the
+ * default, is Daniel Beer's single run.
+ */
+void db_schedule_configure(int32_t patience, double min_odds);
+
+/**
+ * The statistics db_schedule_stats reports, in this order.
+ */
+#define SCHEDULE_RUNS        0
+#define SCHEDULE_ITERATIONS  1
+#define SCHEDULE_GAVE_UP     2
+#define SCHEDULE_STATS       3
+
+/**
+ * Copies the SCHEDULE_STATS statistics of the last hardening (the number of runs, the total number of iterations,
+ * and 1 if it gave up early, 0 otherwise) into stats.
+ */
+void db_schedule_stats(uint32_t* stats);
+
+/**
+ * Returns the ORDER the library was compiled with (3 for regular 9x9 sudoku, the
+ * number of cells, ELEMENTS, is ORDER^4).
+ */
+int32_t db_order(void);
+
 
 /**
  * Turns on/off debugging.